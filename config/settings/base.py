@@ -217,6 +217,12 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/3",
     },
+    # Entries are replaced when the study they belong to is imported again.
+    "variable_api": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/4",
+        "TIMEOUT": None,
+    },
 }
 
 # Rest API config
@@ -254,6 +260,15 @@ IMPORT_REPO_PATH.mkdir(parents=True, exist_ok=True)
 
 IMPORT_SUB_DIRECTORY = "ddionrails/"
 
+# Bounds for the number of cached deterministic ids during imports.
+# The cache is sized between these values depending on the size of a study.
+IMPORT_ID_CACHE_SIZE = int(os.getenv("IMPORT_ID_CACHE_SIZE", default="100000"))
+IMPORT_ID_CACHE_MAX_SIZE = int(os.getenv("IMPORT_ID_CACHE_MAX_SIZE", default="1000000"))
+
+# Large CSV files of chunked entities are imported in chunks of this many rows.
+# Every chunk is a separate step of an import run that can be resumed.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", default="50000"))
+
 # Django RQ
 RQ_SHOW_ADMIN_LINK = True
 
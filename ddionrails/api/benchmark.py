@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the values based serialization of API lists"""
+
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, List, Tuple, Type
+
+from django.db import connection
+from django.db.models import QuerySet
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+
+from ddionrails.api.serializers import (
+    QuestionSerializer,
+    StatisticsVariableSerializer,
+    VariableSerializer,
+)
+from ddionrails.data.models.variable import Variable
+from ddionrails.imports.manager import RowCounter
+from ddionrails.instruments.models.question import Question
+from ddionrails.studies.models import Study
+
+
+@dataclass
+class SerializerBenchmark:  # pylint: disable=too-many-instance-attributes
+    """Measurements of the serialization of one list with both paths."""
+
+    serializer: str
+    rows: int
+    instance_seconds: float
+    values_seconds: float
+    instance_queries: int
+    values_queries: int
+    matches: bool
+
+    @property
+    def speedup(self) -> float:
+        """How many times faster the values based serialization is."""
+        return self.instance_seconds / self.values_seconds if self.values_seconds else 0
+
+
+def benchmark_querysets(study: Study) -> Dict[Type[ModelSerializer], QuerySet]:
+    """The lists of a study like the API views select them."""
+    return {
+        VariableSerializer: Variable.objects.filter(dataset__study=study)
+        .select_related("dataset", "dataset__study", "dataset__period")
+        .distinct(),
+        StatisticsVariableSerializer: Variable.objects.filter(dataset__study=study)
+        .select_related("dataset", "dataset__study", "concept")
+        .prefetch_related("concept__topics")
+        .distinct(),
+        QuestionSerializer: Question.objects.filter(instrument__study=study)
+        .select_related("instrument", "instrument__study")
+        .distinct(),
+    }
+
+
+def run_serializer_benchmark(study: Study, repeat: int = 1) -> List[SerializerBenchmark]:
+    """Serialize the lists of a study from instances and from values.
+
+    Each path is run repeat times and the fastest run is kept.
+    The rendered JSON of both paths has to be the same.
+    """
+    results = []
+    for serializer_class, queryset in benchmark_querysets(study).items():
+        instance_seconds, instance_queries, instance_content = _measure(
+            serializer_class, queryset, True, repeat
+        )
+        values_seconds, values_queries, values_content = _measure(
+            serializer_class, queryset, False, repeat
+        )
+        results.append(
+            SerializerBenchmark(
+                serializer=serializer_class.__name__,
+                rows=queryset.count(),
+                instance_seconds=instance_seconds,
+                values_seconds=values_seconds,
+                instance_queries=instance_queries,
+                values_queries=values_queries,
+                matches=instance_content == values_content,
+            )
+        )
+    return results
+
+
+def _measure(
+    serializer_class: Type[ModelSerializer],
+    queryset: QuerySet,
+    from_instances: bool,
+    repeat: int,
+) -> Tuple[float, int, bytes]:
+    """Serialize a list like the API views and return the fastest run.
+
+    A list of instances is serialized field by field,
+    a queryset with the values based path of the serializer.
+    """
+    seconds = []
+    for _ in range(max(repeat, 1)):
+        counter = RowCounter()
+        start = perf_counter()
+        with connection.execute_wrapper(counter):
+            data = serializer_class(
+                list(queryset.all()) if from_instances else queryset.all(), many=True
+            ).data
+        seconds.append(perf_counter() - start)
+    return min(seconds), counter.queries, JSONRenderer().render(data)
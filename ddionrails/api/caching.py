@@ -0,0 +1,291 @@
+"""Versioned response cache for ddionrails.api app
+
+Responses are cached for a month, together with the import version of
+the study they belong to. When a study is imported again, its version changes.
+Outdated responses are served one more time while a job renders them again,
+and jobs render the responses requested before the import right after it.
+The same version answers conditional requests of clients.
+"""
+
+from datetime import datetime
+from hashlib import sha1
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.cache import quote_etag
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.module_loading import import_string
+from django_rq.queues import enqueue
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from ddionrails.studies.models import Study
+
+CACHE_NAME = "variable_api"
+# Version of responses that are not limited to a single study.
+ALL_STUDIES = "*"
+# Seconds a response is cached, even if its study is not imported again.
+RESPONSE_TIMEOUT = 60 * 60 * 24 * 30
+# Query parameters that select the content of a response.
+# Other parameters do not create responses of their own.
+RESPONSE_PARAMETERS = (
+    "study",
+    "dataset",
+    "topic",
+    "concept",
+    "statistics",
+    "paginate",
+    "cursor",
+    "limit",
+    "offset",
+)
+# Number of responses of a study that are rendered again after an import.
+MAX_TRACKED_RESPONSES = 1000
+# Seconds during which no second job renders the same outdated response.
+REFRESH_LOCK_TIMEOUT = 60 * 10
+# Seconds the version of a study name without a study is kept.
+UNKNOWN_STUDY_TIMEOUT = 60 * 10
+# Tells a missing cache entry from a cached None.
+_MISSING = object()
+
+
+def _cache():
+    return caches[CACHE_NAME]
+
+
+def _version_key(study_name: Optional[str]) -> str:
+    return f"version:{study_name or ALL_STUDIES}"
+
+
+def _modified_key(study_name: Optional[str]) -> str:
+    return f"modified:{study_name or ALL_STUDIES}"
+
+
+def _tracking_key(study_name: Optional[str], index: Any) -> str:
+    return f"responses:{study_name or ALL_STUDIES}:{index}"
+
+
+def _refresh_key(key: str) -> str:
+    return f"refresh:{key}"
+
+
+def _get_or_set(key: str, study_name: Optional[str], default: Callable) -> Any:
+    """Get a value of a study from the cache or cache it until the next import.
+
+    Values of study names without a study expire after UNKNOWN_STUDY_TIMEOUT,
+    so that requests for made-up studies do not fill the cache.
+    """
+    value = _cache().get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = default()
+    timeout = None
+    if study_name and not Study.objects.filter(name=study_name).exists():
+        timeout = UNKNOWN_STUDY_TIMEOUT
+    _cache().add(key, value, timeout=timeout)
+    return _cache().get(key, value)
+
+
+def study_version(study_name: Optional[str]) -> str:
+    """The import version of a study, or of all studies if no study is given."""
+    return _get_or_set(_version_key(study_name), study_name, lambda: uuid4().hex)
+
+
+def set_study_version(study_name: str, version: str) -> None:
+    """Mark the cached responses of a study as outdated and queue their rendering.
+
+    Responses that are not limited to a single study are renewed as well.
+    Meant to run as a job after the import of the study.
+    """
+    modified = timezone.now()
+    Study.objects.filter(name=study_name).update(modified=modified)
+    _cache().set_many(
+        {
+            _version_key(study_name): version,
+            _version_key(None): uuid4().hex,
+            _modified_key(study_name): modified,
+            _modified_key(None): modified,
+        },
+        timeout=None,
+    )
+    for name in (study_name, None):
+        count = min(_cache().get(_tracking_key(name, "count"), 0), MAX_TRACKED_RESPONSES)
+        tracked = _cache().get_many(
+            [_tracking_key(name, index) for index in range(1, count + 1)]
+        )
+        for key, request_info in tracked.values():
+            if _cache().add(_refresh_key(key), True, timeout=REFRESH_LOCK_TIMEOUT):
+                enqueue(refresh_response, **request_info)
+
+
+def refresh_response(  # pylint: disable=R0913,R0917
+    view: str, action: str, path: str, host: str, secure: bool
+) -> None:
+    """Render a cached response again for the current version of its study."""
+    request = RequestFactory().get(path, HTTP_HOST=host, secure=secure)
+    request.refresh_response_cache = True
+    import_string(view).as_view({"get": action})(request)
+
+
+class VersionedResponseCacheMixin:
+    """Cache list responses until the study of the request is imported again.
+
+    The study is taken from the "study" query parameter.
+    Responses are told apart by their scheme, host, path and RESPONSE_PARAMETERS.
+    """
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Serve the cached response or cache the rendered one."""
+        study_name = request.query_params.get("study", None)
+        version = study_version(study_name)
+        parameters = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name in RESPONSE_PARAMETERS
+            for value in values
+        )
+        path = f"{request.path}?{urlencode(parameters)}"
+        # The data holds absolute URLs, like the links of paginated responses.
+        url = f"{request.scheme}://{request.get_host()}{path}"
+        key = f"response:{sha1(url.encode('utf8')).hexdigest()}"
+        entry = _cache().get(key)
+        if entry and not getattr(request, "refresh_response_cache", False):
+            if entry["version"] != version and _cache().add(
+                _refresh_key(key), True, timeout=REFRESH_LOCK_TIMEOUT
+            ):
+                enqueue(refresh_response, **entry["request"])
+            response = Response(entry["data"])
+            response.content_version = entry["version"]
+            return response
+
+        response = super().list(request, *args, **kwargs)  # type: ignore[misc]
+        if response.status_code != 200:
+            return response
+        response.content_version = version
+        request_info = {
+            "view": f"{type(self).__module__}.{type(self).__qualname__}",
+            "action": "list",
+            "path": path,
+            "host": request.get_host(),
+            "secure": request.is_secure(),
+        }
+        _cache().set(
+            key,
+            {"version": version, "data": response.data, "request": request_info},
+            timeout=RESPONSE_TIMEOUT,
+        )
+        _cache().delete(_refresh_key(key))
+        self._track(study_name, key, request_info)
+        return response
+
+    @staticmethod
+    def _track(study_name: Optional[str], key: str, request_info: Dict) -> None:
+        """Remember a response to render it again after the next import.
+
+        Every response gets a numbered entry of its own. The numbers are counted
+        atomically, so concurrent requests cannot overwrite each other's entries.
+        """
+        if not _cache().add(
+            _tracking_key(study_name, key), True, timeout=RESPONSE_TIMEOUT
+        ):
+            return
+        count_key = _tracking_key(study_name, "count")
+        _cache().add(count_key, 0, timeout=RESPONSE_TIMEOUT)
+        try:
+            index = _cache().incr(count_key)
+        except ValueError:  # The count expired in the meantime.
+            return
+        if index > MAX_TRACKED_RESPONSES:
+            return
+        _cache().set(
+            _tracking_key(study_name, index),
+            (key, request_info),
+            timeout=RESPONSE_TIMEOUT,
+        )
+
+
+class ConditionalGetMixin:
+    """Answer conditional GET requests with the import version of the study.
+
+    The ETag of a response is derived from the version of the study in the
+    "study" query parameter, or of all studies, and from the request.
+    A matching If-None-Match header is answered with 304 Not Modified before
+    authentication or any database query. Last-Modified is the time of the
+    last import of the study, or of any study.
+    Outdated responses, served while they are rendered again, get the ETag of
+    the version they were rendered for and no Last-Modified.
+    Requests for the browsable API are answered as usual.
+    """
+
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        """Answer with 304 Not Modified or add the validators to the response."""
+        if request.method not in ("GET", "HEAD") or _accepts_html(request):
+            return super().dispatch(request, *args, **kwargs)  # type: ignore[misc]
+        study_name = request.GET.get("study", None)
+        version = study_version(study_name)
+        etag = _etag(request, version)
+        if_none_match = request.headers.get("If-None-Match", None)
+        if if_none_match is not None:
+            if etag in parse_etags(if_none_match) or if_none_match.strip() == "*":
+                return _not_modified(etag)
+        else:
+            last_modified = _last_modified(study_name)
+            if_modified_since = parse_http_date_safe(
+                request.headers.get("If-Modified-Since", "")
+            )
+            if (
+                last_modified
+                and if_modified_since
+                and int(last_modified.timestamp()) <= if_modified_since
+            ):
+                return _not_modified(etag)
+        response = super().dispatch(request, *args, **kwargs)  # type: ignore[misc]
+        if response.status_code != 200:
+            return response
+        content_version = getattr(response, "content_version", version)
+        if content_version != version:
+            etag = _etag(request, content_version)
+            if if_none_match is not None and etag in parse_etags(if_none_match):
+                return _not_modified(etag)
+            response.headers["ETag"] = etag
+            return response
+        response.headers["ETag"] = etag
+        if if_none_match is not None:
+            last_modified = _last_modified(study_name)
+        if last_modified:
+            response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+
+def _accepts_html(request: HttpRequest) -> bool:
+    return (
+        "text/html" in request.headers.get("Accept", "")
+        or request.GET.get("format", None) == "api"
+    )
+
+
+def _etag(request: HttpRequest, version: str) -> str:
+    content = f"{version}:{request.get_full_path()}:{request.headers.get('Accept', '')}"
+    return quote_etag(sha1(content.encode("utf8")).hexdigest())
+
+
+def _last_modified(study_name: Optional[str]) -> Optional[datetime]:
+    def latest_modification() -> Optional[datetime]:
+        studies = Study.objects.all()
+        if study_name:
+            studies = studies.filter(name=study_name)
+        return studies.aggregate(last_modified=Max("modified"))["last_modified"]
+
+    return _get_or_set(_modified_key(study_name), study_name, latest_modification)
+
+
+def _not_modified(etag: str) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response.headers["ETag"] = etag
+    return response
@@ -2,36 +2,30 @@
 run_import_on_redis was declared in ddionrails.api.views.webhooks
 """
 
-from datetime import datetime
-
 from django.core.management import call_command
 from django_rq.queues import enqueue
 
-from config.settings.base import BACKUP_DIR
 from ddionrails.imports.management.commands.update import (
-    _clear_all_caches,
+    _publish_update,
     update_single_study,
+    update_study_incrementally,
 )
 from ddionrails.imports.manager import StudyImportManager
 from ddionrails.studies.models import Study
-from ddionrails.workspace.models import Basket
-from ddionrails.workspace.models.basket_variable import BasketVariable
 
 
 def run_import_on_redis(study_name):
     """Queue Study import in redis queue that will in turn queue single import jobs"""
     study = Study.objects.get(name=study_name)
     manager = StudyImportManager(study, redis=True)
-    file_name = f"webhook_backup{datetime.now():%Y_%m_%d_%__%H_%M_%S}.json"
-    Basket.backup(study, file_name)
-
-    study.delete()
-    study.save()
-
-    update_single_study(study, local=False, clean_import=False, manager=manager)
-
-    enqueue(call_command, "loaddata", BACKUP_DIR.joinpath(file_name).absolute())
-    enqueue(BasketVariable.clean_basket_variables, study.name)
-
-    enqueue(_clear_all_caches)
-    enqueue(call_command, "search_index", "--rebuild", "-f")
+    jobs = update_study_incrementally(study, local=False, manager=manager)
+    if jobs is not None:
+        jobs = _publish_update(study, manager, jobs)
+    else:
+        # The repository was already set up by the incremental update attempt.
+        # The study stays online and keeps its baskets until the new content
+        # replaces it.
+        jobs = update_single_study(
+            study, local=True, clean_import=True, manager=manager, staged=True
+        )
+    enqueue(call_command, "search_index", "--rebuild", "-f", depends_on=jobs or None)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+""" "Benchmark serializers" management command for ddionrails project"""
+
+import json
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ddionrails.api.benchmark import run_serializer_benchmark
+from ddionrails.studies.models import Study
+
+
+class Command(BaseCommand):
+    """Benchmark the serialization of API lists via management command."""
+
+    help = (
+        "Serialize the variables and questions of an imported study from model "
+        "instances and from values, compare the output and write timings as JSON. "
+        'A study can be generated with "benchmark_import --keep".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_name", type=str, help="Name of an imported study.")
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=3,
+            help="Serialize each list this many times and keep the fastest run.",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=Path,
+            default=None,
+            help="Write the results to this file instead of stdout.",
+        )
+
+    def handle(self, *args, **options):
+        study = Study.objects.filter(name=options["study_name"]).first()
+        if study is None:
+            self.stderr.write(
+                self.style.ERROR(f'Study "{options["study_name"]}" does not exist.')
+            )
+            sys.exit(1)
+
+        started = timezone.now()
+        results = run_serializer_benchmark(study, options["repeat"])
+        report = {
+            "started": started.isoformat(),
+            "study": study.name,
+            "repeat": options["repeat"],
+            "serializers": [
+                {**asdict(result), "speedup": result.speedup} for result in results
+            ],
+        }
+        content = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(content + "\n", encoding="utf8")
+        else:
+            self.stdout.write(content)
+        different = [result.serializer for result in results if not result.matches]
+        if different:
+            self.stderr.write(
+                self.style.ERROR(f"Different output: {', '.join(different)}")
+            )
+            sys.exit(1)
+        return None
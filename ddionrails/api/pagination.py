@@ -0,0 +1,141 @@
+"""Keyset pagination for ddionrails.api app
+
+Offset pagination reads and skips all rows before a page, so deep pages get
+slower the further they are from the start. Keyset pagination continues after
+the ordering key of the last row of the previous page instead, which an index
+on the ordering key finds directly. Every page costs the same.
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, QuerySet, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from ddionrails.base.helpers.ordering import NULL_POSITION
+
+
+def keyset_expressions(queryset: QuerySet, ordering: Sequence[str]) -> List[Any]:
+    """Expressions of an ordering key, with nullable fields ordered last."""
+    expressions: List[Any] = []
+    for name in ordering:
+        field = queryset.model._meta.get_field(name)
+        if field.null:
+            expressions.append(Coalesce(F(name), Value(NULL_POSITION)))
+        else:
+            expressions.append(F(name))
+    return expressions
+
+
+class KeysetPagination(BasePagination):
+    """Paginate along the keyset_ordering of a view.
+
+    The cursor query parameter holds the key of the last row of the previous
+    page. Responses contain the link to the next page but no count,
+    because counting would read all rows again.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    max_limit = 1000
+
+    def __init__(self) -> None:
+        self.request: Optional[Request] = None
+        self.next_key: Optional[List[Any]] = None
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Any = None
+    ) -> List[Any]:
+        self.request = request
+        limit = self.get_limit(request)
+        keys = {
+            f"keyset_{index}": expression
+            for index, expression in enumerate(
+                keyset_expressions(queryset, view.keyset_ordering)
+            )
+        }
+        queryset = queryset.annotate(**keys).order_by(*keys)
+        if queryset.query.distinct:
+            # Rows are distinct by their key, which avoids sorting all columns.
+            queryset = queryset.distinct(*keys)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            if len(cursor) != len(keys):
+                raise NotFound("Invalid cursor")
+            fields = [queryset.query.resolve_ref(name).output_field for name in keys]
+            try:
+                cursor = [field.to_python(value) for value, field in zip(cursor, fields)]
+            except (ValidationError, TypeError, ValueError) as error:
+                raise NotFound("Invalid cursor") from error
+            queryset = queryset.alias(
+                keyset=Func(*map(F, keys), function="ROW", output_field=Field())
+            ).filter(
+                keyset__gt=Func(
+                    *(
+                        Value(value, output_field=field)
+                        for value, field in zip(cursor, fields)
+                    ),
+                    function="ROW",
+                    output_field=Field(),
+                )
+            )
+        page = list(queryset[: limit + 1])
+        self.next_key = None
+        if len(page) > limit:
+            page = page[:limit]
+            self.next_key = [getattr(page[-1], name) for name in keys]
+        return page
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_limit(self, request: Request) -> int:
+        """The page size from the limit query parameter or the settings."""
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(limit, 1), self.max_limit)
+
+    def get_next_link(self) -> Optional[str]:
+        """Link to the page after the key of the last row of this page."""
+        if self.next_key is None or self.request is None:
+            return None
+        cursor = urlsafe_b64encode(json.dumps(self.next_key, default=str).encode("utf8"))
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor.decode("ascii"),
+        )
+
+    def decode_cursor(self, request: Request) -> Optional[List[Any]]:
+        """The key of the last row of the previous page."""
+        cursor = request.query_params.get(self.cursor_query_param, None)
+        if cursor is None:
+            return None
+        try:
+            key = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+        except (DecodeError, UnicodeError, ValueError) as error:
+            raise NotFound("Invalid cursor") from error
+        if not isinstance(key, list):
+            raise NotFound("Invalid cursor")
+        return key
@@ -3,9 +3,12 @@
 Serializers are used to serialize django ORM objects to standard data formats.
 """
 
-from typing import Any
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterator, List
 
 from django.contrib.auth.models import User  # pylint: disable=imported-auth-user
+from django.db.models import QuerySet
 from rest_framework import serializers
 
 from ddionrails.api.related_fields import BasketRelatedField, UserRelatedField
@@ -19,6 +22,8 @@ from ddionrails.workspace.models.basket import Basket
 from ddionrails.workspace.models.basket_variable import BasketVariable
 
 NAMESPACE = "api"
+# Number of rows read at once by the values based serialization.
+VALUES_CHUNK_SIZE = 2000
 
 
 class AttachmentSerializer(serializers.ModelSerializer):
@@ -218,8 +223,114 @@ class VariableLabelsSerializer(serializers.ModelSerializer):
         fields = ["variable", "dataset", "period", "labels"]
 
 
-class VariableSerializer(serializers.HyperlinkedModelSerializer):
-    """Serialize systems Variables."""
+def _values_lookup(field: serializers.Field) -> str:
+    """The lookup of QuerySet.values() that reads the value of a field."""
+    lookup = "__".join(field.source_attrs)
+    if isinstance(field, serializers.ManyRelatedField):
+        field = field.child_relation
+    if isinstance(field, serializers.SlugRelatedField):
+        return f"{lookup}__{field.slug_field}"
+    return lookup
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """Serialize querysets with the values based path of the child serializer."""
+
+    def to_representation(self, data: Any) -> List[Dict[str, Any]]:
+        if isinstance(data, QuerySet):
+            return list(self.child.values_representation(data))
+        return super().to_representation(data)
+
+
+class ValuesSerializerMixin:
+    """Serialize querysets from QuerySet.values() instead of model instances.
+
+    Creating a model instance and resolving every related field per row
+    dominates the serialization of long lists. Here the rows are read as dicts,
+    with the columns of related objects joined, and turned into the same
+    representation directly. Fields with many related objects are read with
+    one more query per chunk of rows.
+    Only read only fields with a model field or a related field as source
+    are supported.
+    """
+
+    def values_representation(
+        self, queryset: QuerySet, chunk_size: int = VALUES_CHUNK_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """Serialize the rows of a queryset like the instances of it."""
+        fields = self.fields  # type: ignore[attr-defined]
+        lookups = {
+            name: _values_lookup(field)
+            for name, field in fields.items()
+            if not isinstance(field, serializers.ManyRelatedField)
+        }
+        # Fields with many related objects are grouped by their relation
+        # and left out if the parent of the relation is null.
+        relations: Dict[str, Dict[str, str]] = defaultdict(dict)
+        parents = {}
+        for name, field in fields.items():
+            if isinstance(field, serializers.ManyRelatedField):
+                relations["__".join(field.source_attrs)][name] = _values_lookup(field)
+                parents[name] = "__".join(field.source_attrs[:-1])
+        converters = {
+            name: field.to_representation
+            for name, field in fields.items()
+            if not isinstance(field, serializers.RelatedField)
+            and not isinstance(field, serializers.ManyRelatedField)
+        }
+        rows = (
+            queryset.prefetch_related(None)
+            .values("pk", *dict.fromkeys([*lookups.values(), *parents.values()]))
+            .iterator(chunk_size=chunk_size)
+        )
+        while chunk := list(islice(rows, chunk_size)):
+            related: Dict[str, Dict[Any, List[Any]]] = {}
+            for relation, relation_lookups in relations.items():
+                related.update(
+                    self._many_values(queryset, relation, relation_lookups, chunk)
+                )
+            for row in chunk:
+                representation = {}
+                for name in fields:
+                    if name in parents:
+                        if row[parents[name]] is not None:
+                            representation[name] = related[name][row["pk"]]
+                        continue
+                    value = row[lookups[name]]
+                    if value is not None and name in converters:
+                        value = converters[name](value)
+                    representation[name] = value
+                yield representation
+
+    @staticmethod
+    def _many_values(
+        queryset: QuerySet,
+        relation: str,
+        lookups: Dict[str, str],
+        rows: List[Dict[str, Any]],
+    ) -> Dict[str, Dict[Any, List[Any]]]:
+        """Read the values of the related objects of rows with one query."""
+        values: Dict[str, Dict[Any, List[Any]]] = {
+            name: defaultdict(list) for name in lookups
+        }
+        related = (
+            queryset.model._base_manager.filter(
+                pk__in=[row["pk"] for row in rows], **{f"{relation}__isnull": False}
+            )
+            .order_by()
+            .values("pk", *lookups.values())
+        )
+        for row in related:
+            for name, lookup in lookups.items():
+                values[name][row["pk"]].append(row[lookup])
+        return values
+
+
+class VariableSerializer(ValuesSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serialize systems Variables.
+
+    Querysets are serialized from their values.
+    """
 
     dataset = serializers.PrimaryKeyRelatedField(read_only=True)
     dataset_name = serializers.SlugRelatedField(
@@ -254,6 +365,7 @@ class VariableSerializer(serializers.HyperlinkedModelSerializer):
             "study",
             "position",
         ]
+        list_serializer_class = ValuesListSerializer
 
 
 class RelatedVariableSerializer(VariableSerializer):
@@ -307,10 +419,14 @@ class StatisticsVariableSerializer(VariableSerializer):
             "topics",
             "topics_de",
         ]
+        list_serializer_class = ValuesListSerializer
+
 
+class QuestionSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    """Serialize systems Variables.
 
-class QuestionSerializer(serializers.ModelSerializer):
-    """Serialize systems Variables."""
+    Querysets are serialized from their values.
+    """
 
     instrument = serializers.PrimaryKeyRelatedField(
         read_only=False, queryset=Instrument.objects.all()
@@ -343,6 +459,7 @@ class QuestionSerializer(serializers.ModelSerializer):
             "study",
             "position",
         ]
+        list_serializer_class = ValuesListSerializer
 
 
 class StudySerializer(serializers.HyperlinkedModelSerializer):
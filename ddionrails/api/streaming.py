@@ -0,0 +1,73 @@
+"""Streamed list responses for ddionrails.api app
+
+Unpaginated lists can be streamed instead of being rendered as a whole.
+Rows are read from the database in chunks and rendered one at a time,
+so neither the time to the first byte nor the memory of a request
+grows with the size of the list.
+"""
+
+from typing import Any, Iterator, Union
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from ddionrails.api.serializers import ValuesSerializerMixin
+
+# Number of rows fetched from the database at once.
+STREAM_CHUNK_SIZE = 1000
+# Content types of the supported values of the "stream" query parameter.
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+class StreamingListMixin:
+    """Stream unpaginated lists if the "stream" query parameter is given.
+
+    With "stream=ndjson" every element is written as a JSON object on a
+    line of its own, with "stream=json" the elements are written as one
+    JSON array, like the unpaginated list response.
+    """
+
+    def list(
+        self, request: Request, *args: Any, **kwargs: Any
+    ) -> Union[Response, StreamingHttpResponse]:
+        """Stream the list or render it as a whole."""
+        stream_format = request.query_params.get("stream", None)
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)  # type: ignore[misc]
+        if stream_format not in STREAM_FORMATS:
+            raise NotAcceptable(
+                detail=f"Stream format must be one of {', '.join(STREAM_FORMATS)}."
+            )
+        queryset = self.filter_queryset(self.get_queryset())  # type: ignore[attr-defined]
+        if self.paginator is not None:  # type: ignore[attr-defined]
+            raise NotAcceptable(detail="Only unpaginated lists can be streamed.")
+        rows = self._render_rows(queryset)
+        if stream_format == "json":
+            rows = _json_array(rows)
+        return StreamingHttpResponse(rows, content_type=STREAM_FORMATS[stream_format])
+
+    def _render_rows(self, queryset: QuerySet) -> Iterator[bytes]:
+        serializer = self.get_serializer()  # type: ignore[attr-defined]
+        renderer = JSONRenderer()
+        if isinstance(serializer, ValuesSerializerMixin):
+            representations = serializer.values_representation(
+                queryset, STREAM_CHUNK_SIZE
+            )
+        else:
+            representations = (
+                serializer.to_representation(instance)
+                for instance in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            )
+        for representation in representations:
+            yield renderer.render(representation) + b"\n"
+
+
+def _json_array(rows: Iterator[bytes]) -> Iterator[bytes]:
+    yield b"["
+    for index, row in enumerate(rows):
+        yield row if index == 0 else b"," + row
+    yield b"]"
@@ -16,6 +16,8 @@ from rest_framework.exceptions import NotAcceptable, PermissionDenied
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from ddionrails.api.caching import ConditionalGetMixin, VersionedResponseCacheMixin
+from ddionrails.api.pagination import KeysetPagination
 from ddionrails.api.serializers import (
     DatasetSerializer,
     RelatedVariableSerializer,
@@ -23,10 +25,12 @@ from ddionrails.api.serializers import (
     VariableLabelsSerializer,
     VariableSerializer,
 )
+from ddionrails.api.streaming import StreamingListMixin
 from ddionrails.api.views.parameters_definition import (
     CONCEPT_PARAMETER,
     DATASET_PARAMETER,
     PAGINATE_PARAMETER,
+    STREAM_PARAMETER,
     STUDY_PARAMETER,
     TOPIC_PARAMETER,
 )
@@ -43,17 +47,24 @@ from ddionrails.studies.models import Study
         DATASET_PARAMETER,
         TOPIC_PARAMETER,
         CONCEPT_PARAMETER,
+        STREAM_PARAMETER,
     ]
 )
-class VariableViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
-    """List metadata about all variables."""
+class VariableViewSet(
+    ConditionalGetMixin,
+    StreamingListMixin,
+    VersionedResponseCacheMixin,
+    viewsets.ModelViewSet,
+):  # pylint: disable=too-many-ancestors
+    """List metadata about all variables.
+
+    Responses are cached until the requested study is imported again.
+    Streamed responses are not cached.
+    """
 
     http_method_names = ["get"]
     serializer_class = VariableSerializer
-
-    @method_decorator(cache_page(60 * 2))
-    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        return super().list(request, *args, **kwargs)
+    keyset_ordering = ("dataset", "sort_id", "id")
 
     def get_queryset(self) -> QuerySet[Variable]:
         topic = self.request.query_params.get("topic", None)
@@ -67,6 +78,8 @@ class VariableViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancest
         paginate = self.request.query_params.get("paginate", "False")
         if paginate == "False":
             self.pagination_class = None
+        elif paginate == "keyset":
+            self.pagination_class = KeysetPagination
 
         queryset_filter: Dict[str, Any] = {}
         if topic and concept:
@@ -120,7 +133,9 @@ class VariableViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancest
 
 
 @extend_schema(exclude=True)
-class VariableLabelsViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
+class VariableLabelsViewSet(
+    ConditionalGetMixin, viewsets.ModelViewSet
+):  # pylint: disable=too-many-ancestors
     """List label metadata about all variables."""
 
     http_method_names = ["get"]
@@ -144,7 +159,7 @@ class VariableLabelsViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-
 
 
 class RelatedVariableViewSet(
-    viewsets.ReadOnlyModelViewSet
+    ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
 ):  # pylint: disable=too-many-ancestors
     """List all variables related to a variable."""
 
@@ -220,12 +235,15 @@ class RelatedVariableViewSet(
         )
 
 
-@extend_schema(parameters=[STUDY_PARAMETER, PAGINATE_PARAMETER])
-class DatasetViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
+@extend_schema(parameters=[STUDY_PARAMETER, PAGINATE_PARAMETER, STREAM_PARAMETER])
+class DatasetViewSet(
+    ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet
+):  # pylint: disable=too-many-ancestors
     """List metadata about all datasets."""
 
     serializer_class = DatasetSerializer
     http_method_names = ["get"]
+    keyset_ordering = ("study", "name")
 
     @method_decorator(cache_page(60 * 60 * 2, cache="dataset_api"))
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -240,6 +258,8 @@ class DatasetViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancesto
         paginate = self.request.query_params.get("paginate", "True")
         if paginate == "False":
             self.pagination_class = None
+        elif paginate == "keyset":
+            self.pagination_class = KeysetPagination
 
         datasets = (
             Dataset.objects.filter(**_filter)
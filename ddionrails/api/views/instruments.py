@@ -17,11 +17,15 @@ from rest_framework.exceptions import NotAcceptable, PermissionDenied
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from ddionrails.api.caching import ConditionalGetMixin
+from ddionrails.api.pagination import KeysetPagination
 from ddionrails.api.serializers import InstrumentSerializer, QuestionSerializer
+from ddionrails.api.streaming import StreamingListMixin
 from ddionrails.api.views.parameters_definition import (
     CONCEPT_PARAMETER,
     INSTRUMENT_PARAMETER,
     PAGINATE_PARAMETER,
+    STREAM_PARAMETER,
     STUDY_PARAMETER,
     TOPIC_PARAMETER,
     VARIABLES_PARAMETER,
@@ -33,7 +37,7 @@ from ddionrails.studies.models import Study
 
 
 @extend_schema(exclude=True)
-class QuestionComparisonViewSet(viewsets.GenericViewSet):
+class QuestionComparisonViewSet(ConditionalGetMixin, viewsets.GenericViewSet):
     """Retrieve question and item metadata combined."""
 
     queryset = Question.objects.none()
@@ -93,13 +97,17 @@ class QuestionComparisonViewSet(viewsets.GenericViewSet):
     parameters=[
         STUDY_PARAMETER,
         PAGINATE_PARAMETER,
+        STREAM_PARAMETER,
     ]
 )
-class InstrumentViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
+class InstrumentViewSet(
+    ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet
+):  # pylint: disable=too-many-ancestors
     """List metadata about all instruments."""
 
     serializer_class = InstrumentSerializer
     http_method_names = ["get"]
+    keyset_ordering = ("study", "name")
 
     @method_decorator(cache_page(60 * 60 * 2, cache="instrument_api"))
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -110,6 +118,8 @@ class InstrumentViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ance
         paginate = self.request.query_params.get("paginate", "True")
         if paginate == "False":
             self.pagination_class = None
+        elif paginate == "keyset":
+            self.pagination_class = KeysetPagination
         if study_name := self.request.query_params.get("study", None):
             _filter["study__name"] = study_name
 
@@ -129,14 +139,18 @@ class InstrumentViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ance
         TOPIC_PARAMETER,
         CONCEPT_PARAMETER,
         VARIABLES_PARAMETER,
+        STREAM_PARAMETER,
     ]
 )
-class QuestionViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
+class QuestionViewSet(
+    ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet
+):  # pylint: disable=too-many-ancestors
     """List metadata about all questions."""
 
     serializer_class = QuestionSerializer
     pagination_class = None
     http_method_names = ["get"]
+    keyset_ordering = ("instrument", "sort_id", "id")
 
     def get_queryset(self):
         topic = self.request.query_params.get("topic", None)
@@ -147,6 +161,8 @@ class QuestionViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancest
 
         if instrument is None and topic is None and concept is None and variables is None:
             raise PermissionDenied()
+        if self.request.query_params.get("paginate", None) == "keyset":
+            self.pagination_class = KeysetPagination
         queryset_filter = {}
 
         if topic and concept:
@@ -5,7 +5,24 @@ from drf_spectacular.utils import OpenApiParameter
 STUDY_PARAMETER = OpenApiParameter(
     "study", description="The name of a study to filter elements to."
 )
-PAGINATE_PARAMETER = OpenApiParameter("paginate", default="True")
+PAGINATE_PARAMETER = OpenApiParameter(
+    "paginate",
+    description=(
+        'Set to "False" for an unpaginated list. '
+        'Set to "keyset" to follow the "next" links of pages of equal cost, '
+        "instead of using limit and offset."
+    ),
+    default="True",
+)
+STREAM_PARAMETER = OpenApiParameter(
+    "stream",
+    description=(
+        "Stream an unpaginated list instead of rendering it as a whole. "
+        'With "ndjson" every element is a JSON object on a line of its own, '
+        'with "json" the elements form a JSON array.'
+    ),
+    enum=["ndjson", "json"],
+)
 DATASET_PARAMETER = OpenApiParameter(
     "dataset",
     description=(
@@ -10,13 +10,14 @@ from rest_framework import viewsets
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from ddionrails.api.caching import ConditionalGetMixin
 from ddionrails.api.serializers import StudySerializer
 from ddionrails.concepts.models import Topic
 from ddionrails.studies.models import Study
 
 
 @extend_schema(exclude=True)
-class TopicTreeViewSet(viewsets.GenericViewSet):
+class TopicTreeViewSet(ConditionalGetMixin, viewsets.GenericViewSet):
     """Retrieve the topic tree of a study from a JSON field."""
 
     queryset = Study.objects.all()
@@ -37,7 +38,7 @@ class TopicTreeViewSet(viewsets.GenericViewSet):
 
 
 @extend_schema(exclude=True)
-class TopicRootAndLeafs(viewsets.GenericViewSet):
+class TopicRootAndLeafs(ConditionalGetMixin, viewsets.GenericViewSet):
     """Return Topics and their leaf nodes."""
 
     queryset = Study.objects.all()
@@ -72,7 +73,7 @@ class TopicRootAndLeafs(viewsets.GenericViewSet):
         return Response(output)
 
 
-class StudyViewSet(viewsets.ModelViewSet):
+class StudyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """List metadata about all studies."""
 
     http_method_names = ["get"]
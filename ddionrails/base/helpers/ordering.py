@@ -0,0 +1,5 @@
+"""Provide ordering functionality for all of ddionrails."""
+
+# Position of null values in an ordering key, after all integers.
+# Indexes of models and keyset pagination have to use the same value.
+NULL_POSITION = 2147483647
@@ -112,6 +112,8 @@ class AnalysisUnitImport(imports.CSVImport):
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = AnalysisUnitForm
 
+    bulk = True
+
     def process_element(self, element):
         element["study"] = self.study.id
         return element
@@ -121,6 +123,8 @@ class PeriodImport(imports.CSVImport):
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = PeriodForm
 
+    bulk = True
+
     def process_element(self, element):
         element["study"] = self.study.id
         return element
@@ -269,13 +269,15 @@ class Period(models.Model, ModelMixin):
         """Returns a string representation using the "name" field"""
         return f"/period/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -352,13 +354,15 @@ class AnalysisUnit(models.Model, ModelMixin):
         """Returns a string representation using the "name" field"""
         return f"/analysis_unit/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
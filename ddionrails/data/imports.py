@@ -3,71 +3,91 @@
 """Importer classes for ddionrails.data app"""
 
 import copy
-import json
+import logging
 import re
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from csv import DictReader
-from functools import lru_cache
 from itertools import permutations
 from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterable, List, Set, Tuple
+from uuid import UUID
 
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 from django.db.transaction import atomic
 
 from ddionrails.concepts.models import AnalysisUnit, Concept, ConceptualDataset, Period
 from ddionrails.data.models.transformation import Sibling
 from ddionrails.imports import imports
-from ddionrails.imports.helpers import hash_with_base_uuid, hash_with_namespace_uuid
+from ddionrails.imports.helpers import (
+    hash_many_with_namespace_uuid,
+    hash_with_base_uuid,
+    hash_with_namespace_uuid,
+    iter_json_items,
+)
 from ddionrails.studies.models import Study
 
 from .forms import DatasetForm, VariableForm
 from .models import Dataset, Transformation, Variable
 
+LOGGER = logging.getLogger(__name__)
+
 
 class DatasetJsonImport(imports.Import):
-    """Import Variable data from JSON files."""
+    """Import Variable data from JSON files.
+
+    The file is streamed and variables are written in batches of ``batch_size``,
+    so memory usage does not depend on the size of the file.
+    """
+
+    batch_size = 5000
+
+    def read_file(self):
+        """Content is streamed from the file during the import."""
 
     def execute_import(self):
-        content = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(self.content)
-        if isinstance(content, dict):
-            content = list(content.values())
-        sort_id = 0
-        datasets = {}
-        variable_names = set()
-        for var in content:
+        datasets: Dict[str, Dataset] = {}
+        batch = []
+        for sort_id, var in enumerate(iter_json_items(self.file_path())):
             dataset_name = var.get("dataset", var.get("dataset_name"))
             if dataset_name not in datasets:
                 dataset, _ = Dataset.objects.get_or_create(
-                    study=self.study, name=var["dataset"]
+                    study=self.study, name=dataset_name
                 )
-                datasets[var["dataset"]] = dataset
-            name = var["name"]
-            variable_names.add(name)
-        existing_variables = {
-            (variable.dataset.name, variable.name): variable
-            for variable in Variable.objects.filter(
-                dataset__study=self.study,
-                dataset__name__in=list(datasets.keys()),
-            ).prefetch_related("dataset")
-        }
+                datasets[dataset_name] = dataset
+            batch.append((var, sort_id, datasets[dataset_name]))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        self._import_batch(batch)
+
+    def _import_batch(self, batch):
+        variable_ids = [
+            hash_with_namespace_uuid(dataset.id, var["name"], cache=False)
+            for var, _, dataset in batch
+        ]
+        existing_variables = set(
+            Variable.objects.filter(id__in=variable_ids).values_list("id", flat=True)
+        )
         variables_to_create = []
         variables_to_update = []
-        for var in content:
-            name = (var["dataset"], var["name"])
-            if name in existing_variables:
-                variable = self._update_variable(var, sort_id, existing_variables[name])
-
+        for (var, sort_id, dataset), variable_id in zip(batch, variable_ids):
+            if variable_id in existing_variables:
+                variable = self._update_variable(
+                    var,
+                    sort_id,
+                    Variable(id=variable_id, name=var["name"], dataset=dataset),
+                )
                 variables_to_update.append(variable)
             else:
-                variable = self._import_variable(var, sort_id, datasets[var["dataset"]])
+                variable = self._import_variable(var, sort_id, dataset)
                 variables_to_create.append(variable)
-            sort_id += 1
         Variable.objects.bulk_update(
             variables_to_update,
             fields=("sort_id", "label", "label_de", "statistics", "categories", "scale"),
-            batch_size=5000,
+            batch_size=self.batch_size,
         )
-        Variable.objects.bulk_create(variables_to_create, batch_size=5000)
+        Variable.objects.bulk_create(variables_to_create, batch_size=self.batch_size)
 
     @staticmethod
     def _update_variable(var, sort_id, variable_object):
@@ -171,14 +191,38 @@ class DatasetImport(imports.CSVImport):
 
 
 class VariableImport(imports.CSVImport):
-    """Import Variable data from csv file."""
+    """Import Variable data from csv file.
+
+    Datasets, concepts and already existing variables are loaded once per import.
+    Changes are written with bulk_update and bulk_create.
+    The duration of every phase is stored in ``timings``.
+    """
 
     harmonized_suffix = re.compile(r".*_h$")
     is_harmonized_suffix = re.compile(r".*_v\d+$")
+    batch_size = 5000
+    update_fields = (
+        "concept",
+        "period",
+        "long_variable",
+        "harmonization",
+        "is_harmonized",
+        "description",
+        "description_de",
+        "description_long",
+        "statistics_type",
+        "statistics_flag",
+        "label",
+        "label_de",
+    )
 
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = VariableForm
 
+    def __init__(self, filename, study=None, system=None):
+        super().__init__(filename, study, system)
+        self.timings: Dict[str, float] = {}
+
     def import_element(self, element):
         variable_metadata = element
         if "name" not in variable_metadata.keys():
@@ -189,21 +233,105 @@ class VariableImport(imports.CSVImport):
         self._import_variable(variable_metadata)
 
     def execute_import(self):
+        start = perf_counter()
+        rows = []
         for row in self.content:
-            self.import_element(row)
+            if "name" not in row.keys():
+                row["name"] = row.get("variable_name", "")
+            if row["name"] == "":
+                raise ValueError(f"Variable has no name {row}")
+            rows.append(row)
+        self._log_timing("read", start)
+
+        start = perf_counter()
+        datasets = self._get_datasets(rows)
+        concepts = self._get_concepts(rows)
+        existing_variables = {
+            variable.id: variable
+            for variable in Variable.objects.filter(
+                dataset_id__in=[dataset.id for dataset in datasets.values()]
+            ).only(
+                "id",
+                "name",
+                "dataset_id",
+                "label",
+                "label_de",
+                "concept_id",
+                "long_variable",
+                "harmonization",
+                "is_harmonized",
+            )
+        }
+        self._log_timing("lookup", start)
+
+        start = perf_counter()
+        variables_to_create: Dict[UUID, Variable] = {}
+        variables_to_update: Dict[UUID, Variable] = {}
+        for row in rows:
+            dataset = datasets[row.get("dataset", row.get("dataset_name"))]
+            variable_id = hash_with_namespace_uuid(dataset.id, row["name"], cache=False)
+            if variable_id in existing_variables:
+                variable = existing_variables[variable_id]
+                variables_to_update[variable_id] = variable
+            elif variable_id in variables_to_create:
+                variable = variables_to_create[variable_id]
+            else:
+                variable = Variable(id=variable_id, name=row["name"], dataset=dataset)
+                variables_to_create[variable_id] = variable
+            self._set_variable_fields(variable, row, dataset, concepts)
+        self._log_timing("prepare", start)
 
-    def _import_variable(self, element):
-        dataset = Dataset.objects.get(
-            study=self.study, name=element.get("dataset", element.get("dataset_name"))
+        start = perf_counter()
+        Variable.objects.bulk_update(
+            variables_to_update.values(),
+            fields=self.update_fields,
+            batch_size=self.batch_size,
         )
-        variable, _ = Variable.objects.get_or_create(
-            dataset=dataset, dataset__study=self.study, name=element["name"]
+        self._log_timing("update", start)
+
+        start = perf_counter()
+        Variable.objects.bulk_create(
+            variables_to_create.values(), batch_size=self.batch_size
         )
+        self._log_timing("create", start)
+
+    def _get_datasets(self, rows) -> Dict[str, Dataset]:
+        dataset_names = {row.get("dataset", row.get("dataset_name")) for row in rows}
+        datasets = {
+            dataset.name: dataset
+            for dataset in Dataset.objects.filter(
+                study=self.study, name__in=dataset_names
+            ).select_related("period")
+        }
+        missing = dataset_names.difference(datasets.keys())
+        if missing:
+            raise Dataset.DoesNotExist(
+                f"Datasets {sorted(missing, key=str)} of study {self.study} do not exist"
+            )
+        return datasets
+
+    @staticmethod
+    def _get_concepts(rows) -> Dict[str, Concept]:
+        concept_names = {row.get("concept", row.get("concept_name", "")) for row in rows}
+        concept_names.discard("")
+        concepts = {
+            concept.name: concept
+            for concept in Concept.objects.filter(name__in=concept_names).only(
+                "id", "name"
+            )
+        }
+        missing = concept_names.difference(concepts.keys())
+        if missing:
+            raise Concept.DoesNotExist(f"Concepts {sorted(missing)} do not exist")
+        return concepts
+
+    def _set_variable_fields(self, variable, element, dataset, concepts):
         concept_name = element.get("concept", element.get("concept_name", ""))
         if concept_name != "":
-            concept = Concept.objects.get(name=concept_name)
-            variable.concept = concept
-        if dataset.period.name == "0":
+            variable.concept = concepts[concept_name]
+        # Variable.save sets the period from the dataset.
+        variable.period_id = dataset.period_id
+        if dataset.period is not None and dataset.period.name == "0":
             variable.long_variable = True
             if self.harmonized_suffix.match(variable.name):
                 variable.harmonization = True
@@ -218,120 +346,204 @@ class VariableImport(imports.CSVImport):
             variable.label = element.get("label", "")
         if not variable.label_de:
             variable.label_de = element.get("label_de", "")
-        variable.save()
-
-
-@lru_cache(30000)
-def _get_element_id(study_name, dataset_name, variable_name):
-    return hash_with_namespace_uuid(
-        hash_with_namespace_uuid(
-            _get_study_id(study_name),
-            dataset_name,
-            cache=True,
-        ),
-        variable_name,
-        cache=True,
-    )
 
+    def _log_timing(self, phase: str, start: float) -> None:
+        self.timings[phase] = perf_counter() - start
+        LOGGER.info(
+            'Variable import of "%s" phase "%s" took %.3fs',
+            self.study,
+            phase,
+            self.timings[phase],
+        )
 
-@lru_cache(100)
-def _get_study_id(study__name: str):
-    return hash_with_base_uuid(study__name)
+    def _import_variable(self, element):
+        dataset = Dataset.objects.select_related("period").get(
+            study=self.study, name=element.get("dataset", element.get("dataset_name"))
+        )
+        variable, _ = Variable.objects.get_or_create(
+            dataset=dataset, dataset__study=self.study, name=element["name"]
+        )
+        concept_name = element.get("concept", element.get("concept_name", ""))
+        concepts = {}
+        if concept_name != "":
+            concepts[concept_name] = Concept.objects.get(name=concept_name)
+        self._set_variable_fields(variable, element, dataset, concepts)
+        variable.save()
 
 
 class TransformationImport(imports.CSVImport):
-    """Import Object relations from the transformations.csv file."""
+    """Import Object relations from the transformations.csv file.
+
+    The siblings of the long variables of new transformations are created as well.
+    """
 
     @atomic
     def execute_import(self):
-        existing_transformations = {
-            (transformation.origin.id, transformation.target.id)
-            for transformation in Transformation.objects.filter(
+        existing_transformations = set(
+            Transformation.objects.filter(
                 Q(origin__dataset__study=self.study)
                 | Q(target__dataset__study=self.study)
-            )
+            ).values_list("origin_id", "target_id")
+        )
+        elements = list(self.content)
+        origin_ids = _variable_ids(elements, "origin")
+        target_ids = _variable_ids(elements, "target")
+        transformations = [
+            Transformation(origin_id=origin_id, target_id=target_id)
+            for origin_id, target_id in zip(origin_ids, target_ids)
+            if (origin_id, target_id) not in existing_transformations
+        ]
+        if not transformations:
+            return
+        Transformation.objects.bulk_create(transformations, batch_size=5000)
+        changed_ids = {
+            variable_id
+            for transformation in transformations
+            for variable_id in (transformation.origin_id, transformation.target_id)
         }
-        transformations = []
+        update_siblings(
+            long_variable_id
+            for long_variable_id in _long_variables(self.study)
+            if long_variable_id in changed_ids
+        )
 
-        for element in self.content:
-            origin_id = _get_element_id(
-                element["origin_study_name"],
-                element["origin_dataset_name"],
-                element["origin_variable_name"],
-            )
-            target_id = _get_element_id(
-                element["target_study_name"],
-                element["target_dataset_name"],
-                element["target_variable_name"],
-            )
-            if (origin_id, target_id) in existing_transformations:
-                continue
-            transformations.append(
-                Transformation(origin_id=origin_id, target_id=target_id)
-            )
-        if transformations:
-            Transformation.objects.bulk_create(transformations, batch_size=5000)
+
+def _variable_ids(elements: List[Dict[str, str]], prefix: str) -> List[UUID]:
+    """Compute the ids of the variables referenced with a column prefix."""
+    dataset_ids = hash_many_with_namespace_uuid(
+        (
+            hash_with_base_uuid(element[f"{prefix}_study_name"]),
+            element[f"{prefix}_dataset_name"],
+        )
+        for element in elements
+    )
+    return hash_many_with_namespace_uuid(
+        zip(dataset_ids, (element[f"{prefix}_variable_name"] for element in elements))
+    )
 
 
-def variables_images_import(file: Path, study: Study) -> None:
-    "Initiate imports of all question images"
+def variables_images_import(file: Path, study: Study, batch_size: int = 1000) -> None:
+    """Initiate imports of all variable images
+
+    Variable ids are computed from the study, dataset and variable names,
+    so a single query is enough to check, that all variables exist.
+    """
     if not file.exists():
         return
+    variables: Dict[UUID, Variable] = {}
+    rows: Dict[UUID, Dict[str, str]] = {}
     with open(file, "r", encoding="utf8") as csv:
-        reader = DictReader(csv)
-        variables: list[Variable] = []
-        for row in reader:
-            try:
-                variable = Variable.objects.get(
-                    dataset__study=study,
-                    dataset__name=row["dataset"],
-                    name=row["variable"],
-                )
-            except Variable.DoesNotExist as error:
-                raise Variable.DoesNotExist(f"Variable {row} does not exist") from error
-            variable.images = {
-                "de": row["url_de"],
-                "en": row["url"],
-            }
-            variables.append(variable)
-        if variables:
-            Variable.objects.bulk_update(variables, ["images"], batch_size=1000)
+        for row in DictReader(csv):
+            dataset_id = hash_with_namespace_uuid(study.id, row["dataset"])
+            variable_id = hash_with_namespace_uuid(
+                dataset_id, row["variable"], cache=False
+            )
+            variables[variable_id] = Variable(
+                id=variable_id, images={"de": row["url_de"], "en": row["url"]}
+            )
+            rows[variable_id] = row
+    existing_ids = set(
+        Variable.objects.filter(id__in=variables.keys()).values_list("id", flat=True)
+    )
+    missing = [
+        row for variable_id, row in rows.items() if variable_id not in existing_ids
+    ]
+    if missing:
+        raise Variable.DoesNotExist(
+            "Variables do not exist:\n" + "\n".join(str(row) for row in missing)
+        )
+    Variable.objects.bulk_update(variables.values(), ["images"], batch_size=batch_size)
 
 
 @atomic
-def siblings_generation(_: Path, study: Study):
+def siblings_generation(_: Path, study: Study, batch_size: int = 5000):
     """Create relations between variables related to the same harmonized variable
 
     This is unique to variables created at SOEP
 
+    Regenerates the relations of all long variables of the study and removes
+    outdated ones. Imports keep the relations up to date with update_siblings,
+    so this is only needed to repair them.
+    """
+    siblings = _sibling_pairs(_long_variables(study))
+
+    existing_siblings: Dict[Tuple[UUID, UUID], List[int]] = defaultdict(list)
+    for sibling_id, sibling_a_id, sibling_b_id in Sibling.objects.filter(
+        sibling_a__dataset__study=study
+    ).values_list("id", "sibling_a_id", "sibling_b_id"):
+        existing_siblings[(sibling_a_id, sibling_b_id)].append(sibling_id)
+
+    # Duplicated relations are removed together with outdated ones.
+    outdated_ids = [
+        sibling_id
+        for pair, sibling_ids in existing_siblings.items()
+        for sibling_id in (sibling_ids if pair not in siblings else sibling_ids[1:])
+    ]
+    for index in range(0, len(outdated_ids), batch_size):
+        Sibling.objects.filter(id__in=outdated_ids[index : index + batch_size]).delete()
+
+    Sibling.objects.bulk_create(
+        [
+            Sibling(sibling_a_id=sibling_a_id, sibling_b_id=sibling_b_id)
+            for sibling_a_id, sibling_b_id in siblings.difference(existing_siblings)
+        ],
+        batch_size=batch_size,
+    )
+
+
+def update_siblings(long_variable_ids: Iterable[UUID], batch_size: int = 5000):
+    """Create the missing relations of the given long variables.
+
+    Only the transformations of the given long variables and the relations of
+    the variables transformed from or to them are read. Imports only add
+    transformations, so the groups of the long variables only grow and none of
+    their relations become outdated.
     """
-    Sibling.objects.filter(sibling_a__dataset__study=study).delete()
+    siblings = _sibling_pairs(list(long_variable_ids))
+    if not siblings:
+        return
+    variable_ids = list({sibling_a_id for sibling_a_id, _ in siblings})
+    existing_siblings: Set[Tuple[UUID, UUID]] = set()
+    for index in range(0, len(variable_ids), batch_size):
+        existing_siblings.update(
+            Sibling.objects.filter(
+                sibling_a_id__in=variable_ids[index : index + batch_size]
+            ).values_list("sibling_a_id", "sibling_b_id")
+        )
+    Sibling.objects.bulk_create(
+        [
+            Sibling(sibling_a_id=sibling_a_id, sibling_b_id=sibling_b_id)
+            for sibling_a_id, sibling_b_id in siblings.difference(existing_siblings)
+        ],
+        batch_size=batch_size,
+    )
 
-    long_variables = Variable.objects.filter(
+
+def _long_variables(study: Study) -> QuerySet:
+    """The ids of the long variables of a study, which harmonize other variables."""
+    return Variable.objects.filter(
         dataset__period__name="0", dataset__study=study, name__endswith="_h"
-    ).prefetch_related("origin_variables", "target_variables")
-    siblings: list[Sibling] = []
+    ).values_list("id", flat=True)
+
+
+def _sibling_pairs(long_variables: Iterable[UUID]) -> Set[Tuple[UUID, UUID]]:
+    """Pairs of variables sharing one of the long variables as origin or target.
 
+    All transformations of the long variables are read with a single query and
+    grouped in memory.
+    """
+    long_variable_ids = set(long_variables)
     harmonized_suffix = re.compile(r".*_v/d+$")
 
-    for long_variable in long_variables.all():
-        target_transformations = long_variable.target_variables.all().distinct()
-        origin_transformations = long_variable.origin_variables.all().distinct()
-        target_variables = [variable.target for variable in target_transformations]
-        origin_variables_variables = [
-            variable.origin for variable in origin_transformations
-        ]
-        for variables in (target_variables, origin_variables_variables):
-            if not variables:
-                continue
-            for pair in permutations(variables, 2):
-                sibling_relation = Sibling()
-                sibling_relation.sibling_a, sibling_relation.sibling_b = pair
-
-                if harmonized_suffix.search(pair[0].name) or harmonized_suffix.search(
-                    pair[1].name
-                ):
-                    continue
-                siblings.append(sibling_relation)
-
-    Sibling.objects.bulk_create(siblings)
+    # Variables sharing a long variable as their origin or as their target.
+    groups: Dict[Tuple[UUID, str], List[UUID]] = defaultdict(list)
+    transformations = Transformation.objects.filter(
+        Q(origin_id__in=long_variables) | Q(target_id__in=long_variables)
+    ).values_list("origin_id", "origin__name", "target_id", "target__name")
+    for origin_id, origin_name, target_id, target_name in transformations.iterator():
+        if origin_id in long_variable_ids and not harmonized_suffix.search(target_name):
+            groups[(origin_id, "targets")].append(target_id)
+        if target_id in long_variable_ids and not harmonized_suffix.search(origin_name):
+            groups[(target_id, "origins")].append(origin_id)
+
+    return {pair for variables in groups.values() for pair in permutations(variables, 2)}
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 22:45
+# pylint: disable-all
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("concepts", "0002_auto_20201016_0842"),
+        ("data", "0006_remove_variable_image_url"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="variable",
+            index=models.Index(
+                models.F("dataset"),
+                django.db.models.functions.comparison.Coalesce(
+                    "sort_id", models.Value(2147483647)
+                ),
+                models.F("id"),
+                name="variable_keyset_idx",
+            ),
+        ),
+    ]
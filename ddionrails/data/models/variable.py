@@ -9,13 +9,16 @@ from copy import deepcopy
 from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Union
 
 from django.db import models
+from django.db.models import F
 from django.db.models import JSONField as JSONBField
-from django.db.models import QuerySet
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils.functional import cached_property
 
 from config.helpers import render_markdown
+from ddionrails.base.helpers.ordering import NULL_POSITION
 from ddionrails.base.mixins import ModelMixin
 from ddionrails.concepts.models import Concept, Period
 from ddionrails.imports.helpers import hash_with_namespace_uuid
@@ -174,6 +177,15 @@ class Variable(ModelMixin, models.Model):
 
     class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
         unique_together = ("name", "dataset")
+        indexes = [
+            # Ordering key of the keyset pagination of the API.
+            models.Index(
+                F("dataset"),
+                Coalesce("sort_id", Value(NULL_POSITION)),
+                F("id"),
+                name="variable_keyset_idx",
+            )
+        ]
 
     class DOR(ModelMixin.DOR):  # pylint: disable=missing-docstring,too-few-public-methods
         id_fields = ["name", "dataset"]
@@ -353,4 +365,3 @@ class Variable(ModelMixin, models.Model):
                 )
             )
         return self.name < name
-
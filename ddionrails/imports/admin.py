@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""ModelAdmin definitions for ddionrails.imports app"""
+
+from django.contrib import admin
+
+from .models import ImportRun
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    """ModelAdmin for imports.ImportRun"""
+
+    list_display = (
+        "study_name",
+        "entity",
+        "file",
+        "started",
+        "duration",
+        "rows_read",
+        "rows_created",
+        "rows_updated",
+        "rows_deleted",
+        "process_peak_mib",
+        "failed",
+        "job_id",
+    )
+    list_filter = ("study_name", "entity", "failed")
+    search_fields = ("run", "file", "job_id")
+    date_hierarchy = "started"
+    raw_id_fields = ("study",)
+    list_per_page = 100
+
+    @staticmethod
+    def process_peak_mib(obj: ImportRun):
+        """Peak memory of the whole importing process up to the end of this step.
+
+        This is ru_maxrss, it is never lower than the peak of an earlier step
+        in the same process and not the memory used by this step alone.
+        """
+        if obj.process_peak_memory is None:
+            return None
+        return round(obj.process_peak_memory / 1024, 1)
+
+    process_peak_mib.short_description = "process peak MiB (since process start)"
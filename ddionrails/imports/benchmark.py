@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the study import with generated study metadata"""
+
+import csv
+import json
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from django.db import connection
+from django.db.models import Sum
+
+from ddionrails.imports.manager import RowCounter, StudyImportManager
+from ddionrails.imports.models import ImportRun
+from ddionrails.studies.models import Study
+
+ANALYSIS_UNITS = ("person", "household")
+ANSWERS = ((1, "Yes", "Ja"), (2, "No", "Nein"), (-1, "No answer", "Keine Angabe"))
+
+
+@dataclass
+class SyntheticStudy:  # pylint: disable=too-many-instance-attributes
+    """Scale of a generated study and writer for its import files.
+
+    The files have the layout that StudyImportManager expects in the import
+    path of a study. All names are derived from running numbers, so the same
+    scale always produces the same files.
+    """
+
+    name: str = "benchmark"
+    datasets: int = 50
+    variables: int = 10000
+    instruments: int = 10
+    questions: int = 2000
+    items: int = 2
+    transformations: int = 10000
+    concepts: int = 1000
+    topics: int = 50
+    periods: int = 5
+    publications: int = 100
+
+    def write(self, path: Path) -> None:
+        """Write all import files of the study into path."""
+        path.mkdir(parents=True, exist_ok=True)
+        path.joinpath("study.md").write_text(
+            f"---\nname: {self.name}\nlabel: Synthetic {self.name} study\n---\n\n"
+            "Study metadata generated for import benchmarks.\n",
+            encoding="utf8",
+        )
+        self._write_csv(path / "topics.csv", self._topics())
+        self._write_json(path / "topics.json", self._topic_tree())
+        self._write_csv(path / "concepts.csv", self._concepts())
+        self._write_csv(
+            path / "analysis_units.csv",
+            (self._labelled(name) for name in ANALYSIS_UNITS),
+        )
+        self._write_csv(
+            path / "periods.csv",
+            (self._labelled(self.period(index)) for index in range(self.periods)),
+        )
+        self._write_csv(
+            path / "conceptual_datasets.csv",
+            (
+                self._labelled(self.conceptual_dataset(index))
+                for index in range(self.periods)
+            ),
+        )
+        self._write_csv(path / "instruments.csv", self._instruments())
+        path.joinpath("instruments").mkdir(exist_ok=True)
+        for instrument in range(self.instruments):
+            self._write_json(
+                path / "instruments" / f"{self.instrument(instrument)}.json",
+                self._instrument_json(instrument),
+            )
+        self._write_csv(path / "questions.csv", self._question_items())
+        self._write_csv(path / "answers.csv", self._answers())
+        self._write_csv(path / "datasets.csv", self._datasets())
+        path.joinpath("datasets").mkdir(exist_ok=True)
+        for dataset in range(self.datasets):
+            self._write_json(
+                path / "datasets" / f"{self.dataset(dataset)}.json",
+                [
+                    self._variable_json(variable)
+                    for variable in self._variables_of(dataset)
+                ],
+            )
+        self._write_csv(path / "variables.csv", self._variables())
+        self._write_csv(path / "questions_variables.csv", self._questions_variables())
+        self._write_csv(path / "transformations.csv", self._transformations())
+        self._write_csv(path / "publications.csv", self._publications())
+        self._write_csv(path / "attachments.csv", self._attachments())
+
+    def concept(self, index: int) -> str:
+        """Name of a concept. Concepts are not bound to a study."""
+        return f"{self.name}-concept-{index % self.concepts}"
+
+    @staticmethod
+    def topic(index: int) -> str:
+        """Name of a topic."""
+        return f"topic-{index}"
+
+    @staticmethod
+    def period(index: int) -> str:
+        """Name of a period."""
+        return str(2000 + index)
+
+    @staticmethod
+    def conceptual_dataset(index: int) -> str:
+        """Name of a conceptual dataset, one for each period."""
+        return f"conceptual-dataset-{index}"
+
+    @staticmethod
+    def instrument(index: int) -> str:
+        """Name of an instrument."""
+        return f"instrument-{index}"
+
+    @staticmethod
+    def dataset(index: int) -> str:
+        """Name of a dataset."""
+        return f"dataset-{index}"
+
+    def _labelled(self, name: str) -> Dict[str, Any]:
+        return {
+            "study": self.name,
+            "name": name,
+            "label": f"Label of {name}",
+            "label_de": f"Label von {name}",
+            "description": f"Description of {name}",
+            "description_de": f"Beschreibung von {name}",
+        }
+
+    def _topics(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.topics):
+            parent = self.topic((index - 1) // 2) if index else ""
+            yield {**self._labelled(self.topic(index)), "parent": parent}
+
+    def _topic_tree(self) -> List[Dict[str, Any]]:
+        def _branch(index: int, label: str) -> Dict[str, Any]:
+            children = [
+                _branch(child, label)
+                for child in (2 * index + 1, 2 * index + 2)
+                if child < self.topics
+            ]
+            children += [
+                {
+                    "title": f"{label} {self.concept(concept)}",
+                    "key": f"concept_{self.concept(concept)}",
+                    "type": "concept",
+                }
+                for concept in range(index, self.concepts, self.topics)
+            ]
+            return {
+                "title": f"{label} {self.topic(index)}",
+                "key": f"topic_{self.topic(index)}",
+                "type": "topic",
+                "children": children,
+            }
+
+        if not self.topics:
+            return []
+        return [
+            {"language": "en", "topics": [_branch(0, "Label of")]},
+            {"language": "de", "topics": [_branch(0, "Label von")]},
+        ]
+
+    def _concepts(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.concepts):
+            topic = self.topic(index % self.topics) if self.topics else ""
+            yield {**self._labelled(self.concept(index)), "topic": topic}
+
+    def _instruments(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.instruments):
+            yield {
+                **self._labelled(self.instrument(index)),
+                "analysis_unit": ANALYSIS_UNITS[0],
+                "period": self.period(index % self.periods),
+                "mode": "CAPI",
+                "type": "Questionnaire",
+                "type_de": "Fragebogen",
+                "type_position": index,
+            }
+
+    def _questions_of(self, instrument: int) -> range:
+        return range(instrument, self.questions, self.instruments)
+
+    def _items_of(self, question: int) -> Iterator[Dict[str, Any]]:
+        instrument = self.instrument(question % self.instruments)
+        for item in range(self.items):
+            categorical = item == 0
+            yield {
+                "study": self.name,
+                "instrument": instrument,
+                "name": f"q{question}",
+                "item": str(item),
+                "text": f"Text of item {item} of q{question}",
+                "text_de": f"Text von Item {item} von q{question}",
+                "instruction": "",
+                "instruction_de": "",
+                "description": "",
+                "description_de": "",
+                "filter": "",
+                "goto": "",
+                "scale": "cat" if categorical else "txt",
+                "answer_list": "yes-no" if categorical else "",
+                "concept": self.concept(question),
+            }
+
+    def _instrument_json(self, instrument: int) -> Dict[str, Any]:
+        questions = {}
+        for sort_id, question in enumerate(self._questions_of(instrument)):
+            items = []
+            for item in self._items_of(question):
+                item_json = {
+                    "item": item["item"],
+                    "text": item["text"],
+                    "text_de": item["text_de"],
+                    "scale": item["scale"],
+                    "sn": int(item["item"]),
+                }
+                if item["scale"] == "cat":
+                    item_json["answers"] = [
+                        {"value": value, "label": label, "label_de": label_de}
+                        for value, label, label_de in ANSWERS
+                    ]
+                items.append(item_json)
+            questions[f"q{question}"] = {
+                "question": f"q{question}",
+                "name": f"q{question}",
+                "label": f"Label of q{question}",
+                "label_de": f"Label von q{question}",
+                "sn": sort_id,
+                "items": items,
+            }
+        name = self.instrument(instrument)
+        return {
+            "study": self.name,
+            "name": name,
+            "instrument": name,
+            "label": f"Label of {name}",
+            "label_de": f"Label von {name}",
+            "analysis_unit": ANALYSIS_UNITS[0],
+            "period": self.period(instrument % self.periods),
+            "questions": questions,
+        }
+
+    def _question_items(self) -> Iterator[Dict[str, Any]]:
+        for instrument in range(self.instruments):
+            for question in self._questions_of(instrument):
+                yield from self._items_of(question)
+
+    def _answers(self) -> Iterator[Dict[str, Any]]:
+        for instrument in range(self.instruments):
+            for value, label, label_de in ANSWERS:
+                yield {
+                    "study": self.name,
+                    "instrument": self.instrument(instrument),
+                    "answer_list": "yes-no",
+                    "value": value,
+                    "label": label,
+                    "label_de": label_de,
+                }
+
+    def _datasets(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.datasets):
+            yield {
+                **self._labelled(self.dataset(index)),
+                "analysis_unit": ANALYSIS_UNITS[index % 2],
+                "period": self.period(index % self.periods),
+                "conceptual_dataset": self.conceptual_dataset(index % self.periods),
+                "folder": "data",
+                "primary_key": "v0",
+            }
+
+    def _variables_of(self, dataset: int) -> range:
+        return range(dataset, self.variables, self.datasets)
+
+    def _variable(self, variable: int) -> Dict[str, Any]:
+        return {
+            "study": self.name,
+            "dataset": self.dataset(variable % self.datasets),
+            "name": f"v{variable // self.datasets}",
+        }
+
+    def _variable_json(self, variable: int) -> Dict[str, Any]:
+        return {
+            **self._variable(variable),
+            "label": f"Label of variable {variable}",
+            "label_de": f"Label von Variable {variable}",
+            "scale": "cat",
+            "categories": {
+                "values": [str(value) for value, _, _ in ANSWERS],
+                "labels": [label for _, label, _ in ANSWERS],
+                "labels_de": [label_de for _, _, label_de in ANSWERS],
+                "frequencies": [variable, 2 * variable, 1],
+                "missings": [False, False, True],
+            },
+            "statistics": {"valid": str(3 * variable), "invalid": "1"},
+        }
+
+    def _variables(self) -> Iterator[Dict[str, Any]]:
+        for dataset in range(self.datasets):
+            for variable in self._variables_of(dataset):
+                yield {
+                    **self._variable(variable),
+                    "label": f"Label of variable {variable}",
+                    "label_de": f"Label von Variable {variable}",
+                    "description": "",
+                    "description_de": "",
+                    "concept": self.concept(variable),
+                }
+
+    def _questions_variables(self) -> Iterator[Dict[str, Any]]:
+        for question in range(min(self.questions, self.variables)):
+            variable = self._variable(question)
+            yield {
+                "study": self.name,
+                "dataset": variable["dataset"],
+                "variable": variable["name"],
+                "instrument": self.instrument(question % self.instruments),
+                "question": f"q{question}",
+            }
+
+    def _transformations(self) -> Iterator[Dict[str, Any]]:
+        # Every pair is unique as long as there are fewer transformations than
+        # ordered pairs of different variables.
+        for index in range(self.transformations):
+            origin = index % self.variables
+            target = (origin + 1 + index // self.variables) % self.variables
+            origin_variable = self._variable(origin)
+            target_variable = self._variable(target)
+            yield {
+                "origin_study_name": self.name,
+                "origin_dataset_name": origin_variable["dataset"],
+                "origin_variable_name": origin_variable["name"],
+                "target_study_name": self.name,
+                "target_dataset_name": target_variable["dataset"],
+                "target_variable_name": target_variable["name"],
+            }
+
+    def _publications(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.publications):
+            yield {
+                "study": self.name,
+                "name": str(index),
+                "title": f"Publication {index}",
+                "author": "Some Author",
+                "year": 2000 + index % 25,
+                "abstract": "",
+                "cite": f"Some Author ({2000 + index % 25}): Publication {index}",
+                "type": "article",
+                "studies": self.name,
+                "url": f"https://example.com/publication/{index}",
+                "doi": "",
+            }
+
+    def _attachments(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.datasets):
+            yield {
+                "type": "dataset",
+                "study": self.name,
+                "dataset": self.dataset(index),
+                "variable": "",
+                "instrument": "",
+                "question": "",
+                "url": f"https://example.com/{self.dataset(index)}",
+                "url_text": f"Documentation of {self.dataset(index)}",
+            }
+
+    @staticmethod
+    def _write_csv(path: Path, rows: Iterable[Dict[str, Any]]) -> None:
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None:
+            return
+        with open(path, "w", encoding="utf8", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(first_row))
+            writer.writeheader()
+            writer.writerow(first_row)
+            writer.writerows(rows)
+
+    @staticmethod
+    def _write_json(path: Path, content: Any) -> None:
+        with open(path, "w", encoding="utf8") as json_file:
+            json.dump(content, json_file, ensure_ascii=False)
+
+
+@dataclass
+class EntityBenchmark:  # pylint: disable=too-many-instance-attributes
+    """Measurements of the import of one entity."""
+
+    entity: str
+    seconds: float
+    queries: int
+    files: int = 0
+    rows_read: Optional[int] = None
+    rows_created: int = 0
+    rows_updated: int = 0
+    rows_deleted: int = 0
+    error: Optional[str] = None
+    failed_files: List[str] = field(default_factory=list)
+
+
+def run_import_benchmark(
+    study: Study, entities: Optional[Iterable[str]] = None
+) -> List[EntityBenchmark]:
+    """Import the entities of a study one after another and measure each import.
+
+    Time and query counts are taken around the whole entity import. Files and
+    row counts come from the ImportRun entries of the import. An error does not
+    stop the benchmark, it is stored with the entity.
+    """
+    manager = StudyImportManager(study, redis=False)
+    manager.fit_id_cache()
+    results = []
+    for entity in entities or list(manager.import_order):
+        counter = RowCounter()
+        error = None
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                manager.import_single_entity(entity)
+        except Exception:  # pylint: disable=broad-except
+            error = traceback.format_exc()
+        result = EntityBenchmark(
+            entity, perf_counter() - start, counter.queries, error=error
+        )
+        import_runs = ImportRun.objects.filter(run=manager.run, entity=entity)
+        totals = import_runs.aggregate(
+            rows_read=Sum("rows_read"),
+            rows_created=Sum("rows_created"),
+            rows_updated=Sum("rows_updated"),
+            rows_deleted=Sum("rows_deleted"),
+        )
+        result.files = import_runs.count()
+        result.rows_read = totals["rows_read"]
+        result.rows_created = totals["rows_created"] or 0
+        result.rows_updated = totals["rows_updated"] or 0
+        result.rows_deleted = totals["rows_deleted"] or 0
+        result.failed_files = list(
+            import_runs.filter(failed=True).values_list("file", flat=True)
+        )
+        results.append(result)
+    return results
@@ -1,13 +1,40 @@
 """Tools to handle git related actions"""
 
+import csv
+import json
+from io import StringIO
 from pathlib import Path
 from shutil import rmtree
+from typing import Any, Iterable, Iterator, Optional, Set, Tuple
 
 from django.conf import settings
-from git import Repo
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
 
 from ddionrails.studies.models import Study
 
+# Columns that identify the row of an import CSV file, all other columns hold
+# values that an import updates in place.
+KEY_COLUMNS = frozenset(
+    {
+        "study",
+        "study_name",
+        "dataset",
+        "dataset_name",
+        "instrument",
+        "instrument_name",
+        "question",
+        "question_name",
+        "variable",
+        "variable_name",
+        "name",
+        "item",
+        "answer_list",
+        "value",
+    }
+)
+# Fields that identify the objects in lists of import JSON files.
+KEY_FIELDS = ("name", "variable", "question", "item", "value")
+
 
 # TODO: Add unittests pylint: disable=fixme
 def clean_repo_url(url: str) -> str:
@@ -24,24 +51,201 @@ def clean_repo_url(url: str) -> str:
 
 
 def set_up_repo(study: Study) -> Path:
-    """Initialize repo or get it to desired current state"""
-    repo_base_path = Path(settings.IMPORT_REPO_PATH)
-    study_repo_path = repo_base_path.joinpath(study.name)
+    """Initialize repo or get it to desired current state
+
+    A bare mirror of the study repository is kept under IMPORT_REPO_PATH and
+    only updated with fetch. The commit at the pinned reference, or the default
+    branch, is checked out into a worktree at the import location of the study.
+    """
+    study_repo_path = _study_repo_path(study)
+    mirror = _update_mirror(study)
+    commit = mirror.git.rev_parse(f"{study.pin_reference or 'HEAD'}^{{commit}}")
 
-    # Can't pull with shallow repo so we delete and clone most current as shallow.
-    # We skip this when repo is pinned and current since full history pull is slow.
+    if _is_worktree_of(study_repo_path, mirror):
+        worktree = Repo(study_repo_path)
+        worktree.git.checkout("--force", "--detach", commit)
+        worktree.git.clean("-ffdx")
+        return study_repo_path
+
+    # Remove checkouts that are no worktree of the mirror, e.g. old full clones.
     if study_repo_path.exists():
-        repo = Repo(study_repo_path)
         rmtree(study_repo_path)
+    mirror.git.worktree("prune")
+    mirror.git.worktree("add", "--force", "--detach", str(study_repo_path), commit)
+    return study_repo_path
+
+
+def _is_worktree_of(path: Path, mirror: Repo) -> bool:
+    if not path.joinpath(".git").is_file():
+        return False
+    try:
+        worktree = Repo(path)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return False
+    return Path(worktree.common_dir).resolve() == Path(mirror.git_dir).resolve()
+
+
+def _update_mirror(study: Study) -> Repo:
+    """Fetch into the mirror of the study repository or clone it if necessary."""
+    mirror_path = _mirror_path(study)
+    try:
+        mirror = Repo(mirror_path)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return _clone_mirror(study)
+    try:
+        mirror.git.fetch("--prune", "origin")
+    except GitCommandError:
+        try:
+            mirror.git.fsck("--connectivity-only", "--no-dangling")
+        except GitCommandError:
+            return _clone_mirror(study)
+        raise
+    return mirror
+
+
+def _clone_mirror(study: Study) -> Repo:
+    mirror_path = _mirror_path(study)
+    if mirror_path.exists():
+        rmtree(mirror_path)
+    return Repo.clone_from(url=study.repo_url(), to_path=mirror_path, mirror=True)
+
+
+def _mirror_path(study: Study) -> Path:
+    return Path(settings.IMPORT_REPO_PATH).joinpath(".mirrors", f"{study.name}.git")
+
+
+def head_commit(study: Study) -> Optional[str]:
+    """Return the commit hash currently checked out for the study."""
+    try:
+        return Repo(_study_repo_path(study)).head.commit.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+        return None
+
 
-    if study.pin_reference:
-        Repo.clone_from(url=study.repo_url(), to_path=study_repo_path)
+def record_import_commit(study_name: str, commit: str) -> None:
+    """Remember the commit the metadata of the study was last imported from."""
+    Study.objects.filter(name=study_name).update(current_commit=commit)
+
+
+def changed_files(
+    study: Study, replaced_files: Iterable[Path] = ()
+) -> Optional[Set[Path]]:
+    """Files of the import directory changed since the last imported commit.
+
+    Imports only add and update content. Returns None if the changes can not
+    be determined, if files were deleted or renamed, or if rows or objects were
+    removed from a file that is not one of the given replaced_files, whose import
+    deletes the content missing from them. These changes can only be handled
+    by a full import. Rows and objects are told apart by their keys, so that
+    changed values are updated by an incremental import.
+    """
+    if not study.current_commit:
+        return None
+    study_repo_path = _study_repo_path(study)
+    try:
         repo = Repo(study_repo_path)
-        repo.git.checkout(study.pin_reference)
-        study.current_commit = repo.head.object.hexsha
-        study.save()
-        return study_repo_path
+        head = repo.head.commit.hexsha
+        if head == study.current_commit:
+            return set()
+        try:
+            repo.git.cat_file("-e", f"{study.current_commit}^{{commit}}")
+        except GitCommandError:
+            # The commit might no longer be part of the fetched history.
+            repo.git.fetch("origin", study.current_commit, depth=1)
+        diff_arguments = (
+            "--no-renames",
+            study.current_commit,
+            head,
+            "--",
+            settings.IMPORT_SUB_DIRECTORY,
+        )
+        diff = repo.git.diff("--name-status", *diff_arguments)
+        line_counts = repo.git.diff("--numstat", *diff_arguments)
+        files = set()
+        for line in diff.splitlines():
+            status, file_name = line.split("\t", 1)
+            if status not in ("A", "M"):
+                return None
+            files.add(study_repo_path.joinpath(file_name))
+        replaced_files = {Path(file).resolve() for file in replaced_files}
+        for line in line_counts.splitlines():
+            _, removed_lines, file_name = line.split("\t", 2)
+            # Changed lines are counted as removed lines as well.
+            if removed_lines == "0":
+                continue
+            if study_repo_path.joinpath(file_name).resolve() in replaced_files:
+                continue
+            if _removes_keys(
+                repo.git.show(f"{study.current_commit}:{file_name}"),
+                repo.git.show(f"{head}:{file_name}"),
+                Path(file_name).suffix,
+            ):
+                return None
+    except (GitCommandError, InvalidGitRepositoryError, NoSuchPathError, ValueError):
+        return None
+    return files
 
-    Repo.clone_from(url=study.repo_url(), to_path=study_repo_path, depth=1)
 
-    return study_repo_path
+def _removes_keys(old_content: str, new_content: str, suffix: str) -> bool:
+    """Whether rows or objects of a file are missing from its new content.
+
+    Files that are neither CSV nor JSON are compared line by line.
+    """
+    if suffix == ".csv":
+        old_keys, new_keys = _csv_keys(old_content), _csv_keys(new_content)
+    elif suffix == ".json":
+        old_keys = set(_json_keys(json.loads(old_content)))
+        new_keys = set(_json_keys(json.loads(new_content)))
+    else:
+        old_keys, new_keys = set(old_content.splitlines()), set(new_content.splitlines())
+    return not old_keys <= new_keys
+
+
+def _csv_keys(content: str) -> Set[Tuple[str, ...]]:
+    """The columns and the key columns of the rows of a CSV file.
+
+    All columns are used as key of files without any of the KEY_COLUMNS.
+    """
+    reader = csv.reader(StringIO(content))
+    header = next(reader, [])
+    key_indices = [index for index, name in enumerate(header) if name in KEY_COLUMNS]
+    if not key_indices:
+        key_indices = list(range(len(header)))
+    keys = {("column", name) for name in header}
+    for row in reader:
+        keys.add(
+            ("row",)
+            + tuple(row[index] if index < len(row) else "" for index in key_indices)
+        )
+    return keys
+
+
+def _json_keys(content: Any, path: Tuple[str, ...] = ()) -> Iterator[Tuple[str, ...]]:
+    """The paths of all object fields and list entries of a JSON document.
+
+    Objects in lists are identified by their KEY_FIELDS, other entries by
+    their position.
+    """
+    if isinstance(content, dict):
+        entries = ((str(key), value) for key, value in content.items())
+    elif isinstance(content, list):
+        entries = (
+            (_json_list_key(value, index), value) for index, value in enumerate(content)
+        )
+    else:
+        return
+    for key, value in entries:
+        yield path + (key,)
+        yield from _json_keys(value, path + (key,))
+
+
+def _json_list_key(value: Any, index: int) -> str:
+    if isinstance(value, dict):
+        key = {field: value[field] for field in KEY_FIELDS if field in value}
+        if key:
+            return json.dumps(key, sort_keys=True, default=str)
+    return str(index)
+
+
+def _study_repo_path(study: Study) -> Path:
+    return Path(settings.IMPORT_REPO_PATH).joinpath(study.name)
@@ -1,19 +1,30 @@
 # -*- coding: utf-8 -*-
 
-""" Helper functions for ddionrails.imports app """
+"""Helper functions for ddionrails.imports app"""
 
 import csv
+import json
 import os
 import uuid
-from functools import lru_cache
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple, Union
 
 from django.conf import settings
 from django.core.cache import caches
 
 
 def clear_caches():
-    """Clear all caches."""
+    """Clear all caches except the versioned API response cache."""
+    # Imported here, the api app depends on the models using this module.
+    from ddionrails.api.caching import (  # pylint: disable=import-outside-toplevel
+        CACHE_NAME,
+    )
+
     for cache in settings.CACHES.keys():
+        if cache == CACHE_NAME:
+            continue
         _cache = caches[cache]
         _cache.clear()
 
@@ -29,16 +40,225 @@ def read_csv(filename, path=None):
     return content
 
 
+def split_csv(file_path: Path, directory: Path, rows: int) -> List[Path]:
+    """Split a CSV file into files of at most ``rows`` rows inside of directory.
+
+    Every chunk repeats the header of the file. A file that is not larger than
+    one chunk is returned as it is.
+    """
+    with open(file_path, "r", encoding="utf8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader, None)
+        chunk: List[List[str]] = []
+        chunks: List[Path] = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == rows:
+                chunks.append(
+                    _write_chunk(file_path, directory, len(chunks), header, chunk)
+                )
+                chunk = []
+        if not chunks:
+            return [file_path]
+        if chunk:
+            chunks.append(_write_chunk(file_path, directory, len(chunks), header, chunk))
+    return chunks
+
+
+def _write_chunk(
+    file_path: Path, directory: Path, index: int, header, rows: List[List[str]]
+) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    chunk_path = directory.joinpath(f"{file_path.stem}.{index:05d}{file_path.suffix}")
+    with open(chunk_path, "w", encoding="utf8", newline="") as chunk_file:
+        writer = csv.writer(chunk_file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return chunk_path
+
+
+def iter_json_items(
+    file_path: Union[Path, str], chunk_size: int = 2**16
+) -> Iterator[Any]:
+    """Yield the elements of a top level JSON array or the values of a JSON object.
+
+    The file is read incrementally, so only a single element and the read buffer
+    are held in memory at any time.
+    """
+    with open(file_path, "r", encoding="utf8") as file:
+        stream = _JSONStream(file, chunk_size)
+        container = stream.next_character()
+        if container not in ("[", "{"):
+            raise ValueError(f"Expected a JSON array or object in {file_path}")
+        closing = "]" if container == "[" else "}"
+        stream.consume()
+        if stream.next_character() == closing:
+            return
+        while True:
+            if container == "{":
+                stream.decode()
+                stream.expect(":")
+            yield stream.decode()
+            if stream.next_character() == closing:
+                return
+            stream.expect(",")
+
+
+class _JSONStream:
+    """Read buffer to decode consecutive JSON values from a file."""
+
+    def __init__(self, file: TextIO, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+        self.decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+
+    def _read(self) -> bool:
+        if self.exhausted:
+            return False
+        # Reading at least the current buffer size keeps repeated decoding of
+        # large values linear.
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            self.exhausted = True
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def next_character(self) -> str:
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in (
+                " \t\n\r"
+            ):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                raise ValueError("Unexpected end of JSON content")
+
+    def consume(self) -> None:
+        """Skip the next character."""
+        self.next_character()
+        self.position += 1
+
+    def expect(self, character: str) -> None:
+        """Consume the next character, which has to be the given one."""
+        found = self.next_character()
+        if found != character:
+            raise ValueError(f"Expected {character!r} in JSON content, got {found!r}")
+        self.position += 1
+
+    def decode(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.next_character()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            # A number at the end of the buffer might continue in the next chunk.
+            if end == len(self.buffer) and self._read():
+                continue
+            self.position = end
+            return value
+
+
+class UUIDCache:
+    """Bounded least recently used cache for deterministic uuid5 ids.
+
+    Counts hits and misses, so that imports can report how well the cache fits
+    the size of a study.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._ids: OrderedDict[Tuple[uuid.UUID, str], uuid.UUID] = OrderedDict()
+        self._lock = Lock()
+
+    def resolve(self, namespace: uuid.UUID, name: str) -> uuid.UUID:
+        """Get the uuid5 of a name inside of a namespace."""
+        key = (namespace, name)
+        with self._lock:
+            if key in self._ids:
+                self.hits += 1
+                self._ids.move_to_end(key)
+                return self._ids[key]
+            self.misses += 1
+            self._ids[key] = uuid.uuid5(namespace, name)
+            if len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+            return self._ids[key]
+
+    def resolve_many(
+        self, namespaced_names: Iterable[Tuple[uuid.UUID, str]]
+    ) -> List[uuid.UUID]:
+        """Get the uuid5 ids of many names inside of their namespaces at once."""
+        # Consume the names first, they might be computed with this cache as well.
+        keys = list(namespaced_names)
+        ids = []
+        cached_ids = self._ids
+        with self._lock:
+            for key in keys:
+                if key in cached_ids:
+                    self.hits += 1
+                    cached_ids.move_to_end(key)
+                    ids.append(cached_ids[key])
+                    continue
+                self.misses += 1
+                ids.append(uuid.uuid5(*key))
+                cached_ids[key] = ids[-1]
+                if len(cached_ids) > self.maxsize:
+                    cached_ids.popitem(last=False)
+        return ids
+
+    def fit(self, expected_ids: int) -> None:
+        """Size the cache for the expected number of ids within its configured bounds."""
+        self.resize(
+            min(
+                settings.IMPORT_ID_CACHE_MAX_SIZE,
+                max(settings.IMPORT_ID_CACHE_SIZE, expected_ids),
+            )
+        )
+
+    def resize(self, maxsize: int) -> None:
+        """Change the maximum number of cached ids."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all ids and reset the counters."""
+        with self._lock:
+            self._ids.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Counters of the cache for the import log."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._ids),
+            "maxsize": self.maxsize,
+        }
+
+
+ID_CACHE = UUIDCache(maxsize=settings.IMPORT_ID_CACHE_SIZE)
+
+
 def hash_with_base_uuid(name: str, cache: bool = True) -> uuid.UUID:
     """Compute the model instance's UUID from its name and the base UUID"""
     if cache:
-        return _hash_with_base_uuid(name)
-    return uuid.uuid5(settings.BASE_UUID, name)
-
-
-@lru_cache(maxsize=1000)
-def _hash_with_base_uuid(name: str) -> uuid.UUID:
-    """Computes results for hash_with_base_uuid with an lru cache enabled."""
+        return ID_CACHE.resolve(settings.BASE_UUID, name)
     return uuid.uuid5(settings.BASE_UUID, name)
 
 
@@ -50,11 +270,12 @@ def hash_with_namespace_uuid(
     A namespace, in this instance, is defined by the UUID of a related model instance.
     """
     if cache:
-        return _hash_with_namespace_uuid(namespace, name)
+        return ID_CACHE.resolve(namespace, name)
     return uuid.uuid5(namespace, name)
 
 
-@lru_cache(maxsize=1000)
-def _hash_with_namespace_uuid(namespace: uuid.UUID, name: str) -> uuid.UUID:
-    """Computes results for hash_with_namespace_uuid with an lru cache enabled."""
-    return uuid.uuid5(namespace, name)
+def hash_many_with_namespace_uuid(
+    namespaced_names: Iterable[Tuple[uuid.UUID, str]],
+) -> List[uuid.UUID]:
+    """Compute the UUIDs of many names inside of their namespaces in one call."""
+    return ID_CACHE.resolve_many(namespaced_names)
@@ -2,19 +2,23 @@
 
 """ Importer base classes for ddionrails project """
 
+import logging
 import os
 from pathlib import Path
-from typing import Iterable, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
 
 import frontmatter
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction
+from django.db.models import Field, Model
 from django.forms import Form
 
 from ddionrails.studies.models import Study
 
 from .helpers import read_csv
 
+LOGGER = logging.getLogger(__name__)
+
 
 class Import:
     """
@@ -91,15 +95,40 @@ class CSVImport(Import):
     **Abstract class.**
 
     To use it, implement the ``process_element()`` method.
+
+    Importers, which set ``bulk`` and do not override ``import_element()``,
+    validate all rows at once and write them with bulk operations.
     """
 
+    bulk = False
+    batch_size = 5000
+
+    def __init__(
+        self,
+        filename: Union[Path, str],
+        study: Study = None,
+        system=None,
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ):
+        super().__init__(filename, study, system)
+        self.progress_callback = progress_callback
+        self.invalid_rows: List[Tuple[int, Dict[str, List[str]]]] = []
+
     def read_file(self):
         self.content: Iterable = read_csv(self.file_path())
 
     def execute_import(self):
+        if self.bulk:
+            self.import_elements(self.content)
+            return
         for element in self.content:
             self.import_element(element)
 
+    def report_progress(self, count: int) -> None:
+        """Pass the number of imported rows to the progress callback."""
+        if self.progress_callback:
+            self.progress_callback(count)
+
     def import_element(self, element):
         form = self.DOR.form
         element = self.process_element(element)
@@ -119,9 +148,144 @@ class CSVImport(Import):
         form.full_clean()  # type: ignore
         if form.is_valid():  # type: ignore
             new_object = form.save()  # type: ignore
-            print(".", end="")
+            self.report_progress(1)
             return new_object
         return None
 
+    def import_elements(self, elements: Iterable[Dict[str, Any]]) -> List[Model]:
+        """Validate all elements at once and create or update them in bulk.
+
+        Related objects and existing objects are loaded with one query each.
+        Invalid rows are skipped, collected in ``invalid_rows`` and logged together.
+        Like with the forms of ``import_element()``, values are stripped and
+        existing objects keep their values of fields with a default,
+        which are missing from their row.
+        """
+        model = self.DOR.form.Meta.model  # type: ignore
+        fields = [model._meta.get_field(name) for name in self.DOR.form.Meta.fields]
+        id_fields = [model._meta.get_field(name) for name in model.DOR.id_fields]
+        form_fields = self.DOR.form.base_fields  # type: ignore
+        # The forms only normalize the field names of the rows here.
+        rows = [
+            {
+                key: value.strip() if isinstance(value, str) else value
+                for key, value in self.DOR.form(
+                    self.process_element(element)
+                ).data.items()
+            }
+            for element in elements
+        ]
+        related_objects = {
+            field.name: _related_objects(field, rows)
+            for field in fields
+            if field.is_relation
+        }
+
+        objects: Dict[Tuple[Any, ...], Model] = {}
+        row_fields: Dict[Tuple[Any, ...], Tuple[str, ...]] = {}
+        # Line one of the file is the header.
+        for line, row in enumerate(rows, start=2):
+            instance, errors = self._build_instance(model, fields, row, related_objects)
+            if errors:
+                self.invalid_rows.append((line, errors))
+                continue
+            key = tuple(getattr(instance, field.attname) for field in id_fields)
+            objects[key] = instance
+            row_fields[key] = tuple(
+                field.name
+                for field in fields
+                if field not in id_fields
+                and not (
+                    field.has_default()
+                    and form_fields[field.name].widget.value_omitted_from_data(
+                        row, {}, field.name
+                    )
+                )
+            )
+        self._log_invalid_rows()
+
+        existing_ids = {
+            tuple(values[:-1]): values[-1]
+            for values in model.objects.filter(
+                **{
+                    f"{field.attname}__in": {key[index] for key in objects}
+                    for index, field in enumerate(id_fields)
+                }
+            ).values_list(*[field.attname for field in id_fields], "pk")
+        }
+        new_objects = []
+        # Objects to update, grouped by the fields to update.
+        objects_to_update: Dict[Tuple[str, ...], List[Model]] = {}
+        for key, instance in objects.items():
+            if key in existing_ids:
+                instance.pk = existing_ids[key]
+                objects_to_update.setdefault(row_fields[key], []).append(instance)
+                continue
+            if hasattr(instance, "generate_id"):
+                instance.pk = instance.generate_id()
+            new_objects.append(instance)
+
+        for update_fields, instances in objects_to_update.items():
+            if update_fields:
+                model.objects.bulk_update(
+                    instances, update_fields, batch_size=self.batch_size
+                )
+        self.report_progress(sum(map(len, objects_to_update.values())))
+        model.objects.bulk_create(new_objects, batch_size=self.batch_size)
+        self.report_progress(len(new_objects))
+        return list(objects.values())
+
+    @staticmethod
+    def _build_instance(
+        model: Type[Model],
+        fields: List[Field],
+        row: Dict[str, Any],
+        related_objects: Dict[str, Dict[Any, Model]],
+    ) -> Tuple[Model, Dict[str, List[str]]]:
+        instance = model()
+        errors: Dict[str, List[str]] = {}
+        relations = []
+        for field in fields:
+            value = row.get(field.name)
+            if field.is_relation:
+                relations.append(field.name)
+                related_object = related_objects[field.name].get(value)
+                if related_object is None and value not in (None, ""):
+                    errors[field.name] = [f"{value} does not exist."]
+                elif related_object is None and not field.null:
+                    errors[field.name] = ["This field cannot be null."]
+                setattr(instance, field.name, related_object)
+            elif value is not None:
+                setattr(instance, field.attname, value)
+        try:
+            instance.full_clean(
+                exclude=relations, validate_unique=False, validate_constraints=False
+            )
+        except ValidationError as error:
+            errors.update(error.message_dict)
+        return instance, errors
+
+    def _log_invalid_rows(self) -> None:
+        if not self.invalid_rows:
+            return
+        LOGGER.warning(
+            'Skipped %s invalid rows of "%s":\n%s',
+            len(self.invalid_rows),
+            self.basename,
+            "\n".join(f"line {line}: {errors}" for line, errors in self.invalid_rows),
+        )
+
     def process_element(self, element):
         return element
+
+
+def _related_objects(field: Field, rows: List[Dict[str, Any]]) -> Dict[Any, Model]:
+    """Load the objects referenced by a relation field of all rows in one query."""
+    keys = {}
+    for value in {row.get(field.name) for row in rows} - {None, ""}:
+        try:
+            keys[value] = field.target_field.to_python(value)
+        except ValidationError:
+            continue
+    objects = field.related_model._default_manager.in_bulk(set(keys.values()))
+    return {value: objects[key] for value, key in keys.items() if key in objects}
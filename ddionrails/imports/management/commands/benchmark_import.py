@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+""" "Benchmark import" management command for ddionrails project"""
+
+import json
+import sys
+from contextlib import redirect_stdout
+from dataclasses import asdict, fields
+from pathlib import Path
+from shutil import rmtree
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from ddionrails.concepts.models import Concept
+from ddionrails.imports.benchmark import SyntheticStudy, run_import_benchmark
+from ddionrails.imports.helpers import ID_CACHE
+from ddionrails.studies.models import Study
+
+
+class Command(BaseCommand):
+    """Benchmark the import of a generated study via management command."""
+
+    help = (
+        "Generate a synthetic study, import every entity of it into the configured "
+        "database and write timings and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        defaults = SyntheticStudy()
+        for scale in fields(SyntheticStudy):
+            parser.add_argument(
+                f"--{scale.name.replace('_', '-')}",
+                type=scale.type,
+                default=getattr(defaults, scale.name),
+                help=f"Default: {getattr(defaults, scale.name)}",
+            )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=Path,
+            default=None,
+            help="Write the results to this file instead of stdout.",
+        )
+        parser.add_argument(
+            "-k",
+            "--keep",
+            action="store_true",
+            default=False,
+            help="Keep the imported study and the generated files.",
+        )
+
+    def handle(self, *args, **options):
+        synthetic_study = SyntheticStudy(
+            **{scale.name: options[scale.name] for scale in fields(SyntheticStudy)}
+        )
+        repo_path = settings.IMPORT_REPO_PATH.joinpath(synthetic_study.name)
+        if Study.objects.filter(name=synthetic_study.name).exists() or repo_path.exists():
+            self.stderr.write(
+                self.style.ERROR(f'Study "{synthetic_study.name}" already exists.')
+            )
+            sys.exit(1)
+
+        study = Study.objects.create(name=synthetic_study.name)
+        started = timezone.now()
+        try:
+            start = perf_counter()
+            synthetic_study.write(study.import_path())
+            generation_seconds = perf_counter() - start
+            # Keep output of the importers out of the results on stdout.
+            with redirect_stdout(sys.stderr):
+                results = run_import_benchmark(study)
+        finally:
+            if options["keep"]:
+                self.stderr.write(f"Kept generated files in {repo_path}")
+            else:
+                study.delete()
+                Concept.objects.filter(
+                    name__startswith=f"{synthetic_study.name}-concept-"
+                ).delete()
+                rmtree(repo_path, ignore_errors=True)
+
+        report = {
+            "started": started.isoformat(),
+            "database": connection.vendor,
+            "scale": asdict(synthetic_study),
+            "generation_seconds": generation_seconds,
+            "import_seconds": sum(result.seconds for result in results),
+            "queries": sum(result.queries for result in results),
+            "id_cache": ID_CACHE.stats(),
+            "entities": [asdict(result) for result in results],
+        }
+        content = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(content + "\n", encoding="utf8")
+        else:
+            self.stdout.write(content)
+        failed = [result.entity for result in results if result.error]
+        if failed:
+            self.stderr.write(self.style.ERROR(f"Failed imports: {', '.join(failed)}"))
+            sys.exit(1)
+        return None
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+""" "Import runs" management command for ddionrails project"""
+
+from typing import List, Optional
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+
+from ddionrails.imports.models import ImportRun
+
+COLUMNS = (
+    ("entity", 24),
+    ("file", 32),
+    ("seconds", 9),
+    ("read", 9),
+    ("created", 9),
+    ("updated", 9),
+    ("deleted", 9),
+    ("rows/s", 9),
+    ("proc. MiB", 9),
+    ("job", 36),
+)
+
+
+class Command(BaseCommand):
+    """Show the recorded imports via management command."""
+
+    help = (
+        "Show timing, row counts and memory of the latest import runs. "
+        "The memory column is the peak resident memory of the importing process "
+        "since its start, not the memory of a single file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_name", type=str, nargs="?", default=None)
+        parser.add_argument(
+            "-r",
+            "--runs",
+            type=int,
+            default=1,
+            help="Number of import runs to show, starting with the latest.",
+        )
+
+    def handle(self, *args, **options):
+        import_runs = ImportRun.objects.all()
+        if options["study_name"]:
+            import_runs = import_runs.filter(study_name=options["study_name"])
+        runs = (
+            import_runs.values("run")
+            .annotate(first_start=Min("started"))
+            .order_by("-first_start")
+            .values_list("run", flat=True)[: options["runs"]]
+        )
+        runs = list(runs)
+        if not runs:
+            self.stdout.write(self.style.WARNING("No import runs recorded."))
+            return None
+        for run in runs:
+            self.report(list(import_runs.filter(run=run).order_by("started", "id")))
+        return None
+
+    def report(self, import_runs: List[ImportRun]) -> None:
+        """Print one table row per imported file and a total row."""
+        first = import_runs[0]
+        self.stdout.write(
+            self.style.SUCCESS(f"Import run {first.run} of {first.study_name}")
+        )
+        self.write_row([name for name, _ in COLUMNS])
+        for import_run in import_runs:
+            self.write_row(
+                [
+                    import_run.entity + (" (failed)" if import_run.failed else ""),
+                    import_run.file.rsplit("/", 1)[-1],
+                    _seconds(import_run),
+                    _number(import_run.rows_read),
+                    import_run.rows_created,
+                    import_run.rows_updated,
+                    import_run.rows_deleted,
+                    _number(import_run.rows_per_second),
+                    _number(
+                        import_run.process_peak_memory
+                        and import_run.process_peak_memory / 1024
+                    ),
+                    import_run.job_id,
+                ]
+            )
+        finished = [run.finished for run in import_runs if run.finished]
+        wall_time = (max(finished) - first.started).total_seconds() if finished else None
+        peak_memory = max((run.process_peak_memory or 0) for run in import_runs)
+        self.write_row(
+            [
+                "total",
+                f"{len(import_runs)} files",
+                _number(wall_time),
+                _number(sum(run.rows_read or 0 for run in import_runs)),
+                sum(run.rows_created for run in import_runs),
+                sum(run.rows_updated for run in import_runs),
+                sum(run.rows_deleted for run in import_runs),
+                "",
+                _number(peak_memory / 1024),
+                "",
+            ]
+        )
+        self.stdout.write(
+            "proc. MiB: peak memory of the importing process since its start "
+            "(ru_maxrss), not of a single file."
+        )
+
+    def write_row(self, values: list) -> None:
+        """Print values aligned to the widths of the table columns."""
+        cells = [
+            str(value)[:width].ljust(width) for value, (_, width) in zip(values, COLUMNS)
+        ]
+        self.stdout.write(" ".join(cells).rstrip())
+
+
+def _seconds(import_run: ImportRun) -> str:
+    if import_run.duration is None:
+        return "-"
+    return _number(import_run.duration.total_seconds())
+
+
+def _number(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, int):
+        return str(value)
+    return f"{value:.1f}"
@@ -4,15 +4,19 @@
 
 import sys
 from pathlib import Path
+from typing import List
+from uuid import UUID
 
 from django.core.cache import caches
-from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django_rq.queues import enqueue
+from rq.job import Job
 
-from ddionrails.imports.git_repos import set_up_repo
+from ddionrails.api.caching import set_study_version
+from ddionrails.imports.git_repos import changed_files, set_up_repo
 from ddionrails.imports.helpers import clear_caches
 from ddionrails.imports.manager import StudyImportManager
+from ddionrails.imports.models import ImportRun
 from ddionrails.studies.models import Study
 from ddionrails.workspace.models import Basket, BasketVariable
 
@@ -31,6 +35,13 @@ class Command(BaseCommand):
             local: Set this flag to suppress updating from GitHub (optional).
             filename: The filename of a single file, only used in combination
                       with a single 'entity' (optional).
+            incremental: Only import entities affected by files changed since
+                         the last import (optional).
+            resume: Continue an interrupted import run of the study, given by its
+                    id or the latest run if no id is given (optional).
+            staged: Import the study completely into a staging schema and publish
+                    it once all entities are imported, implies clean-import
+                    (optional).
         """
 
     def add_arguments(self, parser):
@@ -58,6 +69,45 @@ class Command(BaseCommand):
             help="Do not queue jobs with redis.",
             default=False,
         )
+        parser.add_argument(
+            "-i",
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only import entities affected by files changed "
+                "since the last imported commit."
+            ),
+            default=False,
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            help=(
+                "Number of processes to import independent entities in parallel. "
+                "Only used together with --no-redis."
+            ),
+            default=1,
+        )
+        parser.add_argument(
+            "--resume",
+            nargs="?",
+            const="latest",
+            default=None,
+            help=(
+                "Continue an import run and skip its completed steps. "
+                "Without a run id, the latest run of the study is continued."
+            ),
+        )
+        parser.add_argument(
+            "--staged",
+            action="store_true",
+            help=(
+                "Import into a staging schema and replace the study content "
+                "once all entities are imported. Implies --clean-import."
+            ),
+            default=False,
+        )
         return super().add_arguments(parser)
 
     def handle(self, *_, **options):
@@ -79,10 +129,12 @@ class Command(BaseCommand):
         self.stderr.write(self.style.ERROR(message))
 
 
-def update_study_partial(manager: StudyImportManager, entity: tuple):
+def update_study_partial(manager: StudyImportManager, entity: tuple) -> List[Job]:
     """Update only selected entities for study"""
+    jobs = []
     for single_entity in entity:
-        manager.import_single_entity(single_entity)
+        jobs.extend(manager.import_single_entity(single_entity))
+    return jobs
 
 
 def update(options) -> tuple[str | None, str | None]:
@@ -97,10 +149,24 @@ def update(options) -> tuple[str | None, str | None]:
     filename = options["filename"]
     clean_import = options["clean_import"]
     redis = not options["no_redis"]
+    workers = options["workers"]
+    incremental = options["incremental"]
+    resume = options["resume"]
+    staged = options["staged"]
+    clean_import = clean_import or staged
 
     # if no study_name is given, update all studies
+    if study_name == "all" and resume:
+        return (None, "Only the import of a single study can be resumed.")
     if study_name == "all":
-        update_all_studies_completely(local, clean_import, redis=redis)
+        update_all_studies_completely(
+            local,
+            clean_import,
+            redis=redis,
+            workers=workers,
+            incremental=incremental,
+            staged=staged,
+        )
         return ("Updating all studies", None)
 
     # if study_name is given, select study from database or exit
@@ -109,8 +175,16 @@ def update(options) -> tuple[str | None, str | None]:
     except Study.DoesNotExist:
         return (None, f'Study "{study_name}" does not exist.')
 
+    run = None
+    if resume:
+        run = _run_to_resume(study_name, resume)
+        if run is None:
+            return (None, f'Study "{study_name}" has no import run "{resume}".')
+        # A resumed run continues on the same checkout and must not remove content.
+        local, clean_import, incremental, staged = True, False, False, False
+
     # if one or more entities are given, validate all are available
-    manager = StudyImportManager(study, redis=redis)
+    manager = StudyImportManager(study, redis=redis, workers=workers, run=run)
     for single_entity in entity:
         if single_entity not in manager.import_order:
             return (None, f'Entity "{single_entity}" does not exist.')
@@ -119,15 +193,39 @@ def update(options) -> tuple[str | None, str | None]:
         out = ", ".join(entity.intersection({"datasets.json", "instruments.json"}))
         return (None, f'Support for single file import not available for entity "{out}".')
 
-    update_single_study(
-        study, local, tuple(entity), filename, clean_import, manager=manager
+    jobs = update_single_study(
+        study,
+        local,
+        tuple(entity),
+        filename,
+        clean_import,
+        manager=manager,
+        incremental=incremental,
+        staged=staged,
     )
 
     if redis:
-        enqueue(clear_caches)
+        enqueue(clear_caches, depends_on=jobs or None)
+    failed = manager.failed_files()
+    if failed:
+        return (
+            None,
+            f"Failed to import {len(failed)} files: "
+            + ", ".join(result.file.name for result in failed),
+        )
     return ("Done", None)
 
 
+def _run_to_resume(study_name: str, resume: str) -> UUID | None:
+    import_runs = ImportRun.objects.filter(study_name=study_name)
+    if resume != "latest":
+        try:
+            import_runs = import_runs.filter(run=UUID(resume))
+        except ValueError:
+            return None
+    return import_runs.order_by("-started").values_list("run", flat=True).first()
+
+
 def _clear_all_caches():
     caches["default"].clear()
     caches["instrument_api"].clear()
@@ -142,31 +240,94 @@ def update_single_study(  # pylint: disable=R0913,R0917
     filename: str = None,
     clean_import=False,
     manager: StudyImportManager = None,
-) -> None:
-    """Update a single study"""
-    backup_file = Path()
-    if clean_import:
-        backup_file = Basket.backup()
-        study.delete()
-        study.save()
+    incremental=False,
+    staged=False,
+) -> List[Job]:
+    """Update a single study
+
+    A staged clean import keeps the current content of the study online
+    until the new content is completely imported.
+    Every queued step only starts after the steps it depends on succeeded.
+    Returns the last queued jobs, for further jobs to depend on.
+    """
+    if incremental and not clean_import and not entity:
+        jobs = update_study_incrementally(study, local, manager)
+        if jobs is not None:
+            return _publish_update(study, manager, jobs)
+        # The repository is already up to date.
+        local = True
+    preserved_file = None
+    if clean_import and not staged:
+        with Basket.preserve(study) as preserved_file:
+            study.delete()
+            study.save()
     if not local:
         set_up_repo(study)
-    if not entity:
-        manager.import_all_entities()
+    if not entity and clean_import and staged:
+        jobs = manager.record_commit(depends_on=manager.import_all_entities_staged())
+    elif not entity:
+        jobs = manager.record_commit(depends_on=manager.import_all_entities())
     elif filename:
-        manager.import_single_entity(entity[0], filename)
+        jobs = manager.import_single_entity(entity[0], filename)
     else:
-        update_study_partial(manager, entity)
+        jobs = update_study_partial(manager, entity)
+    jobs = manager.remove_chunks(depends_on=jobs)
+
+    if preserved_file is not None:
+        jobs = [
+            enqueue(BasketVariable.relink, preserved_file, depends_on=jobs or None)
+        ]
+    return _publish_update(study, manager, jobs)
 
-    if backup_file.is_file():
-        enqueue(call_command, "loaddata", backup_file)
-        enqueue(BasketVariable.clean_basket_variables, study.name)
-    enqueue(_clear_all_caches)
 
+def _publish_update(
+    study: Study, manager: StudyImportManager, jobs: List[Job]
+) -> List[Job]:
+    """Renew the cached responses of the study once the update is imported.
 
-def update_all_studies_completely(local: bool, clean_import=False, redis=True) -> None:
+    The cached pages are cleared before the version changes, so that no
+    outdated page is served with the validators of the new version.
+    """
+    clear_job = enqueue(_clear_all_caches, depends_on=jobs or None)
+    return [
+        enqueue(set_study_version, study.name, manager.run.hex, depends_on=[clear_job])
+    ]
+
+
+def update_study_incrementally(
+    study: Study, local: bool, manager: StudyImportManager
+) -> List[Job] | None:
+    """Import only the entities affected by changes since the last imported commit.
+
+    Returns the last queued jobs of the import, or None if the changes could not
+    be determined or could have removed content, and a full import is needed.
+    """
+    if not local:
+        set_up_repo(study)
+    files = changed_files(study, manager.replaced_files())
+    if files is None:
+        return None
+    jobs = manager.record_commit(depends_on=manager.import_changed_files(files))
+    return manager.remove_chunks(depends_on=jobs)
+
+
+def update_all_studies_completely(  # pylint: disable=R0913,R0917
+    local: bool,
+    clean_import=False,
+    redis=True,
+    workers=1,
+    incremental=False,
+    staged=False,
+) -> None:
     """Update all studies in the database"""
     for study in Study.objects.all():
-        manager = StudyImportManager(study, redis=redis)
-        update_single_study(study, local, clean_import=clean_import, manager=manager)
+        manager = StudyImportManager(study, redis=redis, workers=workers)
+        update_single_study(
+            study,
+            local,
+            clean_import=clean_import,
+            manager=manager,
+            incremental=incremental,
+            staged=staged,
+        )
         del manager
@@ -5,17 +5,29 @@
 import csv
 import json
 import logging
+import multiprocessing
+import resource
 import sys
+import traceback
 from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from inspect import isfunction
 from os import remove
 from pathlib import Path
-from types import FunctionType
-from typing import Any, Tuple
+from shutil import rmtree
+from time import perf_counter
+from types import FunctionType, MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from urllib.request import urlopen, urlretrieve
+from uuid import UUID, uuid4
 
 import django_rq
 from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from django.utils import timezone
+from rq import get_current_job
+from rq.job import Job
 
 from ddionrails.concepts.imports import (
     AnalysisUnitImport,
@@ -33,7 +45,16 @@ from ddionrails.data.imports import (
     VariableImport,
     variables_images_import,
 )
-from ddionrails.imports.git_repos import clean_repo_url
+from ddionrails.data.models import Variable
+from ddionrails.imports.git_repos import clean_repo_url, head_commit, record_import_commit
+from ddionrails.imports.helpers import ID_CACHE, split_csv
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.staging import (
+    create_staging_schema,
+    drop_staging_schema,
+    swap_staged_study,
+    use_schema,
+)
 from ddionrails.instruments.imports import (
     concept_question_import,
     instrument_import,
@@ -41,6 +62,7 @@ from ddionrails.instruments.imports import (
     question_import,
     question_variable_import,
 )
+from ddionrails.instruments.models import Question
 from ddionrails.publications.imports import AttachmentImport, PublicationImport
 from ddionrails.studies.imports import StudyDescriptionImport
 from ddionrails.studies.models import Study
@@ -49,6 +71,53 @@ from ddionrails.workspace.imports import script_metadata_import
 logging.config.fileConfig("logging.conf")
 LOGGER = logging.getLogger(__name__)
 
+# Entities that have to be imported before an entity can be imported.
+# Entities without a path between them in this graph can be imported in parallel.
+IMPORT_DEPENDENCIES: MappingProxyType[str, Tuple[str, ...]] = MappingProxyType(
+    {
+        "topics.csv": (),
+        "topics.json": (),
+        "concepts": ("topics.csv",),
+        "analysis_units": (),
+        "periods": (),
+        "conceptual_datasets": (),
+        "instruments.json": ("periods", "analysis_units"),
+        "instruments": ("instruments.json",),
+        "questions": ("instruments",),
+        "answers": (),
+        "answers_relations": ("questions", "answers"),
+        "datasets.csv": ("periods", "analysis_units", "conceptual_datasets"),
+        "datasets.json": ("datasets.csv",),
+        "variables": ("datasets.json", "concepts"),
+        "questions_variables": ("questions", "variables"),
+        "concepts_questions": ("questions", "concepts"),
+        "transformations": ("variables",),
+        "attachments": ("questions", "variables"),
+        "publications": (),
+        "questions_images": ("questions",),
+        "variables_images": ("variables",),
+        "script_metadata": (),
+        # Both save the study object and would overwrite each others fields.
+        "study": ("topics.json",),
+        "siblings": ("transformations",),
+    }
+)
+
+# Entities whose content is not read from the file they are registered with.
+# The imports of other entities keep their content up to date, so they are
+# only imported on request, to repair their content.
+GENERATED_ENTITIES = frozenset({"siblings"})
+
+# Entities that replace or delete the content missing from their files, so that
+# lines can be removed from their files without a full import.
+REPLACING_ENTITIES = frozenset(
+    {"topics.json", "study", "concepts_questions", "attachments"}
+)
+
+# Entities that only add or update rows, so that their CSV files can be imported
+# in chunks of IMPORT_CHUNK_SIZE rows.
+CHUNKED_ENTITIES = frozenset({"variables", "transformations"})
+
 
 def _initialize_studies():
     study_init_file: str = settings.STUDY_INIT_FILE
@@ -100,15 +169,37 @@ def system_import():
 
 
 class StudyImportManager:
-    """Manage the import of all study resources."""
+    """Manage the import of all study resources.
+
+    Every imported file is a step of the import run and recorded as ImportRun.
+    A manager that is given the id of an earlier run resumes it and skips the
+    steps that were completed successfully in that run.
+    While a schema is set, all entities are imported into that schema.
+    """
 
     import_order: OrderedDict[str, Tuple[Any, Any]]
 
-    def __init__(self, study: Study, redis: bool = True):
+    def __init__(
+        self,
+        study: Study,
+        redis: bool = True,
+        workers: int = 1,
+        run: Optional[UUID] = None,
+    ):
         self.study = study
         self.base_dir = study.import_path()
         self._concepts_fixed = False
         self.redis = redis
+        self.workers = workers
+        self.run = run or uuid4()
+        self.resumed = run is not None
+        self.schema: Optional[str] = None
+        self._completed_steps: Optional[Set[Tuple[str, str]]] = None
+        self.file_results: List["FileImportResult"] = []
+        self.entity_directories = {
+            "instruments.json": self.base_dir / "instruments/",
+            "datasets.json": self.base_dir / "datasets/",
+        }
 
         self.import_order = OrderedDict(
             {
@@ -126,7 +217,7 @@ class StudyImportManager:
                 ),
                 "instruments.json": (
                     instrument_import.InstrumentImport,
-                    Path(self.base_dir / "instruments/").glob("*.json"),
+                    self.entity_directories["instruments.json"].glob("*.json"),
                 ),
                 "instruments": (
                     instrument_import.instrument_import,
@@ -144,7 +235,7 @@ class StudyImportManager:
                 "datasets.csv": (DatasetImport, self.base_dir / "datasets.csv"),
                 "datasets.json": (
                     DatasetJsonImport,
-                    Path(self.base_dir / "datasets/").glob("*.json"),
+                    self.entity_directories["datasets.json"].glob("*.json"),
                 ),
                 "variables": (VariableImport, self.base_dir / "variables.csv"),
                 "questions_variables": (
@@ -210,14 +301,33 @@ class StudyImportManager:
         self._concepts_fixed = True
         return None
 
-    def _execute(self, import_function: FunctionType, *args):
-        """Queue or call an import function."""
+    def _execute(
+        self,
+        import_function: FunctionType,
+        *args,
+        depends_on: Optional[List[Job]] = None,
+        entity: Optional[str] = None,
+    ) -> Optional[Job]:
+        """Queue or call an import function.
+
+        Imports of an entity are recorded in the ImportRun ledger.
+        """
+        if entity:
+            args = (self.run, entity, import_function, *args, self.schema)
+            import_function = record_import_run
         if self.redis:
-            django_rq.enqueue(import_function, *args)
-        else:
-            import_function(*args)
+            return django_rq.enqueue(
+                import_function, *args, depends_on=depends_on or None
+            )
+        import_function(*args)
+        return None
 
-    def import_single_entity(self, entity: str, filename: str = None):
+    def import_single_entity(
+        self,
+        entity: str,
+        filename: str = None,
+        depends_on: Optional[List[Job]] = None,
+    ) -> List[Job]:
         """
         Example usage:
 
@@ -228,7 +338,18 @@ class StudyImportManager:
         manager.import_single_entity("periods")
         manager.import_single_entity("instruments", "instruments/some-instrument.json")
 
+        Returns the queued jobs if redis is used.
+        Without redis and with more than one worker, the files of an entity that is
+        read from a directory are imported in parallel processes.
         """
+        if (
+            not filename
+            and not self.redis
+            and self.workers > 1
+            and entity in self.entity_directories
+        ):
+            self._import_in_process_pool([entity])
+            return []
         if "concepts" in entity or "variables" in entity:
             self.fix_concepts_csv()
         self.__log_import_start(entity)
@@ -249,17 +370,100 @@ class StudyImportManager:
                 self.__log_import_fail(file)
                 sys.exit(1)
 
+        jobs = []
         for file in default_importer_files:
             self.__log_import_start(getattr(file, "name", ""))
             if not file.is_file():  # type: ignore
                 self.__log_import_fail(file)
                 continue
-            if isfunction(importer_class):
-                importer = importer_class
-            else:
-                _importer = importer_class(file, self.study)
-                importer = _importer.run_import
-            self._execute(importer, file, self.study)
+            for step in self.steps(entity, file):
+                if self.is_completed(entity, step):
+                    LOGGER.info(
+                        'Study "%s" skips completed step "%s" of run %s',
+                        self.study.name,
+                        step.name,
+                        self.run,
+                    )
+                    continue
+                if isfunction(importer_class):
+                    importer = importer_class
+                else:
+                    importer = importer_class.run_import
+                job = self._execute(
+                    importer, step, self.study, depends_on=depends_on, entity=entity
+                )
+                if job is None:
+                    continue
+                jobs.append(job)
+                # The chunks of a file are imported one after another.
+                if entity in CHUNKED_ENTITIES:
+                    depends_on = [job]
+        if not self.redis:
+            self.__log_id_cache(entity)
+        return jobs
+
+    def __log_id_cache(self, entity: str) -> None:
+        LOGGER.info(
+            'Study "%s" id cache after "%s": %s',
+            self.study.name,
+            entity,
+            ", ".join(f"{key} {value}" for key, value in ID_CACHE.stats().items()),
+        )
+
+    def steps(self, entity: str, file: Path) -> List[Path]:
+        """The files that are imported one by one for a file of an entity.
+
+        CSV files of chunked entities with more than IMPORT_CHUNK_SIZE rows are
+        split into chunks, so that every step fits into the timeout of a worker.
+        """
+        if entity not in CHUNKED_ENTITIES or Path(file).suffix != ".csv":
+            return [file]
+        return split_csv(
+            Path(file),
+            self.chunk_directory().joinpath(entity),
+            settings.IMPORT_CHUNK_SIZE,
+        )
+
+    def chunk_directory(self) -> Path:
+        """Directory of the chunks of the study.
+
+        Files are split the same way every time, so a resumed run finds the same
+        chunks as the run it continues.
+        """
+        return settings.IMPORT_REPO_PATH.joinpath(".chunks", self.study.name)
+
+    def remove_chunks(self, depends_on: Optional[List[Job]] = None) -> List[Job]:
+        """Remove the chunks of the study once the given jobs are done.
+
+        The chunks of a failed run are kept, since the jobs depending on a failed
+        job do not run. A resumed run splits the files again in any case.
+        Returns the jobs that follow-up jobs of the import have to wait for.
+        """
+        if not self.chunk_directory().exists():
+            return depends_on or []
+        job = self._execute(
+            _remove_directory, self.chunk_directory(), depends_on=depends_on
+        )
+        return [job] if job else []
+
+    def is_completed(self, entity: str, file: Path) -> bool:
+        """Whether a resumed run already imported the file of an entity."""
+        if not self.resumed:
+            return False
+        if self._completed_steps is None:
+            self._completed_steps = set(
+                ImportRun.objects.filter(
+                    run=self.run, failed=False, finished__isnull=False
+                ).values_list("entity", "file")
+            )
+        return (entity, str(file)) in self._completed_steps
+
+    def fit_id_cache(self) -> None:
+        """Size the shared id cache for the variables and questions of the study."""
+        ID_CACHE.fit(
+            Variable.objects.filter(dataset__study=self.study).count()
+            + Question.objects.filter(instrument__study=self.study).count()
+        )
 
     def __log_import_start(self, file: str) -> None:
         LOGGER.info('Study "%s" starts import of: "%s"', self.study.name, file)
@@ -267,7 +471,7 @@ class StudyImportManager:
     def __log_import_fail(self, file: Path) -> None:
         LOGGER.error('Study "%s" has no file: "%s"', self.study.name, file.name)
 
-    def import_all_entities(self):
+    def import_all_entities(self) -> List[Job]:
         """
         Example usage:
 
@@ -278,5 +482,365 @@ class StudyImportManager:
 
         """
         self.__log_import_start("all entities")
-        for entity in self.import_order.keys():
-            self.import_single_entity(entity)
+        return self.import_entities(
+            entity for entity in self.import_order if entity not in GENERATED_ENTITIES
+        )
+
+    def import_all_entities_staged(self) -> List[Job]:
+        """Import all entities while the current version of the study stays online.
+
+        The study is rebuilt in a staging schema and replaces the current version
+        in a single transaction once all entities are imported.
+        If files of the import failed, the current version is kept and the
+        staging schema is removed.
+        Returns the queued jobs if redis is used.
+        """
+        self.schema = create_staging_schema(self.study)
+        with use_schema(self.schema):
+            self.study.delete()
+            self.study.save()
+        try:
+            jobs = self.import_all_entities()
+        finally:
+            schema, self.schema = self.schema, None
+        if self.failed_files():
+            drop_staging_schema(schema)
+            return jobs
+        job = self._execute(swap_staged_study, self.study.name, schema, depends_on=jobs)
+        return [job] if job else []
+
+    def import_changed_files(self, files: Iterable[Path]) -> List[Job]:
+        """Import only the entities affected by the given changed files."""
+        entities = self.entities_for_files(files)
+        self.__log_import_start(", ".join(entities))
+        return self.import_entities(entities)
+
+    def import_entities(self, entities: Iterable[str]) -> List[Job]:
+        """Import the given entities in an order that satisfies their dependencies.
+
+        With redis, every job waits for the jobs of the entities it depends on.
+        Without redis and with more than one worker, independent entities are
+        imported in parallel processes.
+        Returns the queued jobs if redis is used.
+        """
+        selected = set(entities)
+        entities = [entity for entity in self.import_order if entity in selected]
+        if self.redis:
+            jobs = self._enqueue_with_dependencies(entities)
+            return list(
+                {job.id: job for _jobs in jobs.values() for job in _jobs}.values()
+            )
+        self.fit_id_cache()
+        if self.workers > 1:
+            self._import_in_process_pool(entities)
+        else:
+            for entity in entities:
+                self.import_single_entity(entity)
+        return []
+
+    def record_commit(self, depends_on: Optional[List[Job]] = None) -> List[Job]:
+        """Store the checked out commit as the last imported commit of the study.
+
+        The commit is not recorded if files of the import failed, so that the
+        next incremental update imports them again.
+        Returns the jobs that follow-up jobs of the import have to wait for.
+        """
+        commit = head_commit(self.study)
+        if not commit or self.failed_files():
+            return depends_on or []
+        job = self._execute(
+            record_import_commit, self.study.name, commit, depends_on=depends_on
+        )
+        return [job] if job else []
+
+    def replaced_files(self) -> List[Path]:
+        """Files that are only imported by entities replacing their content."""
+        entities_of_files: Dict[Path, Set[str]] = {}
+        for entity, (_, path) in self.import_order.items():
+            if entity in GENERATED_ENTITIES or entity in self.entity_directories:
+                continue
+            entities_of_files.setdefault(Path(path).resolve(), set()).add(entity)
+        return [
+            file
+            for file, entities in entities_of_files.items()
+            if entities <= REPLACING_ENTITIES
+        ]
+
+    def entities_for_files(self, files: Iterable[Path]) -> List[str]:
+        """Entities importing the given files and all entities depending on them."""
+        files = {Path(file).resolve() for file in files}
+        entities = set()
+        for entity, (_, path) in self.import_order.items():
+            if entity in GENERATED_ENTITIES:
+                continue
+            if entity in self.entity_directories:
+                directory = self.entity_directories[entity].resolve()
+                if any(file.parent == directory for file in files):
+                    entities.add(entity)
+            elif Path(path).resolve() in files:
+                entities.add(entity)
+        # fix_concepts_csv adds concepts from the variables.csv to the concepts.csv
+        if "variables" in entities:
+            entities.add("concepts")
+
+        dependants_added = True
+        while dependants_added:
+            dependants_added = False
+            for entity in self.import_order:
+                if entity in GENERATED_ENTITIES:
+                    continue
+                if entity not in entities and entities.intersection(
+                    IMPORT_DEPENDENCIES.get(entity, ())
+                ):
+                    entities.add(entity)
+                    dependants_added = True
+        return [entity for entity in self.import_order if entity in entities]
+
+    def _dependencies(self, entity: str, entities: Iterable[str]) -> Set[str]:
+        return set(IMPORT_DEPENDENCIES.get(entity, ())).intersection(entities)
+
+    def _enqueue_with_dependencies(self, entities: List[str]) -> Dict[str, List[Job]]:
+        """Queue entities with their dependencies as RQ job dependencies."""
+        jobs: Dict[str, List[Job]] = {}
+        for entity in entities:
+            depends_on: List[Job] = []
+            for dependency in self._dependencies(entity, entities):
+                depends_on.extend(jobs[dependency])
+            # An entity without files passes its dependencies on to its dependants.
+            jobs[entity] = (
+                self.import_single_entity(entity, depends_on=depends_on) or depends_on
+            )
+        return jobs
+
+    def _import_in_process_pool(self, entities: List[str]) -> None:
+        """Import independent entities in parallel processes.
+
+        Entities read from a directory are split up into one task per file,
+        so that their files are imported in parallel as well.
+        The number of workers bounds the number of concurrent database connections.
+        A failing file is logged and does not stop the import of the other files.
+        """
+        if {"concepts", "variables"}.intersection(entities):
+            self.fix_concepts_csv()
+        pending = {entity: self._dependencies(entity, entities) for entity in entities}
+        done: Set[str] = set()
+        running: Dict[Future, str] = {}
+        open_files: Dict[str, int] = {}
+        # Forked processes must not share the database connection of the parent.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            while pending or running:
+                for entity in [
+                    entity for entity, needed in pending.items() if needed <= done
+                ]:
+                    del pending[entity]
+                    if entity not in self.entity_directories:
+                        future = executor.submit(
+                            _import_entity,
+                            self.study.name,
+                            entity,
+                            self.run,
+                            self.schema,
+                            self.resumed,
+                        )
+                        running[future] = entity
+                        continue
+                    files = [
+                        file
+                        for file in self.entity_files(entity)
+                        if not self.is_completed(entity, file)
+                    ]
+                    open_files[entity] = len(files)
+                    if not files:
+                        done.add(entity)
+                    for file in files:
+                        future = executor.submit(
+                            _import_file,
+                            self.study.name,
+                            entity,
+                            file,
+                            self.run,
+                            self.schema,
+                        )
+                        running[future] = entity
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    entity = running.pop(future)
+                    result = future.result()
+                    if entity not in open_files:
+                        done.add(entity)
+                        continue
+                    self._log_file_result(result)
+                    self.file_results.append(result)
+                    open_files[entity] -= 1
+                    if open_files[entity] == 0:
+                        done.add(entity)
+        failed = self.failed_files()
+        if failed:
+            LOGGER.error(
+                'Study "%s" failed to import %s of %s files: %s',
+                self.study.name,
+                len(failed),
+                len(self.file_results),
+                ", ".join(result.file.name for result in failed),
+            )
+
+    def failed_files(self) -> List["FileImportResult"]:
+        """Files whose import failed in a process pool of this manager."""
+        return [result for result in self.file_results if result.error]
+
+    def entity_files(self, entity: str) -> List[Path]:
+        """All files of an entity that is read from a directory."""
+        return sorted(self.entity_directories[entity].glob("*.json"))
+
+    def _log_file_result(self, result: "FileImportResult") -> None:
+        if result.error:
+            LOGGER.error(
+                'Study "%s" failed to import "%s" after %.2fs:\n%s',
+                self.study.name,
+                result.file.name,
+                result.seconds,
+                result.error,
+            )
+            return
+        LOGGER.info(
+            'Study "%s" imported "%s" in %.2fs',
+            self.study.name,
+            result.file.name,
+            result.seconds,
+        )
+
+
+@dataclass
+class FileImportResult:
+    """Timing and outcome of the import of a single file."""
+
+    entity: str
+    file: Path
+    seconds: float
+    error: Optional[str] = None
+
+
+def _import_file(
+    study_name: str, entity: str, file: Path, run: UUID, schema: Optional[str] = None
+) -> FileImportResult:
+    """Import a single file of an entity inside of a worker process.
+
+    Errors are returned instead of raised, to not abort the import of the other files.
+    """
+    start = perf_counter()
+    error = None
+    try:
+        study = Study.objects.get(name=study_name)
+        importer_class, _ = StudyImportManager(study, redis=False).import_order[entity]
+        record_import_run(run, entity, importer_class.run_import, file, study, schema)
+    except Exception:  # pylint: disable=broad-except
+        error = traceback.format_exc()
+    return FileImportResult(entity, file, perf_counter() - start, error)
+
+
+def _import_entity(
+    study_name: str,
+    entity: str,
+    run: UUID,
+    schema: Optional[str] = None,
+    resumed: bool = False,
+) -> None:
+    """Import a single entity inside of a worker process."""
+    study = Study.objects.get(name=study_name)
+    manager = StudyImportManager(study, redis=False, run=run)
+    manager.resumed = resumed
+    manager.schema = schema
+    # concepts.csv is fixed by the parent process before any worker starts.
+    manager._concepts_fixed = True  # pylint: disable=protected-access
+    manager.import_single_entity(entity)
+
+
+def _remove_directory(directory: Path) -> None:
+    rmtree(directory, ignore_errors=True)
+
+
+class RowCounter:
+    """Count the statements of a database connection and the rows they write.
+
+    Used as a wrapper with ``connection.execute_wrapper()``.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = {"INSERT": 0, "UPDATE": 0, "DELETE": 0}
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        statement = sql.lstrip()[:6].upper()
+        rowcount = context["cursor"].rowcount
+        if statement in self.rows and rowcount > 0:
+            self.rows[statement] += rowcount
+        return result
+
+
+def record_import_run(  # pylint: disable=R0913,R0917
+    run: UUID,
+    entity: str,
+    import_function: Callable,
+    file: Path,
+    study: Study,
+    schema: Optional[str] = None,
+) -> None:
+    """Call an import function and store its timing and row counts as ImportRun.
+
+    The import writes into the given schema, the ImportRun is stored as usual.
+    Inside of a transaction, the ImportRun is rolled back together with the
+    import, so that it never claims an import that was rolled back.
+    """
+    job = get_current_job()
+    import_run = ImportRun(
+        run=run,
+        study=study,
+        study_name=study.name,
+        entity=entity,
+        file=str(file),
+        job_id=job.id if job else "",
+        started=timezone.now(),
+        rows_read=_count_csv_rows(file),
+    )
+    # Stored before the import starts, so that a step whose worker is killed
+    # stays in the ledger as unfinished. It is updated with the results below.
+    _save_import_run(import_run)
+    counter = RowCounter()
+    try:
+        with use_schema(schema), connection.execute_wrapper(counter):
+            import_function(file, study)
+    except BaseException:
+        import_run.failed = True
+        raise
+    finally:
+        import_run.finished = timezone.now()
+        import_run.rows_created = counter.rows["INSERT"]
+        import_run.rows_updated = counter.rows["UPDATE"]
+        import_run.rows_deleted = counter.rows["DELETE"]
+        import_run.process_peak_memory = resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss
+        _save_import_run(import_run)
+
+
+def _save_import_run(import_run: ImportRun) -> None:
+    try:
+        import_run.save()
+    except DatabaseError:
+        # A failed import can leave the transaction unusable.
+        LOGGER.exception('Could not record the import of "%s"', import_run.file)
+
+
+def _count_csv_rows(file: Path) -> Optional[int]:
+    path = Path(file)
+    if path.suffix != ".csv" or not path.is_file():
+        return None
+    with open(path, "r", encoding="utf8") as csv_file:
+        return max(sum(1 for _ in csv.reader(csv_file)) - 1, 0)
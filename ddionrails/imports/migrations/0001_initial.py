@@ -0,0 +1,123 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:47
+# pylint: disable=all
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("studies", "0007_study_webhook_secret"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportRun",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "run",
+                    models.UUIDField(
+                        db_index=True,
+                        help_text="UUID shared by all entries of one import run",
+                    ),
+                ),
+                (
+                    "study_name",
+                    models.CharField(
+                        db_index=True,
+                        help_text="Name of the study, kept if the study is removed",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "entity",
+                    models.CharField(
+                        help_text="Name of the imported entity", max_length=255
+                    ),
+                ),
+                (
+                    "file",
+                    models.TextField(
+                        blank=True, default="", help_text="Path of the imported file"
+                    ),
+                ),
+                (
+                    "job_id",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Id of the RQ job",
+                        max_length=255,
+                    ),
+                ),
+                ("started", models.DateTimeField(help_text="Start of the import")),
+                (
+                    "finished",
+                    models.DateTimeField(
+                        blank=True, help_text="End of the import", null=True
+                    ),
+                ),
+                (
+                    "failed",
+                    models.BooleanField(
+                        default=False, help_text="The import raised an error"
+                    ),
+                ),
+                (
+                    "rows_read",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Number of data rows in a CSV file",
+                        null=True,
+                    ),
+                ),
+                (
+                    "rows_created",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of inserted database rows"
+                    ),
+                ),
+                (
+                    "rows_updated",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of updated database rows"
+                    ),
+                ),
+                (
+                    "rows_deleted",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of deleted database rows"
+                    ),
+                ),
+                (
+                    "process_peak_memory",
+                    models.PositiveBigIntegerField(
+                        blank=True,
+                        help_text=(
+                            "Peak resident memory of the importing process in KiB, "
+                            "since the start of the process and not only of this import"
+                        ),
+                        null=True,
+                    ),
+                ),
+                (
+                    "study",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Foreign key to studies.Study",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="import_runs",
+                        to="studies.study",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-started",),
+            },
+        ),
+    ]
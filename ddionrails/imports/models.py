@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Model definitions for ddionrails.imports app"""
+
+from datetime import timedelta
+from typing import Optional
+
+from django.db import models
+
+from ddionrails.studies.models import Study
+
+
+class ImportRun(models.Model):
+    """
+    Stores the import of a single file of a study entity,
+    related to :model:`studies.Study`.
+
+    All entries written by the same import share their run id.
+    """
+
+    id = models.AutoField(primary_key=True)  # pylint: disable=invalid-name
+    run = models.UUIDField(
+        db_index=True, help_text="UUID shared by all entries of one import run"
+    )
+    study_name = models.CharField(
+        max_length=255,
+        db_index=True,
+        help_text="Name of the study, kept if the study is removed",
+    )
+    entity = models.CharField(max_length=255, help_text="Name of the imported entity")
+    file = models.TextField(blank=True, default="", help_text="Path of the imported file")
+    job_id = models.CharField(
+        max_length=255, blank=True, default="", help_text="Id of the RQ job"
+    )
+    started = models.DateTimeField(help_text="Start of the import")
+    finished = models.DateTimeField(blank=True, null=True, help_text="End of the import")
+    failed = models.BooleanField(default=False, help_text="The import raised an error")
+    rows_read = models.PositiveIntegerField(
+        blank=True, null=True, help_text="Number of data rows in a CSV file"
+    )
+    rows_created = models.PositiveIntegerField(
+        default=0, help_text="Number of inserted database rows"
+    )
+    rows_updated = models.PositiveIntegerField(
+        default=0, help_text="Number of updated database rows"
+    )
+    rows_deleted = models.PositiveIntegerField(
+        default=0, help_text="Number of deleted database rows"
+    )
+    process_peak_memory = models.PositiveBigIntegerField(
+        blank=True,
+        null=True,
+        help_text=(
+            "Peak resident memory of the importing process in KiB, "
+            "since the start of the process and not only of this import"
+        ),
+    )
+
+    #############
+    # relations #
+    #############
+    study = models.ForeignKey(
+        Study,
+        blank=True,
+        null=True,
+        related_name="import_runs",
+        on_delete=models.SET_NULL,
+        help_text="Foreign key to studies.Study",
+    )
+
+    class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
+        ordering = ("-started",)
+
+    def __str__(self) -> str:
+        """Returns a string representation using study name and entity"""
+        return f"{self.study_name}: {self.entity} ({self.started})"
+
+    @property
+    def duration(self) -> Optional[timedelta]:
+        """Time the import took, if it finished."""
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        """Written database rows per second."""
+        if not self.duration:
+            return None
+        rows = self.rows_created + self.rows_updated + self.rows_deleted
+        return rows / self.duration.total_seconds()
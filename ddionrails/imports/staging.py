@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+"""Staged imports for ddionrails.imports app"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Type
+
+from django.db import connection, models, transaction
+from django.db.models import Q
+
+from ddionrails.concepts.models import (
+    AnalysisUnit,
+    Concept,
+    ConceptualDataset,
+    Period,
+    Topic,
+)
+from ddionrails.data.models import Dataset, Transformation, Variable
+from ddionrails.data.models.transformation import Sibling
+from ddionrails.instruments.models import (
+    Answer,
+    ConceptQuestion,
+    Instrument,
+    ItemVariable,
+    Question,
+    QuestionItem,
+    QuestionVariable,
+)
+from ddionrails.publications.models import Attachment, Publication
+from ddionrails.studies.models import Study, TopicList
+from ddionrails.workspace.models import ScriptMetadata
+
+# Stale rows are removed through the ORM, to delete their dependent rows as well.
+DELETE_BATCH_SIZE = 5000
+
+
+def staging_schema_name(study: Study) -> str:
+    """Name of the schema a study is imported into before it is published."""
+    return f"staging_{study.id.hex}"
+
+
+def staged_models(study: Study) -> List[Tuple[Type[models.Model], Optional[Q]]]:
+    """Models written by the import of a study and the rows belonging to the study.
+
+    Models without rows of their own, like concepts, are shared by all studies.
+    Their rows are added and updated but never removed by an import.
+    The models are ordered so that a row is written after the rows it refers to.
+    """
+    return [
+        (Study, Q(pk=study.pk)),
+        (Period, Q(study=study)),
+        (AnalysisUnit, Q(study=study)),
+        (ConceptualDataset, Q(study=study)),
+        (Topic, Q(study=study)),
+        (TopicList, Q(study=study)),
+        (Concept, None),
+        (Concept.topics.through, Q(topic__study=study)),
+        (Dataset, Q(study=study)),
+        (Variable, Q(dataset__study=study)),
+        (
+            Transformation,
+            Q(origin__dataset__study=study) | Q(target__dataset__study=study),
+        ),
+        (Sibling, Q(sibling_a__dataset__study=study)),
+        (Instrument, Q(study=study)),
+        (Instrument.datasets.through, Q(instrument__study=study)),
+        (Question, Q(instrument__study=study)),
+        (QuestionItem, Q(question__instrument__study=study)),
+        (Answer, None),
+        (
+            Answer.question_items.through,
+            Q(questionitem__question__instrument__study=study),
+        ),
+        (ConceptQuestion, Q(question__instrument__study=study)),
+        (QuestionVariable, Q(question__instrument__study=study)),
+        (ItemVariable, Q(item__question__instrument__study=study)),
+        (Publication, Q(study=study)),
+        (Attachment, Q(context_study=study) | Q(study=study)),
+        (ScriptMetadata, Q(study=study)),
+    ]
+
+
+@contextmanager
+def use_schema(schema: Optional[str]) -> Iterator[None]:
+    """Look up tables in the given schema before the default ones.
+
+    Does nothing if no schema is given.
+    """
+    if schema is None:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW search_path")
+        search_path = cursor.fetchone()[0]
+        cursor.execute(f"SET search_path TO {_quote(schema)}, {search_path}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET search_path TO {search_path}")
+
+
+def create_staging_schema(study: Study) -> str:
+    """Create a schema with a copy of all tables to import a study into.
+
+    Tables of the staged models are copied with the rows of the study.
+    Tables of shared models are copied completely, so that the import finds
+    their existing rows, and a second time to tell the rows the import wrote.
+    All other tables are only copied with their structure.
+    Foreign key constraints are not copied.
+    Returns the name of the schema.
+    """
+    schema = staging_schema_name(study)
+    staged_tables = {
+        model._meta.db_table: (model, scope) for model, scope in staged_models(study)
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {_quote(schema)} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {_quote(schema)}")
+        for table in connection.introspection.table_names(cursor):
+            staged_table = f"{_quote(schema)}.{_quote(table)}"
+            cursor.execute(
+                f"CREATE TABLE {staged_table} (LIKE {_quote(table)} INCLUDING ALL)"
+            )
+            if table not in staged_tables:
+                continue
+            model, scope = staged_tables[table]
+            if scope is None:
+                cursor.execute(
+                    f"INSERT INTO {staged_table} SELECT * FROM {_quote(table)}"
+                )
+                cursor.execute(
+                    f"CREATE TABLE {_base_table(schema, model)} AS "
+                    f"SELECT * FROM {staged_table}"
+                )
+            else:
+                sql, params = _scope_pks(model, scope).query.sql_with_params()
+                cursor.execute(
+                    f"INSERT INTO {staged_table} SELECT * FROM {_quote(table)} "
+                    f"WHERE {_quote(model._meta.pk.column)} IN ({sql})",
+                    params,
+                )
+            if _has_auto_pk(model):
+                pk_column = model._meta.pk.column
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, %s), "
+                    f"COALESCE(MAX({_quote(pk_column)}), 0) + 1, false) "
+                    f"FROM {staged_table}",
+                    [staged_table, pk_column],
+                )
+    return schema
+
+
+def drop_staging_schema(schema: str) -> None:
+    """Remove a staging schema and all of its tables."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {_quote(schema)} CASCADE")
+
+
+def swap_staged_study(study_name: str, schema: str) -> None:
+    """Replace the published rows of a study with the rows imported into a schema.
+
+    Rows are matched by their primary key, or by all of their columns for
+    tables with generated ids. The added, changed and removed rows are collected
+    in temporary tables first. Only writing them happens in one transaction,
+    so the study is never seen half imported.
+    Of the shared models, only the rows written by the import are compared, so
+    that changes written by the imports of other studies in the meantime stay.
+    Removed rows are deleted through the ORM, which also deletes the rows
+    depending on them, like the basket variables of removed variables.
+    """
+    study = Study.objects.get(name=study_name)
+    staged = staged_models(study)
+    with connection.cursor() as cursor:
+        try:
+            with use_schema(schema):
+                for model, scope in staged:
+                    if scope is not None:
+                        _snapshot(cursor, model, scope, "new")
+            for model, scope in staged:
+                if scope is None:
+                    _snapshot_written_rows(cursor, model, schema)
+                else:
+                    _snapshot(cursor, model, scope, "old")
+                _diff(cursor, model, scope is not None)
+            stale = [
+                (model, _stale_ids(cursor, model))
+                for model, scope in reversed(staged)
+                if not _has_auto_pk(model) and scope is not None
+            ]
+            with transaction.atomic():
+                # Rows with generated ids have no dependents and can be removed
+                # first, which frees their unique constraints for their replacements.
+                for model, scope in staged:
+                    if _has_auto_pk(model) and scope is not None:
+                        _delete_stale_rows(cursor, model)
+                for model, _ in staged:
+                    _write_changed_rows(cursor, model)
+                for model, ids in stale:
+                    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                        model._base_manager.filter(
+                            pk__in=ids[start : start + DELETE_BATCH_SIZE]
+                        ).delete()
+        finally:
+            for model, _ in staged:
+                for version in ("new", "old", "changed", "stale"):
+                    cursor.execute(
+                        f"DROP TABLE IF EXISTS {_snapshot_name(model, version)}"
+                    )
+    drop_staging_schema(schema)
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _has_auto_pk(model: Type[models.Model]) -> bool:
+    return isinstance(model._meta.pk, models.AutoField)
+
+
+def _columns(model: Type[models.Model], with_pk: bool = True) -> List[str]:
+    return [
+        field.column
+        for field in model._meta.concrete_fields
+        if with_pk or not field.primary_key
+    ]
+
+
+def _snapshot_name(model: Type[models.Model], version: str) -> str:
+    return _quote(f"{version}_{model._meta.db_table}")
+
+
+def _base_table(schema: str, model: Type[models.Model]) -> str:
+    """Table with the rows of a shared model before the import."""
+    return f"{_quote(schema)}.{_quote('base_' + model._meta.db_table)}"
+
+
+def _scope_pks(model: Type[models.Model], scope: Q) -> models.QuerySet:
+    return model._base_manager.filter(scope).order_by().values("pk")
+
+
+def _snapshot(cursor, model: Type[models.Model], scope: Q, version: str):
+    """Copy the rows of the study into a temporary table."""
+    queryset = model._base_manager.order_by().filter(pk__in=_scope_pks(model, scope))
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    sql, params = queryset.values_list(*attnames).query.sql_with_params()
+    table = _snapshot_name(model, version)
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {table} AS {sql}", params)
+
+
+def _snapshot_written_rows(cursor, model: Type[models.Model], schema: str):
+    """Copy the rows of a shared model written by the import into temporary tables.
+
+    The published version of these rows is copied as well.
+    """
+    new, old = _snapshot_name(model, "new"), _snapshot_name(model, "old")
+    columns = ", ".join(_quote(column) for column in _columns(model))
+    staged_table = f"{_quote(schema)}.{_quote(model._meta.db_table)}"
+    pk_column = _quote(model._meta.pk.column)
+    cursor.execute(f"DROP TABLE IF EXISTS {new}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {new} AS "
+        f"SELECT {columns} FROM {staged_table} "
+        f"EXCEPT SELECT {columns} FROM {_base_table(schema, model)}"
+    )
+    cursor.execute(f"DROP TABLE IF EXISTS {old}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {old} AS "
+        f"SELECT {columns} FROM {_quote(model._meta.db_table)} "
+        f"WHERE {pk_column} IN (SELECT {pk_column} FROM {new})"
+    )
+
+
+def _diff(cursor, model: Type[models.Model], scoped: bool) -> None:
+    """Copy the rows to write and the rows with generated ids to delete.
+
+    Rows with generated ids are compared without their id.
+    """
+    new, old = _snapshot_name(model, "new"), _snapshot_name(model, "old")
+    changed, stale = _snapshot_name(model, "changed"), _snapshot_name(model, "stale")
+    columns = ", ".join(
+        _quote(column) for column in _columns(model, not _has_auto_pk(model))
+    )
+    cursor.execute(f"DROP TABLE IF EXISTS {changed}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {changed} AS "
+        f"SELECT {columns} FROM {new} EXCEPT SELECT {columns} FROM {old}"
+    )
+    if not (scoped and _has_auto_pk(model)):
+        return
+    pk_column = _quote(model._meta.pk.column)
+    row = "ROW({})::text".format(
+        ", ".join(_quote(column) for column in _columns(model, False))
+    )
+    cursor.execute(f"DROP TABLE IF EXISTS {stale}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {stale} AS "
+        f"SELECT {pk_column} FROM {old} WHERE {row} IN "
+        f"(SELECT {row} FROM {old} EXCEPT SELECT {row} FROM {new})"
+    )
+
+
+def _write_changed_rows(cursor, model: Type[models.Model]) -> None:
+    """Insert new and update changed rows of the staged version."""
+    changed = _snapshot_name(model, "changed")
+    table = _quote(model._meta.db_table)
+    if _has_auto_pk(model):
+        columns = ", ".join(_quote(column) for column in _columns(model, False))
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {changed}")
+        return
+    columns = ", ".join(_quote(column) for column in _columns(model))
+    updates = ", ".join(
+        f"{_quote(column)} = EXCLUDED.{_quote(column)}"
+        for column in _columns(model, False)
+    )
+    conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    cursor.execute(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {changed} "
+        f"ON CONFLICT ({_quote(model._meta.pk.column)}) {conflict}"
+    )
+
+
+def _delete_stale_rows(cursor, model: Type[models.Model]) -> None:
+    """Delete rows with generated ids that are not part of the staged version."""
+    pk_column = _quote(model._meta.pk.column)
+    cursor.execute(
+        f"DELETE FROM {_quote(model._meta.db_table)} WHERE {pk_column} IN "
+        f"(SELECT {pk_column} FROM {_snapshot_name(model, 'stale')})"
+    )
+
+
+def _stale_ids(cursor, model: Type[models.Model]) -> list:
+    new, old = _snapshot_name(model, "new"), _snapshot_name(model, "old")
+    pk_column = _quote(model._meta.pk.column)
+    cursor.execute(f"SELECT {pk_column} FROM {old} EXCEPT SELECT {pk_column} FROM {new}")
+    return [row[0] for row in cursor.fetchall()]
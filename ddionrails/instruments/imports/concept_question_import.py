@@ -4,11 +4,13 @@
 
 from csv import DictReader
 from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
 
 from django.db.transaction import atomic
 
 from ddionrails.concepts.models import Concept
 from ddionrails.imports import imports
+from ddionrails.imports.helpers import hash_with_namespace_uuid
 from ddionrails.instruments.models import ConceptQuestion, Question
 from ddionrails.studies.models import Study
 
@@ -47,25 +49,75 @@ class ConceptQuestionImport(imports.CSVImport):
 
     @atomic
     def execute_import(self):
-        studies: Dict[str, Study] = {}
+        """Write the difference between the file and the existing relations.
+
+        Question ids are computed from study, instrument and question names.
+        Concepts are loaded by name with a single query.
+        The relations of the imported study are replaced even if none of its
+        rows link a concept anymore.
+        """
+        studies = {
+            study.name: study
+            for study in Study.objects.filter(name__in={row[0] for row in self.content})
+        }
+        rows: Dict[Tuple[UUID, str], Tuple[str, str, str, Optional[str]]] = {}
         for concept_question_data in self.content:
-            if concept_question_data[0] not in studies:
-                try:
-                    study = Study.objects.get(name=concept_question_data[0])
-                    studies[study.name] = study
-                except Study.DoesNotExist:
-                    continue
-            try:
-                concept_question = Question.objects.get(
-                    instrument__study=studies[concept_question_data[0]],
-                    instrument__name=concept_question_data[1],
-                    name=concept_question_data[2],
-                )
-                concept = Concept.objects.get(name=concept_question_data[3])
-            except BaseException as error:
-                raise type(error)(
-                    f"Could not import ConceptQuestion: {concept_question_data}"
-                )
-            ConceptQuestion.objects.get_or_create(
-                question=concept_question, concept=concept
+            study_name, instrument_name, question_name, concept_name = (
+                concept_question_data
+            )
+            if study_name not in studies:
+                continue
+            instrument_id = hash_with_namespace_uuid(
+                studies[study_name].id, instrument_name
             )
+            question_id = hash_with_namespace_uuid(
+                instrument_id, question_name, cache=False
+            )
+            rows[(question_id, concept_name)] = concept_question_data
+
+        question_ids = set(
+            Question.objects.filter(
+                id__in={question_id for question_id, _ in rows}
+            ).values_list("id", flat=True)
+        )
+        concept_ids = dict(
+            Concept.objects.filter(
+                name__in={concept_name for _, concept_name in rows}
+            ).values_list("name", "id")
+        )
+        missing = [
+            row
+            for (question_id, concept_name), row in rows.items()
+            if question_id not in question_ids or concept_name not in concept_ids
+        ]
+        if missing:
+            raise ConceptQuestion.DoesNotExist(
+                "Could not import ConceptQuestion, question or concept missing:\n"
+                + "\n".join(str(row) for row in missing)
+            )
+
+        relations = {
+            (question_id, concept_ids[concept_name]) for question_id, concept_name in rows
+        }
+        existing_relations = {
+            (question_id, concept_id): relation_id
+            for relation_id, question_id, concept_id in ConceptQuestion.objects.filter(
+                question__instrument__study__in={self.study, *studies.values()}
+            ).values_list("id", "question_id", "concept_id")
+        }
+        outdated_ids = [
+            relation_id
+            for relation, relation_id in existing_relations.items()
+            if relation not in relations
+        ]
+        for index in range(0, len(outdated_ids), self.batch_size):
+            ConceptQuestion.objects.filter(
+                id__in=outdated_ids[index : index + self.batch_size]
+            ).delete()
+        ConceptQuestion.objects.bulk_create(
+            [
+                ConceptQuestion(question_id=question_id, concept_id=concept_id)
+                for question_id, concept_id in relations.difference(existing_relations)
+            ],
+            batch_size=self.batch_size,
+        )
@@ -8,7 +8,8 @@ from csv import DictReader
 from dataclasses import asdict, dataclass
 from pathlib import Path
 from types import MappingProxyType
-from typing import Dict, Literal, Set, TypedDict
+from typing import Any, Dict, Literal, Set, TypedDict
+from uuid import UUID
 
 from ddionrails.concepts.models import AnalysisUnit, Period
 from ddionrails.imports import imports
@@ -107,6 +108,21 @@ class InstrumentImport(imports.Import):
     """
 
     content: str
+    batch_size = 5000
+    question_fields = (
+        "sort_id",
+        "label",
+        "label_de",
+        "description",
+        "description_de",
+        "items",
+        "period",
+    )
+
+    def __init__(self, filename, study=None, system=None):
+        super().__init__(filename, study, system)
+        self._periods: Dict[str, Period] = {}
+        self._analysis_units: Dict[str, AnalysisUnit] = {}
 
     def execute_import(self):
         self.content = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(
@@ -129,32 +145,76 @@ class InstrumentImport(imports.Import):
             period_name = str(int(period_name))
         except ValueError:
             period_name = str(period_name)
-        period = Period.objects.get_or_create(name=period_name, study=self.study)[0]
-        instrument.period = period
+        instrument.period = self._get_period(period_name)
 
         # add analysis_unit relation to instrument
         analysis_unit_name = content.get("analysis_unit", "none")
         if analysis_unit_name == "none":
             analysis_unit_name = content.get("analysis_unit_name", "none")
-        analysis_unit = AnalysisUnit.objects.get_or_create(
-            name=analysis_unit_name, study=self.study
-        )[0]
-        instrument.analysis_unit = analysis_unit
-
-        for _name, _question in content["questions"].items():
-            question, _ = Question.objects.get_or_create(
-                name=_question["question"], instrument=instrument
+        instrument.analysis_unit = self._get_analysis_unit(analysis_unit_name)
+
+        self._import_questions(instrument, content["questions"])
+
+        instrument.label = content.get("label", "")
+        instrument.label_de = content.get("label_de", "")
+        instrument.description = content.get("description", "")
+        instrument.description_de = content.get("description_de", "")
+        instrument.save()
+
+    def _get_period(self, name: str) -> Period:
+        if not self._periods:
+            self._periods = {
+                period.name: period for period in Period.objects.filter(study=self.study)
+            }
+        if name not in self._periods:
+            self._periods[name] = Period.objects.create(name=name, study=self.study)
+        return self._periods[name]
+
+    def _get_analysis_unit(self, name: str) -> AnalysisUnit:
+        if not self._analysis_units:
+            self._analysis_units = {
+                unit.name: unit for unit in AnalysisUnit.objects.filter(study=self.study)
+            }
+        if name not in self._analysis_units:
+            self._analysis_units[name] = AnalysisUnit.objects.create(
+                name=name, study=self.study
             )
+        return self._analysis_units[name]
+
+    def _import_questions(
+        self, instrument: Instrument, questions: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Create or update all questions of an instrument in bulk."""
+        prepared_questions: Dict[UUID, Question] = {}
+        for _name, _question in questions.items():
+            question = Question(name=_question["question"], instrument=instrument)
+            question.id = question.generate_id()  # pylint: disable=invalid-name
             question.sort_id = int(_question.get("sn", 0))
             question.label = _question.get("label", _question.get("text", _name))
             question.label_de = _question.get("label_de", _question.get("text_de", ""))
             question.description = _question.get("description", "")
             question.description_de = _question.get("description_de", "")
-            question.items = _question.get("items", list)
-            question.save()
+            question.items = _question.get("items", [])
+            prepared_questions[question.id] = question
 
-        instrument.label = content.get("label", "")
-        instrument.label_de = content.get("label_de", "")
-        instrument.description = content.get("description", "")
-        instrument.description_de = content.get("description_de", "")
-        instrument.save()
+        # Existing questions keep their period, like Question.save() does.
+        existing_periods = dict(
+            Question.objects.filter(id__in=prepared_questions.keys()).values_list(
+                "id", "period_id"
+            )
+        )
+        new_questions = []
+        questions_to_update = []
+        for question_id, question in prepared_questions.items():
+            question.period_id = existing_periods.get(question_id) or instrument.period_id
+            if question_id in existing_periods:
+                questions_to_update.append(question)
+            else:
+                new_questions.append(question)
+
+        if questions_to_update:
+            Question.objects.bulk_update(
+                questions_to_update, self.question_fields, batch_size=self.batch_size
+            )
+        if new_questions:
+            Question.objects.bulk_create(new_questions, batch_size=self.batch_size)
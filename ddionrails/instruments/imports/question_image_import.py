@@ -4,32 +4,46 @@
 
 from csv import DictReader
 from pathlib import Path
-from typing import List
+from typing import Dict
+from uuid import UUID
 
+from ddionrails.imports.helpers import hash_with_namespace_uuid
 from ddionrails.instruments.models.question import Question
 from ddionrails.studies.models import Study
 
 
-def questions_images_import(file: Path, study: Study) -> None:
-    "Initiate imports of all question images"
+def questions_images_import(file: Path, study: Study, batch_size: int = 1000) -> None:
+    """Initiate imports of all question images
+
+    Question ids are computed from the study, instrument and question names,
+    so a single query is enough to check, that all questions exist.
+    """
     if not file.exists():
         return
+    questions: Dict[UUID, Question] = {}
+    rows: Dict[UUID, Dict[str, str]] = {}
     with open(file, "r", encoding="utf8") as csv:
-        reader = DictReader(csv)
-        questions: List[Question] = []
-        for index, row in enumerate(reader):
-            question = Question.objects.get(
-                instrument__study=study,
-                instrument__name=row["instrument"],
-                name=row["question"],
+        for row in DictReader(csv):
+            instrument_id = hash_with_namespace_uuid(study.id, row["instrument"])
+            question_id = hash_with_namespace_uuid(
+                instrument_id, row["question"], cache=False
+            )
+            questions[question_id] = Question(
+                id=question_id,
+                images={
+                    "de": {"url": row["url_de"], "label": row["label_de"]},
+                    "en": {"url": row["url"], "label": row["label"]},
+                },
             )
-            question.images = {
-                "de": {"url": row["url_de"], "label": row["label_de"]},
-                "en": {"url": row["url"], "label": row["label"]},
-            }
-            questions.append(question)
-            if index % 1000:
-                Question.objects.bulk_update(questions, ["images"])
-                questions = []
-        if questions:
-            Question.objects.bulk_update(questions, ["images"])
+            rows[question_id] = row
+    existing_ids = set(
+        Question.objects.filter(id__in=questions.keys()).values_list("id", flat=True)
+    )
+    missing = [
+        row for question_id, row in rows.items() if question_id not in existing_ids
+    ]
+    if missing:
+        raise Question.DoesNotExist(
+            "Questions do not exist:\n" + "\n".join(str(row) for row in missing)
+        )
+    Question.objects.bulk_update(questions.values(), ["images"], batch_size=batch_size)
@@ -8,6 +8,8 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Tuple
 
+from django.db.transaction import atomic
+
 from ddionrails.base.helpers.ddionrails_typing import QuestionAnswer
 from ddionrails.imports.helpers import hash_with_base_uuid, hash_with_namespace_uuid
 from ddionrails.instruments.models import Instrument, Question
@@ -48,8 +50,14 @@ def answer_import(file: Path, study: Study) -> None:  # pylint: disable=unused-a
     del answer_list_answers
 
 
-def answer_relation_import(file: Path, study: Study) -> None:
-    """Link answers and QuestionItems"""
+@atomic
+def answer_relation_import(file: Path, study: Study, batch_size: int = 5000) -> None:
+    """Link answers and QuestionItems
+
+    All categorical QuestionItems of the study are loaded with a single query
+    and the relations are written in batches of ``batch_size``.
+    No relation is written if one of the batches fails.
+    """
     answers: Dict[Tuple[str, str], List[uuid.UUID]] = {}
     questions = file.parent.joinpath("questions.csv")
     with open(file, "r", encoding="utf-8") as answers_file:
@@ -61,24 +69,33 @@ def answer_relation_import(file: Path, study: Study) -> None:
                 f"{answer['value']}{answer['label']}{answer['label_de']}"
             )
             answers[answerlist_key].append(answer_id)
+    categorical_question_items: Dict[Tuple[str, str, str], uuid.UUID] = {
+        (instrument, question, item): item_id
+        for instrument, question, item, item_id in QuestionItem.objects.filter(
+            scale="cat", question__instrument__study=study
+        ).values_list("question__instrument__name", "question__name", "name", "id")
+    }
     relations = []
-    categorical_question_items = QuestionItem.objects.filter(
-        scale="cat", question__instrument__study=study
-    ).prefetch_related("question", "question__instrument")
     with open(questions, "r", encoding="utf8") as questions_file:
         for question_item in DictReader(questions_file):
             if question_item["scale"] != "cat":
                 continue
-            question_item_object = categorical_question_items.get(
-                question__instrument__name=question_item["instrument"],
-                question__name=question_item["name"],
-                name=question_item["item"],
+            item_key = (
+                question_item["instrument"],
+                question_item["name"],
+                question_item["item"],
             )
+            try:
+                question_item_id = categorical_question_items[item_key]
+            except KeyError as error:
+                raise QuestionItem.DoesNotExist(
+                    f"Categorical question item {item_key} does not exist."
+                ) from error
             answerlist_key = (question_item["instrument"], question_item["answer_list"])
             try:
                 for answer_id in answers[answerlist_key]:
                     relation = Answer.question_items.through()
-                    relation.questionitem_id = question_item_object.id  # type: ignore
+                    relation.questionitem_id = question_item_id  # type: ignore
                     relation.answer_id = answer_id  # type: ignore
                     relations.append(relation)
             except KeyError as error:
@@ -91,6 +108,11 @@ def answer_relation_import(file: Path, study: Study) -> None:
                 # Raising a key error will not print newlines since it prints the message
                 # in quotes.
                 raise ValueError(error_msg) from error
+            if len(relations) >= batch_size:
+                Answer.question_items.through.objects.bulk_create(
+                    relations, ignore_conflicts=True
+                )
+                relations = []
     Answer.question_items.through.objects.bulk_create(relations, ignore_conflicts=True)
 
 
@@ -4,10 +4,9 @@
 
 from collections import namedtuple
 from csv import DictReader
-from typing import Dict, List, Set, Tuple
-from uuid import UUID
+from typing import List, Set, Tuple
 
-from ddionrails.imports.helpers import hash_with_namespace_uuid
+from ddionrails.imports.helpers import hash_many_with_namespace_uuid
 from ddionrails.instruments.models.instrument import Instrument
 from ddionrails.instruments.models.item_variable import ItemVariable
 from ddionrails.instruments.models.question_variable import QuestionVariable
@@ -92,37 +91,34 @@ def _create_question_relation_objects(
 def _read_relations(
     file_path: str, study: Study
 ) -> Tuple[Set[InstrumentRelation], set[QuestionRelation], set[ItemRelation]]:
-    datasets: Dict[str, UUID] = {}
-    instruments: Dict[str, UUID] = {}
-    instrument_dataset_relations: Set[InstrumentRelation] = set()
-    question_variable_relations: set[QuestionRelation] = set()
-    item_variable_relations: set[ItemRelation] = set()
     with open(file=file_path, mode="r", encoding="utf-8") as csv_file:
-        reader = DictReader(csv_file)
-        for row in reader:
-            if row["instrument"] not in instruments:
-                instruments[row["instrument"]] = hash_with_namespace_uuid(
-                    study.id, row["instrument"]
-                )
-            if row["dataset"] not in datasets:
-                datasets[row["dataset"]] = hash_with_namespace_uuid(
-                    study.id, row["dataset"]
-                )
-            instrument_dataset_relations.add(
-                InstrumentRelation(
-                    instruments[row["instrument"]], datasets[row["dataset"]]
-                )
-            )
-            variable_id = hash_with_namespace_uuid(
-                datasets[row["dataset"]], row["variable"]
-            )
-            question_id = hash_with_namespace_uuid(
-                instruments[row["instrument"]], row["question"]
-            )
-            if "item" in row:
-                item_id = hash_with_namespace_uuid(question_id, row["item"])
-                item_variable_relations.add(ItemRelation(item_id, variable_id))
-            question_variable_relations.add(QuestionRelation(question_id, variable_id))
+        rows = list(DictReader(csv_file))
+
+    dataset_ids = hash_many_with_namespace_uuid(
+        (study.id, row["dataset"]) for row in rows
+    )
+    instrument_ids = hash_many_with_namespace_uuid(
+        (study.id, row["instrument"]) for row in rows
+    )
+    variable_ids = hash_many_with_namespace_uuid(
+        zip(dataset_ids, (row["variable"] for row in rows))
+    )
+    question_ids = hash_many_with_namespace_uuid(
+        zip(instrument_ids, (row["question"] for row in rows))
+    )
+
+    instrument_dataset_relations: Set[InstrumentRelation] = set(
+        map(InstrumentRelation, instrument_ids, dataset_ids)
+    )
+    question_variable_relations: set[QuestionRelation] = set(
+        map(QuestionRelation, question_ids, variable_ids)
+    )
+    item_variable_relations: set[ItemRelation] = set()
+    if rows and "item" in rows[0]:
+        item_ids = hash_many_with_namespace_uuid(
+            zip(question_ids, (row["item"] for row in rows))
+        )
+        item_variable_relations = set(map(ItemRelation, item_ids, variable_ids))
 
     return (
         instrument_dataset_relations,
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 22:45
+# pylint: disable-all
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("concepts", "0002_auto_20201016_0842"),
+        ("instruments", "0005_alter_question_items"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                models.F("instrument"),
+                django.db.models.functions.comparison.Coalesce(
+                    "sort_id", models.Value(2147483647)
+                ),
+                models.F("id"),
+                name="question_keyset_idx",
+            ),
+        ),
+    ]
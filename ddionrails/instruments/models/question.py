@@ -12,12 +12,15 @@ from typing import Any, List, Optional, Union
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import F
 from django.db.models import JSONField as JSONBField
-from django.db.models import QuerySet
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 
 from config.helpers import render_markdown
 from ddionrails.base.helpers.ddionrails_typing import QuestionItemType
+from ddionrails.base.helpers.ordering import NULL_POSITION
 from ddionrails.base.mixins import ModelMixin
 from ddionrails.concepts.models import Concept, Period
 from ddionrails.imports.helpers import hash_with_namespace_uuid
@@ -127,6 +130,15 @@ class Question(ModelMixin, models.Model):
 
     class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
         unique_together = ("instrument", "name")
+        indexes = [
+            # Ordering key of the keyset pagination of the API.
+            models.Index(
+                F("instrument"),
+                Coalesce("sort_id", Value(NULL_POSITION)),
+                F("id"),
+                name="question_keyset_idx",
+            )
+        ]
 
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         id_fields = ["instrument", "name"]
@@ -41,12 +41,9 @@ class AttachmentImport(imports.CSVImport):
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = AttachmentForm
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.study.related_attachments.all().delete()
-
     @atomic
     def execute_import(self):
+        self.study.related_attachments.all().delete()
         for attachment in self.content:
             try:
                 attachment = self._process_field_names(attachment)
@@ -5,7 +5,10 @@
 import csv
 import datetime
 import io
-from typing import Dict, Union
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
 
 from django.apps import apps
 from django.conf import settings
@@ -166,3 +169,37 @@ class Basket(TimeStampedModel):
         with open(file_path, "w") as out:
             serializer.serialize(objects, stream=out)
         return file_path
+
+    @staticmethod
+    @contextmanager
+    def preserve(study: Study) -> Iterator[Path]:
+        """Keep the baskets of a study while the content of the study is removed.
+
+        Baskets and their scripts are recreated with their ids when the block ends.
+        Their variables are written to a file in the backup directory as
+        (basket id, study name, dataset name, variable name) rows, before the
+        block starts. The path of the file is given to the block. The file is
+        removed by BasketVariable.relink(), which links the rows to the
+        imported variables, so the variables stay on disk if the import fails.
+        """
+        basket_variables = apps.get_model("workspace", "BasketVariable")
+        scripts = apps.get_model("workspace", "Script")
+        basket_rows = list(Basket.objects.filter(study=study).values())
+        script_rows = list(scripts.objects.filter(basket__study=study).values())
+        variable_rows = list(
+            basket_variables.objects.filter(basket__study=study).values_list(
+                "basket_id",
+                "variable__dataset__study__name",
+                "variable__dataset__name",
+                "variable__name",
+            )
+        )
+        filename = datetime.datetime.now().strftime(
+            f"basket_variables_{study.name}_%Y%m%d_%H%M%S.json"
+        )
+        file_path = settings.BACKUP_DIR.joinpath(filename).absolute()
+        with open(file_path, "w", encoding="utf8") as out:
+            json.dump(variable_rows, out)
+        yield file_path
+        Basket.objects.bulk_create(Basket(**row) for row in basket_rows)
+        scripts.objects.bulk_create(scripts(**row) for row in script_rows)
@@ -2,10 +2,16 @@
 
 """ Model definitions for ddionrails.workspace app: BasketVariable """
 
+import json
+from pathlib import Path
+from typing import Tuple
+
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db import models
+from django.db import connection, models
+from django.db.models import Exists, OuterRef
 
 from ddionrails.data.models import Variable
+from ddionrails.imports.helpers import hash_with_base_uuid, hash_with_namespace_uuid
 
 from .basket import Basket
 
@@ -69,18 +75,60 @@ class BasketVariable(models.Model):
         return True
 
     @staticmethod
-    def clean_basket_variables(study_name: str = None):
+    def clean_basket_variables(study_name: str = None) -> int:
         """Remove all BasketVariables that are not linked with an existing Variable.
 
         Basket restoration during a clean update might ingest outdated relations.
+        The dangling BasketVariables are found in a single query.
 
         Args:
             study_name: Limits clean up to variables linked to the study with the
                         specified name.
+
+        Returns:
+            The number of removed BasketVariables.
         """
         _filter = dict()
         if study_name:
             _filter["basket__study__name"] = study_name
-        for basket_variable in BasketVariable.objects.filter(**_filter):
-            if not basket_variable.variable_key_exists():
-                basket_variable.delete()
+        dangling = BasketVariable.objects.filter(**_filter).exclude(
+            Exists(Variable.objects.filter(id=OuterRef("variable_id")))
+        )
+        deleted, _ = dangling.delete()
+        return deleted
+
+    @staticmethod
+    def relink(file_path: Path) -> Tuple[int, int]:
+        """Link baskets to imported variables again in a single statement.
+
+        The variable ids are derived from the study, dataset and variable names
+        in the file written by Basket.preserve(). Variables that were not
+        imported again are not linked. The file is removed afterwards.
+
+        Returns:
+            The number of linked basket variables and of preserved ones
+            that were not linked.
+        """
+        with open(file_path, "r", encoding="utf8") as preserved_file:
+            variables = json.load(preserved_file)
+        basket_ids, variable_ids = [], []
+        for basket_id, study_name, dataset_name, variable_name in variables:
+            dataset_id = hash_with_namespace_uuid(
+                hash_with_base_uuid(study_name), dataset_name
+            )
+            basket_ids.append(basket_id)
+            variable_ids.append(hash_with_namespace_uuid(dataset_id, variable_name))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {BasketVariable._meta.db_table} (basket_id, variable_id) "
+                "SELECT preserved.basket_id, preserved.variable_id "
+                "FROM unnest(%s::integer[], %s::uuid[]) "
+                "AS preserved(basket_id, variable_id) "
+                f"JOIN {Variable._meta.db_table} variable "
+                "ON variable.id = preserved.variable_id "
+                "ON CONFLICT (basket_id, variable_id) DO NOTHING",
+                [basket_ids, variable_ids],
+            )
+            linked = cursor.rowcount
+        Path(file_path).unlink()
+        return linked, len(basket_ids) - linked
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for "benchmark_serializers" management command for ddionrails project"""
+
+import json
+from pathlib import Path
+from tempfile import mkdtemp
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from tests.file_factories import destroy_tmp_path
+from tests.instruments.factories import QuestionFactory
+from tests.model_factories import VariableFactory
+
+
+class TestBenchmarkSerializers(TestCase):
+
+    def setUp(self) -> None:
+        self.output_path = Path(mkdtemp())
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        destroy_tmp_path(self.output_path)
+        return super().tearDown()
+
+    def test_benchmark_serializers_writes_results(self):
+        variable = VariableFactory(name="some-variable")
+        QuestionFactory(name="some-question")
+        output = self.output_path.joinpath("results.json")
+        call_command(
+            "benchmark_serializers",
+            variable.dataset.study.name,
+            "--repeat=1",
+            "--output",
+            str(output),
+        )
+
+        report = json.loads(output.read_text(encoding="utf8"))
+        serializers = {result["serializer"]: result for result in report["serializers"]}
+        self.assertEqual(1, serializers["VariableSerializer"]["rows"])
+        self.assertTrue(serializers["VariableSerializer"]["matches"])
+        self.assertTrue(serializers["QuestionSerializer"]["matches"])
+
+    def test_benchmark_serializers_with_missing_study(self):
+        with self.assertRaises(SystemExit) as exit_error:
+            call_command("benchmark_serializers", "some-missing-study")
+        self.assertEqual(1, exit_error.exception.code)
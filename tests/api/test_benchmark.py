@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for ddionrails.api.benchmark"""
+
+from pathlib import Path
+from tempfile import mkdtemp
+
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from ddionrails.api.benchmark import benchmark_querysets, run_serializer_benchmark
+from ddionrails.imports.benchmark import SyntheticStudy, run_import_benchmark
+from ddionrails.studies.models import Study
+from tests.file_factories import destroy_tmp_path
+from tests.model_factories import DatasetFactory, VariableFactory
+
+
+class TestSerializerBenchmark(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+        synthetic_study = SyntheticStudy(
+            name="synthetic-study",
+            datasets=2,
+            variables=20,
+            instruments=2,
+            questions=6,
+            transformations=0,
+            concepts=4,
+            topics=3,
+            periods=2,
+            publications=0,
+        )
+        self.study = Study.objects.create(name=synthetic_study.name)
+        synthetic_study.write(self.study.import_path())
+        run_import_benchmark(self.study)
+        # Related objects that are not set have to be serialized the same way.
+        dataset = DatasetFactory(name="no-period", study=self.study, period=None)
+        VariableFactory(name="no-concept", dataset=dataset, concept="")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def test_values_serialization_matches_instance_serialization(self):
+        for serializer_class, queryset in benchmark_querysets(self.study).items():
+            from_instances = serializer_class(list(queryset), many=True).data
+            from_values = serializer_class(queryset, many=True).data
+            self.assertGreater(len(from_values), 0)
+            self.assertEqual(
+                JSONRenderer().render(from_instances),
+                JSONRenderer().render(from_values),
+                serializer_class.__name__,
+            )
+
+    def test_values_serialization_runs_one_query_per_chunk(self):
+        results = run_serializer_benchmark(self.study, repeat=2)
+
+        self.assertEqual(
+            [
+                ("VariableSerializer", 21, 1),
+                ("StatisticsVariableSerializer", 21, 2),
+                ("QuestionSerializer", 6, 1),
+            ],
+            [
+                (result.serializer, result.rows, result.values_queries)
+                for result in results
+            ],
+        )
+        self.assertTrue(all(result.matches for result in results))
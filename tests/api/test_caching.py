@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for ddionrails.api.caching"""
+
+import json
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from ddionrails.api import caching
+from ddionrails.api.caching import CACHE_NAME, set_study_version, study_version
+from ddionrails.studies.models import Study
+from tests.model_factories import DatasetFactory, StudyFactory, VariableFactory
+
+
+class TestVersionedResponseCache(TestCase):
+    API_PATH = "/api/variables/"
+
+    def setUp(self) -> None:
+        caches[CACHE_NAME].clear()
+        self.api_client = APIClient()
+        self.study = StudyFactory(name="cached-study")
+        self.dataset = DatasetFactory(study=self.study, name="cached-dataset")
+        VariableFactory(dataset=self.dataset, name="first")
+        self.path = f"{self.API_PATH}?study={self.study.name}&dataset={self.dataset.name}"
+        return super().setUp()
+
+    def _names(self):
+        response = self.api_client.get(self.path)
+        self.assertEqual(200, response.status_code)
+        return {variable["name"] for variable in json.loads(response.content)}
+
+    def test_cached_response_is_served_without_variable_queries(self):
+        self.assertEqual({"first"}, self._names())
+        VariableFactory(dataset=self.dataset, name="second")
+        # Only the study and dataset are looked up, by the permission check.
+        with self.assertNumQueries(2):
+            self.assertEqual({"first"}, self._names())
+
+    def test_new_version_queues_rendering_of_tracked_responses(self):
+        self.assertEqual({"first"}, self._names())
+        self.api_client.get(f"{self.path}&paginate=True")
+        VariableFactory(dataset=self.dataset, name="second")
+        with patch.object(caching, "enqueue") as enqueue:
+            set_study_version(self.study.name, "some-run")
+            self.assertEqual(2, enqueue.call_count)
+            for call in enqueue.call_args_list:
+                caching.refresh_response(**call.kwargs)
+            self.assertEqual({"first", "second"}, self._names())
+        self.assertEqual(2, enqueue.call_count)
+        self.assertEqual("some-run", study_version(self.study.name))
+
+    def test_unknown_parameters_share_the_cached_response(self):
+        self.assertEqual({"first"}, self._names())
+        VariableFactory(dataset=self.dataset, name="second")
+        self.path = f"{self.path}&unknown=1"
+        self.assertEqual({"first"}, self._names())
+        with patch.object(caching, "enqueue") as enqueue:
+            set_study_version(self.study.name, "some-run")
+        enqueue.assert_called_once()
+        self.assertEqual(
+            f"{self.API_PATH}?dataset={self.dataset.name}&study={self.study.name}",
+            enqueue.call_args.kwargs["path"],
+        )
+
+    def test_responses_are_cached_per_scheme_and_host(self):
+        self.assertEqual({"first"}, self._names())
+        VariableFactory(dataset=self.dataset, name="second")
+        response = self.api_client.get(self.path, secure=True)
+        self.assertEqual(2, len(json.loads(response.content)))
+        with self.settings(ALLOWED_HOSTS=["other.example"]):
+            response = self.api_client.get(self.path, HTTP_HOST="other.example")
+        self.assertEqual(2, len(json.loads(response.content)))
+
+    def test_unknown_studies_get_versions_that_expire(self):
+        cache = caches[CACHE_NAME]
+        with patch.object(cache, "add", wraps=cache.add) as add:
+            study_version("made-up-study")
+            self.assertEqual(
+                caching.UNKNOWN_STUDY_TIMEOUT, add.call_args.kwargs["timeout"]
+            )
+            study_version(self.study.name)
+            self.assertIsNone(add.call_args.kwargs["timeout"])
+            caching._last_modified("made-up-study")
+            self.assertEqual(
+                caching.UNKNOWN_STUDY_TIMEOUT, add.call_args.kwargs["timeout"]
+            )
+        self.assertIsNone(caching._last_modified("made-up-study"))
+
+    def test_outdated_response_is_served_once_while_refreshed(self):
+        self.assertEqual({"first"}, self._names())
+        VariableFactory(dataset=self.dataset, name="second")
+        caches[CACHE_NAME].set(f"version:{self.study.name}", "other-run")
+        with patch.object(caching, "enqueue") as enqueue:
+            self.assertEqual({"first"}, self._names())
+            self.assertEqual({"first"}, self._names())
+        enqueue.assert_called_once()
+        caching.refresh_response(**enqueue.call_args.kwargs)
+        self.assertEqual({"first", "second"}, self._names())
+
+    def test_outdated_response_keeps_the_etag_of_its_version(self):
+        etag = self.api_client.get(self.path)["ETag"]
+        VariableFactory(dataset=self.dataset, name="second")
+        with patch.object(caching, "enqueue") as enqueue:
+            set_study_version(self.study.name, "some-run")
+            response = self.api_client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(etag, response["ETag"])
+            response = self.api_client.get(self.path)
+            self.assertEqual(etag, response["ETag"])
+            self.assertNotIn("Last-Modified", response)
+            caching.refresh_response(**enqueue.call_args.kwargs)
+
+        response = self.api_client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+        names = {variable["name"] for variable in json.loads(response.content)}
+        self.assertEqual({"first", "second"}, names)
+
+
+class TestConditionalGet(TestCase):
+
+    def setUp(self) -> None:
+        caches[CACHE_NAME].clear()
+        self.study = StudyFactory(name="some-study")
+        DatasetFactory(study=self.study, name="some-dataset")
+        self.path = f"/api/datasets/?study={self.study.name}"
+        return super().setUp()
+
+    def test_matching_etag_is_answered_without_queries(self):
+        response = self.client.get(self.path)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            http_date(Study.objects.get(pk=self.study.pk).modified.timestamp()),
+            response["Last-Modified"],
+        )
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.path, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(304, response.status_code)
+
+    def test_new_version_changes_etag(self):
+        etag = self.client.get(self.path)["ETag"]
+        set_study_version(self.study.name, "some-run")
+
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+        other_study_path = "/api/datasets/?study=some-other-study"
+        self.assertNotEqual(response["ETag"], self.client.get(other_study_path)["ETag"])
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.path)["Last-Modified"]
+        response = self.client.get(self.path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(304, response.status_code)
+
+        response = self.client.get(
+            self.path, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT"
+        )
+        self.assertEqual(200, response.status_code)
+
+    def test_browsable_api_is_not_conditional(self):
+        response = self.client.get(self.path, HTTP_ACCEPT="text/html")
+        self.assertNotIn("ETag", response)
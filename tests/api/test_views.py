@@ -4,14 +4,17 @@
 """Test cases for views in ddionrails.api app"""
 
 import json
+from base64 import urlsafe_b64encode
 from typing import Dict, List
 from unittest.mock import PropertyMock, patch
 from uuid import UUID, uuid4
 
+from django.core.cache import caches
 from django.test import LiveServerTestCase, TestCase
 from django.test.client import Client
 from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 
+from ddionrails.api.caching import CACHE_NAME
 from ddionrails.api.views.user_tools import BasketVariableSet as basket_variables_api
 from ddionrails.instruments.models.concept_question import ConceptQuestion
 from ddionrails.instruments.models.question_variable import QuestionVariable
@@ -376,6 +379,38 @@ class TestDatasetViewSet(TestCase):
         self.assertEqual(1, content["count"])
         self.assertEqual(getattr(dataset, "name"), content["results"][0]["name"])
 
+    def test_keyset_pagination(self) -> None:
+        study = StudyFactory(name="some-study")
+        names = sorted(
+            DatasetFactory(name=f"dataset-{index}", study=study).name
+            for index in range(5)
+        )
+
+        response = self.client.get(self.API_PATH + "?paginate=keyset&limit=3")
+        content = json.loads(response.content)
+        results = [dataset["name"] for dataset in content["results"]]
+        content = json.loads(self.client.get(content["next"]).content)
+        results += [dataset["name"] for dataset in content["results"]]
+        self.assertEqual(names, results)
+        self.assertIsNone(content["next"])
+
+    def test_stream_json_array(self) -> None:
+        DatasetFactory(name="some-dataset")
+        DatasetFactory(name="some-other-dataset")
+        expected = json.loads(self.client.get(self.API_PATH + "?paginate=False").content)
+
+        response = self.client.get(self.API_PATH + "?paginate=False&stream=json")
+        self.assertTrue(response.streaming)
+        self.assertTrue(response_is_json(response))
+        content = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(expected, content)
+
+    def test_stream_requires_unpaginated_list(self) -> None:
+        response = self.client.get(self.API_PATH + "?stream=json")
+        self.assertEqual(406, response.status_code)
+        response = self.client.get(self.API_PATH + "?paginate=False&stream=xml")
+        self.assertEqual(406, response.status_code)
+
 
 class TestInstrumentViewSet(TestCase):
     API_PATH = "/api/instruments/"
@@ -422,6 +457,7 @@ class TestVariableViewSet(LiveServerTestCase):
     api_client: APIClient
 
     def setUp(self):
+        caches[CACHE_NAME].clear()
         self.api_client = APIClient()
         self.concept = ConceptFactory(name="test-concept")
         self.topic = TopicFactory(name="test-topic")
@@ -560,6 +596,71 @@ class TestVariableViewSet(LiveServerTestCase):
         content = json.loads(response.content)
         self.assertEqual(variable_amount, len(content))
 
+    def test_keyset_pagination(self):
+        """Pages follow the sort_id of variables, with unsorted variables last."""
+        dataset = DatasetFactory()
+        variables = [
+            VariableFactory(dataset=dataset, sort_id=sort_id)
+            for sort_id in (1, 0, None, 2, None)
+        ]
+        expected = [
+            str(variable.id)
+            for variable in sorted(
+                variables,
+                key=lambda variable: (
+                    variable.sort_id is None,
+                    variable.sort_id or 0,
+                    variable.id,
+                ),
+            )
+        ]
+        next_url = (
+            self.API_PATH + f"?study={dataset.study.name}&dataset={dataset.name}"
+            "&paginate=keyset&limit=2"
+        )
+        results = []
+        while next_url:
+            response = self.api_client.get(next_url)
+            self.assertEqual(200, response.status_code)
+            content = json.loads(response.content)
+            self.assertNotIn("count", content)
+            results += [variable["id"] for variable in content["results"]]
+            next_url = content["next"]
+        self.assertEqual(expected, results)
+
+    def test_keyset_pagination_invalid_cursor(self):
+        dataset = DatasetFactory()
+        response = self.api_client.get(
+            self.API_PATH + f"?study={dataset.study.name}&dataset={dataset.name}"
+            "&paginate=keyset&cursor=invalid"
+        )
+        self.assertEqual(404, response.status_code)
+
+    def test_keyset_pagination_cursor_with_invalid_values(self):
+        dataset = DatasetFactory()
+        path = (
+            self.API_PATH + f"?study={dataset.study.name}&dataset={dataset.name}"
+            "&paginate=keyset&cursor="
+        )
+        for key in (["not-a-uuid", 1, str(uuid4())], [str(dataset.id), {}, "text"]):
+            cursor = urlsafe_b64encode(json.dumps(key).encode("utf8")).decode("ascii")
+            response = self.api_client.get(path + cursor)
+            self.assertEqual(404, response.status_code)
+
+    def test_stream_ndjson(self):
+        """Every variable is streamed as a JSON object on a line of its own."""
+        study = StudyFactory()
+        dataset = DatasetFactory(study=study)
+        for _ in range(3):
+            VariableFactory(dataset=dataset)
+        path = self.API_PATH + f"?study={study.name}&dataset={dataset.name}"
+        expected = json.loads(self.api_client.get(path).content)
+
+        response = self.api_client.get(path + "&stream=ndjson")
+        self.assertEqual("application/x-ndjson", response["content-type"])
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(expected, [json.loads(line) for line in lines])
+
 
 class TestBasketVariableSet(TestCase):
     API_PATH = "/api/basket-variables/"
@@ -170,7 +170,7 @@ class WebhookEndpointTests(LiveServerTestCase):
         )
 
     def test_basket_preservation(self):
-        """Check if basket variables are properly recovered from backup"""
+        """Check if basket variables are preserved by a reimport"""
         instrument = Instrument.objects.filter(study=self.study).first()
         instrument_name = instrument.name
         instrument.delete()
@@ -180,9 +180,6 @@ class WebhookEndpointTests(LiveServerTestCase):
         # All the patching start
         tmp_backup = TemporaryDirectory()  # pylint: disable=consider-using-with
 
-        backup_dir_helpers_patch = patch(
-            "ddionrails.api.helpers.BACKUP_DIR", Path(tmp_backup.name)
-        )
         queue_mock_helpers_patch = patch("ddionrails.api.helpers.enqueue")
         queue_mock_webhook_patch = patch("ddionrails.api.views.webhooks.enqueue")
         set_up_repo_patch = patch(
@@ -190,7 +187,6 @@ class WebhookEndpointTests(LiveServerTestCase):
         )
         update_function_patch = patch("ddionrails.api.helpers.update_single_study")
 
-        backup_dir_helpers_patch.start()
         queue_mock_helpers = queue_mock_helpers_patch.start()
         queue_mock_webhook = queue_mock_webhook_patch.start()
         set_up_repo_patch.start()
@@ -210,7 +206,6 @@ class WebhookEndpointTests(LiveServerTestCase):
             )
 
         # Tear down all the patching start
-        backup_dir_helpers_patch.stop()
         queue_mock_helpers.stop()
         queue_mock_webhook.stop()
         set_up_repo_patch.stop()
@@ -229,7 +224,7 @@ class WebhookEndpointTests(LiveServerTestCase):
             BasketVariable.objects.filter(variable=basket_variable_variable).exists()
         )
 
-    def _enqueue(self, function, *args):
+    def _enqueue(self, function, *args, depends_on=None):  # pylint: disable=W0613
         function(*args)
 
     def _update_study(self):
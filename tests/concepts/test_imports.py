@@ -16,7 +16,7 @@ from ddionrails.concepts.imports import (
 from ddionrails.concepts.models import AnalysisUnit, ConceptualDataset, Period
 from ddionrails.studies.models import TopicList
 from tests.file_factories import TMPCSV
-from tests.model_factories import StudyFactory
+from tests.model_factories import PeriodFactory, StudyFactory
 
 
 class TestAnalysisUnitImport(TestCase):
@@ -86,6 +86,54 @@ class TestPeriodImport(TestCase):
         period = Period.objects.get(name=valid_period["name"])
         self.assertEqual(valid_period["label"], period.label)
 
+    def test_import_updates_periods_and_reports_invalid_rows(self):
+        study = StudyFactory()
+        existing_period = PeriodFactory(study=study, name="some-period")
+        progress = []
+        rows = [
+            {"period_name": "some-period", "label": "Updated label"},
+            {"name": "Invalid-Period", "label": "Upper case name"},
+            {"name": "", "label": "No name"},
+            {"name": "other-period", "label": "Other period"},
+        ]
+        importer = PeriodImport("periods.csv", study, progress_callback=progress.append)
+        importer.content = rows
+
+        with self.assertNumQueries(4):
+            importer.execute_import()
+
+        existing_period.refresh_from_db()
+        self.assertEqual("Updated label", existing_period.label)
+        other_period = Period.objects.get(study=study, name="other-period")
+        self.assertEqual(other_period.generate_id(), other_period.id)
+        self.assertEqual(2, Period.objects.filter(study=study).count())
+        self.assertEqual([3, 4], [line for line, _ in importer.invalid_rows])
+        self.assertIn("name", importer.invalid_rows[0][1])
+        self.assertEqual([1, 1], progress)
+
+    def test_bulk_import_matches_import_of_single_elements(self):
+        rows = [
+            {"name": "some-period", "label": " Updated label ", "label_de": ""},
+            {"name": "other-period", "label": "Other period\t"},
+        ]
+        periods = {}
+        for bulk in (False, True):
+            study = StudyFactory(name=f"study-{bulk}")
+            PeriodFactory(
+                study=study, name="some-period", label="Label", description="Text"
+            )
+            importer = PeriodImport("periods.csv", study)
+            importer.bulk = bulk
+            importer.content = [dict(row) for row in rows]
+            importer.execute_import()
+            periods[bulk] = list(
+                Period.objects.filter(study=study)
+                .order_by("name")
+                .values("name", "label", "label_de", "description", "description_de")
+            )
+        self.assertEqual(periods[False], periods[True])
+        self.assertEqual("Updated label", periods[True][1]["label"])
+
     def test_import_with_invalid_data(self):
         study = StudyFactory()
         importer = PeriodImport("", study)
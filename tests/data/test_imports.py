@@ -16,15 +16,19 @@ from ddionrails.data.imports import (
     DatasetJsonImport,
     TransformationImport,
     VariableImport,
+    siblings_generation,
     variables_images_import,
 )
 from ddionrails.data.models import Dataset, Transformation, Variable
+from ddionrails.data.models.transformation import Sibling
 from ddionrails.imports.manager import StudyImportManager
 from tests.file_factories import FAKE, TMPCSV, TMPJSON
 from tests.model_factories import (
     ConceptFactory,
     DatasetFactory,
+    PeriodFactory,
     StudyFactory,
+    TransformationFactory,
     VariableFactory,
 )
 
@@ -294,6 +298,43 @@ class TestDatasetJsonImport(TestCase):
             dataset_json_importer.read_file()
             dataset_json_importer.execute_import()
 
+    def test_import_is_written_in_batches(self):
+        dataset = DatasetFactory()
+        existing = VariableFactory(dataset=dataset, name="variable_0")
+        content = [
+            {
+                "study": dataset.study.name,
+                "dataset": dataset.name,
+                "name": f"variable_{i}",
+            }
+            for i in range(5)
+        ]
+        tmp_file = TMPJSON(content, file_name=f"{dataset.name}.json")
+        dataset_json_importer = DatasetJsonImport(tmp_file.name, dataset.study)
+        dataset_json_importer.batch_size = 2
+        with patch.object(
+            DatasetJsonImport,
+            "_import_batch",
+            side_effect=dataset_json_importer._import_batch,
+        ) as import_batch:
+            dataset_json_importer.read_file()
+            dataset_json_importer.execute_import()
+
+        self.assertEqual(
+            [2, 2, 1], [len(call.args[0]) for call in import_batch.mock_calls]
+        )
+        self.assertEqual(5, Variable.objects.filter(dataset=dataset).count())
+        existing.refresh_from_db()
+        self.assertEqual(0, existing.sort_id)
+        self.assertEqual(
+            list(range(5)),
+            list(
+                Variable.objects.filter(dataset=dataset)
+                .order_by("sort_id")
+                .values_list("sort_id", flat=True)
+            ),
+        )
+
 
 class TestTransformationImport(TestCase):
 
@@ -405,7 +446,7 @@ class TestVariableImport(TestCase):
     def setUp(self) -> None:
         self.study = StudyFactory()
         self.dataset = DatasetFactory(study=self.study)
-        self.variables = FAKE.words(nb=4)
+        self.variables = FAKE.words(nb=4, unique=True)
         variable_data = []
         self.concepts = []
         for variable in self.variables:
@@ -493,6 +534,57 @@ class TestVariableImport(TestCase):
         with TEST_CASE.assertRaises(ValueError):
             VariableImport(filename=self.tmp_file.name).import_element(element)
 
+    def test_variable_import_updates_existing_variables(self):
+        variable = VariableFactory(
+            dataset=self.dataset, name=self.variables[0], label="existing-label"
+        )
+        with patch(**self.tmp_file.import_patch_arguments):
+            VariableImport.run_import(self.tmp_file.name, study=self.study)
+
+        self.assertEqual(len(self.variables), Variable.objects.count())
+        variable.refresh_from_db()
+        self.assertEqual("existing-label", variable.label)
+        self.assertEqual(self.concepts[0], variable.concept)
+        self.assertEqual(self.dataset.period_id, variable.period_id)
+
+    def test_variable_import_sets_harmonization_flags(self):
+        dataset = DatasetFactory(study=self.study, name="long", period__name="0")
+        content = [
+            {"dataset": dataset.name, "name": name}
+            for name in ("income_h", "income_v1", "income")
+        ]
+        tmp_file = TMPCSV(content)
+        importer = VariableImport(tmp_file.name, self.study)
+        importer.read_file()
+        importer.execute_import()
+
+        variables = {
+            variable.name: variable
+            for variable in Variable.objects.filter(dataset=dataset)
+        }
+        self.assertTrue(all(variable.long_variable for variable in variables.values()))
+        self.assertTrue(variables["income_h"].harmonization)
+        self.assertTrue(variables["income_v1"].is_harmonized)
+        self.assertFalse(variables["income"].harmonization)
+        self.assertFalse(variables["income"].is_harmonized)
+        self.assertEqual(
+            {"read", "lookup", "prepare", "update", "create"}, set(importer.timings)
+        )
+
+    def test_variable_import_query_count_is_independent_of_rows(self):
+        importer = VariableImport(self.tmp_file.name, self.study)
+        importer.read_file()
+        # datasets, concepts, existing variables and one bulk insert
+        with self.assertNumQueries(4):
+            importer.execute_import()
+
+    def test_variable_import_fails_with_missing_dataset(self):
+        tmp_file = TMPCSV([{"dataset": "missing-dataset", "name": "some-variable"}])
+        importer = VariableImport(tmp_file.name, self.study)
+        importer.read_file()
+        with self.assertRaises(Dataset.DoesNotExist):
+            importer.execute_import()
+
 
 class TestVariableImageImport(TestCase):
 
@@ -526,3 +618,115 @@ class TestVariableImageImport(TestCase):
         for variable in self.variables:
             variable.refresh_from_db()
             self.assertDictEqual(self.variable_image_map[variable.name], variable.images)
+
+    def test_variables_images_import_query_count(self):
+        # One query to find the existing variables and one bulk update.
+        with self.assertNumQueries(2):
+            variables_images_import(study=self.study, file=self.tmp_file.name)
+
+    def test_variables_images_import_lists_all_missing_variables(self):
+        missing = self.variables[:2]
+        Variable.objects.filter(id__in=[variable.id for variable in missing]).delete()
+        with self.assertRaises(Variable.DoesNotExist) as context:
+            variables_images_import(study=self.study, file=self.tmp_file.name)
+        for variable in missing:
+            self.assertIn(variable.name, str(context.exception))
+        self.assertFalse(Variable.objects.exclude(images={}).exists())
+
+
+class TestSiblingsGeneration(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        long_dataset = DatasetFactory(
+            study=self.study, period=PeriodFactory(study=self.study, name="0")
+        )
+        self.long_variable = VariableFactory(name="some_h", dataset=long_dataset)
+        dataset = DatasetFactory(study=self.study)
+        self.variables = [
+            VariableFactory(name=f"variable_{index}", dataset=dataset)
+            for index in range(3)
+        ]
+        for variable in self.variables:
+            TransformationFactory(origin=variable, target=self.long_variable)
+        return super().setUp()
+
+    def _sibling_pairs(self):
+        return set(Sibling.objects.values_list("sibling_a__name", "sibling_b__name"))
+
+    def test_siblings_of_variables_with_the_same_long_variable(self):
+        siblings_generation(None, self.study)
+        self.assertEqual(
+            {
+                (variable_a.name, variable_b.name)
+                for variable_a in self.variables
+                for variable_b in self.variables
+                if variable_a != variable_b
+            },
+            self._sibling_pairs(),
+        )
+
+    def test_only_changed_siblings_are_written(self):
+        siblings_generation(None, self.study)
+        unchanged_ids = set(
+            Sibling.objects.filter(
+                sibling_a=self.variables[0], sibling_b=self.variables[1]
+            ).values_list("id", flat=True)
+        )
+        Transformation.objects.filter(origin=self.variables[2]).delete()
+        Sibling.objects.create(sibling_a=self.variables[0], sibling_b=self.variables[1])
+
+        siblings_generation(None, self.study)
+
+        self.assertEqual(
+            {("variable_0", "variable_1"), ("variable_1", "variable_0")},
+            self._sibling_pairs(),
+        )
+        self.assertEqual(2, Sibling.objects.count())
+        self.assertEqual(
+            unchanged_ids,
+            set(
+                Sibling.objects.filter(
+                    sibling_a=self.variables[0], sibling_b=self.variables[1]
+                ).values_list("id", flat=True)
+            ),
+        )
+
+    def test_transformation_import_adds_siblings_of_changed_long_variables(self):
+        siblings_generation(None, self.study)
+        existing_ids = set(Sibling.objects.values_list("id", flat=True))
+        other_long_variable = VariableFactory(
+            name="other_h", dataset=self.long_variable.dataset
+        )
+        added = VariableFactory(name="added", dataset=self.variables[0].dataset)
+        unrelated = VariableFactory(name="unrelated", dataset=added.dataset)
+        TransformationFactory(origin=unrelated, target=other_long_variable)
+        elements = [
+            {
+                "origin_study_name": self.study.name,
+                "origin_dataset_name": origin.dataset.name,
+                "origin_variable_name": origin.name,
+                "target_study_name": self.study.name,
+                "target_dataset_name": self.long_variable.dataset.name,
+                "target_variable_name": target.name,
+            }
+            for origin, target in (
+                (added, self.long_variable),
+                (self.variables[0], self.long_variable),
+            )
+        ]
+
+        tmp_file = TMPCSV(content=elements)
+        with patch(**tmp_file.import_patch_arguments):
+            importer = TransformationImport(tmp_file.name, self.study)
+            importer.read_file()
+            importer.execute_import()
+
+        pairs = self._sibling_pairs()
+        for variable in self.variables:
+            self.assertIn(("added", variable.name), pairs)
+            self.assertIn((variable.name, "added"), pairs)
+        # The group of the other long variable has no new transformations.
+        self.assertFalse(Sibling.objects.filter(sibling_a=unrelated).exists())
+        self.assertEqual(12, len(pairs))
+        self.assertTrue(existing_ids <= set(Sibling.objects.values_list("id", flat=True)))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for "benchmark_import" management command for ddionrails project"""
+
+import json
+from pathlib import Path
+from tempfile import mkdtemp
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ddionrails.concepts.models import Concept
+from ddionrails.studies.models import Study
+from tests.file_factories import destroy_tmp_path
+from tests.model_factories import StudyFactory
+
+SCALE = (
+    "--datasets=2",
+    "--variables=10",
+    "--instruments=2",
+    "--questions=4",
+    "--transformations=5",
+    "--concepts=3",
+    "--topics=2",
+    "--periods=1",
+    "--publications=1",
+)
+
+
+class TestBenchmarkImport(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def test_benchmark_import_writes_results(self):
+        output = self.repo_base_path.joinpath("results.json")
+        call_command("benchmark_import", *SCALE, "--output", str(output))
+
+        report = json.loads(output.read_text(encoding="utf8"))
+        self.assertEqual(10, report["scale"]["variables"])
+        self.assertEqual("postgresql", report["database"])
+        entities = {result["entity"]: result for result in report["entities"]}
+        self.assertEqual(10, entities["variables"]["rows_read"])
+        self.assertIsNone(entities["variables"]["error"])
+        self.assertGreater(entities["variables"]["queries"], 0)
+
+        self.assertFalse(Study.objects.filter(name="benchmark").exists())
+        self.assertFalse(Concept.objects.filter(name__startswith="benchmark-").exists())
+        self.assertFalse(self.repo_base_path.joinpath("benchmark").exists())
+
+    def test_benchmark_import_with_existing_study(self):
+        StudyFactory(name="benchmark")
+        with self.assertRaises(SystemExit) as exit_error:
+            call_command("benchmark_import", *SCALE)
+        self.assertEqual(1, exit_error.exception.code)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for "import_runs" management command for ddionrails project"""
+
+from datetime import timedelta
+from io import StringIO
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ddionrails.imports.models import ImportRun
+from tests.model_factories import StudyFactory
+
+
+class TestImportRuns(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.started = timezone.now()
+        return super().setUp()
+
+    def _import_run(self, run, entity, offset=0, **kwargs):
+        started = self.started + timedelta(seconds=offset)
+        return ImportRun.objects.create(
+            run=run,
+            study=self.study,
+            study_name=self.study.name,
+            entity=entity,
+            file=f"/some/path/{entity}.csv",
+            started=started,
+            finished=started + timedelta(seconds=2),
+            **kwargs,
+        )
+
+    def test_import_runs_without_runs(self):
+        out = StringIO()
+        call_command("import_runs", stdout=out)
+        self.assertIn("No import runs recorded.", out.getvalue())
+
+    def test_import_runs_shows_latest_run(self):
+        old_run, new_run = uuid4(), uuid4()
+        self._import_run(old_run, "topics", offset=-100)
+        self._import_run(new_run, "periods", rows_read=10, rows_created=6, rows_updated=4)
+        self._import_run(
+            new_run, "variables", offset=1, failed=True, process_peak_memory=2048
+        )
+
+        out = StringIO()
+        call_command("import_runs", self.study.name, stdout=out)
+        lines = out.getvalue().splitlines()
+
+        self.assertIn(str(new_run), lines[0])
+        self.assertNotIn("topics", out.getvalue())
+        self.assertEqual(
+            ["periods", "periods.csv", "2.0", "10", "6", "4", "0", "5.0", "-"],
+            lines[2].split(),
+        )
+        self.assertTrue(lines[3].startswith("variables (failed)"))
+        self.assertEqual(
+            ["total", "2", "files", "3.0", "10", "6", "4", "0", "2.0"],
+            lines[4].split(),
+        )
+
+    def test_import_runs_with_number_of_runs(self):
+        self._import_run(uuid4(), "topics", offset=-100)
+        self._import_run(uuid4(), "periods")
+        out = StringIO()
+        call_command("import_runs", "--runs", "2", stdout=out)
+        self.assertIn("topics", out.getvalue())
+        self.assertIn("periods", out.getvalue())
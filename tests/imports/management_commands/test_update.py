@@ -10,21 +10,27 @@ from contextlib import ExitStack, redirect_stderr, redirect_stdout
 from io import StringIO
 from pathlib import Path
 from tempfile import mkdtemp
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
+from ddionrails.api.caching import set_study_version
 from ddionrails.concepts.models import Period
 from ddionrails.data.models import Dataset, Variable
 from ddionrails.imports.management.commands.update import (
     StudyImportManager,
+    _clear_all_caches,
     update,
     update_all_studies_completely,
     update_single_study,
     update_study_partial,
 )
+from ddionrails.imports.manager import FileImportResult
+from ddionrails.imports.models import ImportRun
 from ddionrails.instruments.models import Instrument
 from ddionrails.studies.models import Study
 from ddionrails.workspace.models import Basket, BasketVariable
@@ -45,6 +51,10 @@ def get_options(study_name):
     options["filename"] = None
     options["clean_import"] = False
     options["no_redis"] = True
+    options["workers"] = 1
+    options["incremental"] = False
+    options["resume"] = None
+    options["staged"] = False
     return options
 
 
@@ -245,7 +255,9 @@ class TestUpdateAllStudiesCompletely(TestCase):
                 call_command("update", option)
 
             self.assertEqual(0, error.exception.code)
-            self.patched_function.assert_called_once_with(True, False, redis=True)
+            self.patched_function.assert_called_once_with(
+                True, False, redis=True, workers=1, incremental=False, staged=False
+            )
             self.patched_function.reset_mock()
 
 
@@ -313,6 +325,16 @@ class TestUpdate(TestCase):
         self.assertIn(instrument.period.name, period_names)
         self.assertIn(instrument.analysis_unit.name, analysis_unit_names)
 
+    def test_failed_files_are_reported_as_error(self):
+        failed = FileImportResult("datasets.json", Path("broken.json"), 0.5, "Broken")
+        with patch(
+            "ddionrails.imports.management.commands.update.update_single_study",
+            return_value=[],
+        ), patch.object(StudyImportManager, "failed_files", return_value=[failed]):
+            success, error = update(get_options(self.study.name))
+        self.assertIsNone(success)
+        self.assertEqual("Failed to import 1 files: broken.json", error)
+
     def test_clean_update(self):
         """Does a clean update remove study data before the update?
 
@@ -360,7 +382,7 @@ class TestUpdate(TestCase):
         clean_import = True
         manager = StudyImportManager(self.study, redis=False)
 
-        def _enqueue(function_object, *args):
+        def _enqueue(function_object, *args, depends_on=None):  # pylint: disable=W0613
             function_object(*args)
 
         with patch(
@@ -388,6 +410,38 @@ class TestUpdate(TestCase):
         for variable in self.file_content["variables.csv"]:
             Variable.objects.get(dataset__name=variable["dataset"], name=variable["name"])
 
+    def test_staged_update_keeps_baskets(self):
+        """A staged clean update should keep baskets without a backup."""
+        manager = StudyImportManager(self.study, redis=False)
+        update_single_study(self.study, True, manager=manager)
+        variable = Variable.objects.get(
+            name=self.file_content["variables.csv"][0]["name"]
+        )
+        outdated_variable = VariableFactory(dataset__study=self.study)
+        basket = BasketFactory(name="study_basket", study=self.study)
+        BasketVariable.objects.create(basket=basket, variable=variable)
+        BasketVariable.objects.create(basket=basket, variable=outdated_variable)
+
+        manager = StudyImportManager(self.study, redis=False)
+        with patch("ddionrails.workspace.models.basket.Basket.backup") as backup:
+            update_single_study(
+                self.study, True, clean_import=True, manager=manager, staged=True
+            )
+        backup.assert_not_called()
+
+        self.assertFalse(Dataset.objects.filter(id=self.dataset.id).exists())
+        self.assertFalse(Variable.objects.filter(id=outdated_variable.id).exists())
+        self.assertEqual(
+            [variable.id],
+            list(
+                BasketVariable.objects.filter(basket=basket).values_list(
+                    "variable_id", flat=True
+                )
+            ),
+        )
+        for variable in self.file_content["variables.csv"]:
+            Variable.objects.get(dataset__name=variable["dataset"], name=variable["name"])
+
 
 class TestUpdateNoData(TestCase):
 
@@ -482,3 +536,134 @@ class TestUpdateNoData(TestCase):
             (manager.study, manager.redis),
             (call_kwargs["manager"].study, call_kwargs["manager"].redis),
         )
+
+
+class TestIncrementalUpdate(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.manager = StudyImportManager(self.study, redis=False)
+        return super().setUp()
+
+    @patch("ddionrails.imports.management.commands.update.changed_files")
+    def test_only_changed_entities_are_imported(self, mocked_changed_files):
+        mocked_changed_files.return_value = {
+            self.manager.base_dir.joinpath("publications.csv")
+        }
+        with patch.object(self.manager, "import_single_entity") as import_entity:
+            update_single_study(self.study, True, manager=self.manager, incremental=True)
+        import_entity.assert_called_once_with("publications")
+
+    @patch("ddionrails.imports.management.commands.update.changed_files")
+    def test_unknown_changes_fall_back_to_full_import(self, mocked_changed_files):
+        mocked_changed_files.return_value = None
+        with patch.object(self.manager, "import_all_entities") as import_all:
+            import_all.return_value = []
+            update_single_study(self.study, True, manager=self.manager, incremental=True)
+        import_all.assert_called_once()
+
+
+class TestUpdateJobChain(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.manager = StudyImportManager(self.study, redis=True)
+        self.import_job = MagicMock(name="import")
+        self.queued = []
+        self.enqueue_patch = patch(
+            "ddionrails.imports.management.commands.update.enqueue",
+            side_effect=self._enqueue,
+        )
+        self.enqueue_patch.start()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.enqueue_patch.stop()
+        return super().tearDown()
+
+    def _enqueue(self, function, *args, depends_on=None):
+        job = MagicMock(name=function.__name__)
+        self.queued.append((function, depends_on, job, list(args)))
+        return job
+
+    def test_clean_update_jobs_wait_for_each_other(self):
+        backup_path = Path(mkdtemp())
+        self.addCleanup(destroy_tmp_path, backup_path)
+        with patch.object(
+            self.manager, "import_all_entities", return_value=[self.import_job]
+        ), patch(
+            "ddionrails.workspace.models.basket.settings.BACKUP_DIR", backup_path
+        ):
+            jobs = update_single_study(
+                self.study, True, clean_import=True, manager=self.manager
+            )
+        relink, clear, version = self.queued
+        self.assertEqual((BasketVariable.relink, [self.import_job]), relink[:2])
+        # The preserved basket variables stay on disk until relink has run.
+        self.assertEqual(list(backup_path.iterdir()), relink[3])
+        self.assertEqual((_clear_all_caches, [relink[2]]), clear[:2])
+        self.assertEqual((set_study_version, [clear[2]]), version[:2])
+        self.assertEqual([version[2]], jobs)
+
+    @patch("ddionrails.imports.management.commands.update.changed_files")
+    def test_incremental_update_clears_caches_after_import(self, mocked_changed_files):
+        mocked_changed_files.return_value = set()
+        with patch.object(
+            self.manager, "import_changed_files", return_value=[self.import_job]
+        ):
+            jobs = update_single_study(
+                self.study, True, manager=self.manager, incremental=True
+            )
+        clear, version = self.queued
+        self.assertEqual((_clear_all_caches, [self.import_job]), clear[:2])
+        self.assertEqual((set_study_version, [clear[2]]), version[:2])
+        self.assertEqual([version[2]], jobs)
+
+
+class TestResumeUpdate(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.run = uuid4()
+        ImportRun.objects.create(
+            run=self.run,
+            study_name=self.study.name,
+            entity="periods",
+            started=timezone.now(),
+        )
+        self.single_study_patch = patch(
+            "ddionrails.imports.management.commands.update.update_single_study"
+        )
+        self.single_study_mocker = self.single_study_patch.start()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.single_study_patch.stop()
+        return super().tearDown()
+
+    def test_resume_latest_run(self):
+        with self.assertRaises(SystemExit) as error:
+            call_command("update", self.study.name, "--resume", "-c")
+        self.assertEqual(0, error.exception.code)
+
+        call_args = self.single_study_mocker.call_args
+        # The study is neither updated from its repository nor removed.
+        self.assertEqual((self.study, True, tuple(), None, False), call_args.args)
+        self.assertEqual(self.run, call_args.kwargs["manager"].run)
+        self.assertTrue(call_args.kwargs["manager"].resumed)
+
+    def test_resume_run_by_id(self):
+        options = {**get_options(self.study.name), "resume": str(self.run)}
+        self.assertEqual(("Done", None), update(options))
+        self.assertEqual(
+            self.run, self.single_study_mocker.call_args.kwargs["manager"].run
+        )
+
+    def test_resume_unknown_run(self):
+        for resume in (str(uuid4()), "no-uuid"):
+            options = {**get_options(self.study.name), "resume": resume}
+            self.assertEqual(
+                (None, f'Study "{self.study.name}" has no import run "{resume}".'),
+                update(options),
+            )
+        self.single_study_mocker.assert_not_called()
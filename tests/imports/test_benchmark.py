@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for ddionrails.imports.benchmark"""
+
+from pathlib import Path
+from tempfile import mkdtemp
+
+from django.test import TestCase, override_settings
+
+from ddionrails.concepts.models import Concept
+from ddionrails.data.models import Transformation, Variable
+from ddionrails.imports.benchmark import SyntheticStudy, run_import_benchmark
+from ddionrails.instruments.models import Question, QuestionItem
+from ddionrails.studies.models import Study
+from tests.file_factories import destroy_tmp_path
+
+
+class TestImportBenchmark(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+        self.synthetic_study = SyntheticStudy(
+            name="synthetic-study",
+            datasets=3,
+            variables=30,
+            instruments=2,
+            questions=10,
+            transformations=45,
+            concepts=8,
+            topics=3,
+            periods=2,
+            publications=2,
+        )
+        self.study = Study.objects.create(name=self.synthetic_study.name)
+        self.synthetic_study.write(self.study.import_path())
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def test_synthetic_study_is_deterministic(self):
+        other_path = self.repo_base_path.joinpath("other")
+        self.synthetic_study.write(other_path)
+        for file in sorted(self.study.import_path().rglob("*.*")):
+            relative_path = file.relative_to(self.study.import_path())
+            self.assertEqual(
+                file.read_text(encoding="utf8"),
+                other_path.joinpath(relative_path).read_text(encoding="utf8"),
+            )
+
+    def test_run_import_benchmark_imports_all_entities(self):
+        results = run_import_benchmark(self.study)
+
+        self.assertEqual(
+            [],
+            [(result.entity, result.error) for result in results if result.error],
+        )
+        by_entity = {result.entity: result for result in results}
+        self.assertEqual(3, by_entity["datasets.json"].files)
+        self.assertEqual(30, by_entity["variables"].rows_read)
+        self.assertEqual(45, by_entity["transformations"].rows_created)
+        self.assertGreater(by_entity["variables"].queries, 0)
+        self.assertEqual(30, Variable.objects.filter(dataset__study=self.study).count())
+        self.assertEqual(
+            10, Question.objects.filter(instrument__study=self.study).count()
+        )
+        self.assertEqual(
+            20,
+            QuestionItem.objects.filter(question__instrument__study=self.study).count(),
+        )
+        self.assertEqual(
+            45, Transformation.objects.filter(origin__dataset__study=self.study).count()
+        )
+        self.assertEqual(
+            8, Concept.objects.filter(name__startswith="synthetic-study-concept-").count()
+        )
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for ddionrails.imports.git_repos"""
+
+import json
+from pathlib import Path
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from git import Actor, Repo
+
+from ddionrails.imports.git_repos import (
+    changed_files,
+    head_commit,
+    record_import_commit,
+    set_up_repo,
+)
+from ddionrails.studies.models import Study
+from tests.file_factories import destroy_tmp_path
+from tests.model_factories import StudyFactory
+
+AUTHOR = Actor("ddionrails", "ddionrails@example.com")
+
+
+class TestChangedFiles(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+        self.study = StudyFactory()
+        self.repo_path = self.repo_base_path.joinpath(self.study.name)
+        self.repo = Repo.init(self.repo_path)
+        self.import_path = self.repo_path.joinpath("ddionrails")
+        self.import_path.mkdir()
+        self.first_commit = self._commit(
+            {"variables.csv": "name\n", "publications.csv": "name\n"}
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def _commit(self, files: dict[str, str]) -> str:
+        for name, content in files.items():
+            self.import_path.joinpath(name).write_text(content, encoding="utf8")
+        self.repo.index.add([str(self.import_path.joinpath(name)) for name in files])
+        return self.repo.index.commit(
+            "Update metadata", author=AUTHOR, committer=AUTHOR
+        ).hexsha
+
+    def test_without_imported_commit(self):
+        self.assertIsNone(changed_files(self.study))
+
+    def test_without_changes(self):
+        self.study.current_commit = self.first_commit
+        self.assertEqual(set(), changed_files(self.study))
+
+    def test_changed_and_added_files(self):
+        self.study.current_commit = self.first_commit
+        self._commit({"publications.csv": "name\nsome-publication\n"})
+        self._commit({"attachments.csv": "type\n"})
+        self.assertEqual(
+            {
+                self.import_path.joinpath("publications.csv"),
+                self.import_path.joinpath("attachments.csv"),
+            },
+            changed_files(self.study),
+        )
+
+    def test_deleted_file_needs_full_import(self):
+        self.study.current_commit = self.first_commit
+        self.repo.index.remove(
+            [str(self.import_path.joinpath("publications.csv"))], working_tree=True
+        )
+        self.repo.index.commit("Remove publications", author=AUTHOR, committer=AUTHOR)
+        self.assertIsNone(changed_files(self.study))
+
+    def test_removed_rows_need_full_import(self):
+        self._commit({"publications.csv": "name\nsome-publication\n"})
+        self.study.current_commit = self.repo.head.commit.hexsha
+        self._commit({"publications.csv": "name\n"})
+        self.assertIsNone(changed_files(self.study))
+
+        publications = self.import_path.joinpath("publications.csv")
+        self.assertEqual({publications}, changed_files(self.study, [publications]))
+
+    def test_changed_values_are_imported_incrementally(self):
+        self._commit({"variables.csv": "dataset,name,label\nd,a,A\nd,b,B\n"})
+        self.study.current_commit = self.repo.head.commit.hexsha
+        self._commit({"variables.csv": "dataset,name,label\nd,a,New\nd,b,B\n"})
+        variables = self.import_path.joinpath("variables.csv")
+        self.assertEqual({variables}, changed_files(self.study))
+
+        self._commit({"variables.csv": "dataset,name,label\nd,a,New\nd,c,B\n"})
+        self.assertIsNone(changed_files(self.study))
+
+    def test_removed_json_objects_need_full_import(self):
+        (self.import_path / "instruments").mkdir()
+        old = {"name": "i", "questions": {"q1": {"items": [{"item": "1"}]}}}
+        self._commit({"instruments/i.json": json.dumps(old)})
+        self.study.current_commit = self.repo.head.commit.hexsha
+        changed = {"name": "i", "questions": {"q1": {"items": [{"item": "1"}]}}}
+        changed["label"] = "New"
+        self._commit({"instruments/i.json": json.dumps(changed)})
+        instrument = self.import_path.joinpath("instruments", "i.json")
+        self.assertEqual({instrument}, changed_files(self.study))
+
+        removed = {"name": "i", "label": "New", "questions": {"q1": {"items": []}}}
+        self._commit({"instruments/i.json": json.dumps(removed)})
+        self.assertIsNone(changed_files(self.study))
+
+    def test_unknown_commit_needs_full_import(self):
+        self.study.current_commit = "0" * 40
+        self.assertIsNone(changed_files(self.study))
+
+    def test_record_import_commit(self):
+        self.assertEqual(self.first_commit, head_commit(self.study))
+        record_import_commit(self.study.name, self.first_commit)
+        self.assertEqual(
+            self.first_commit, Study.objects.get(name=self.study.name).current_commit
+        )
+
+
+class TestSetUpRepo(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_path = Path(mkdtemp())
+        self.repo_base_path = self.tmp_path.joinpath("repos")
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+
+        self.origin_path = self.tmp_path.joinpath("origin.git")
+        Repo.init(self.origin_path, bare=True)
+        self.developer = Repo.clone_from(
+            str(self.origin_path), self.tmp_path.joinpath("developer")
+        )
+        self.first_commit = self._push("first")
+
+        self.study = StudyFactory()
+        self.repo_url_patch = patch.object(
+            Study, "repo_url", return_value=str(self.origin_path)
+        )
+        self.repo_url_patch.start()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.repo_url_patch.stop()
+        self.settings_override.disable()
+        destroy_tmp_path(self.tmp_path)
+        return super().tearDown()
+
+    def _push(self, content: str) -> str:
+        study_file = Path(self.developer.working_dir).joinpath("ddionrails", "study.md")
+        study_file.parent.mkdir(exist_ok=True)
+        study_file.write_text(content, encoding="utf8")
+        self.developer.index.add([str(study_file)])
+        commit = self.developer.index.commit(content, author=AUTHOR, committer=AUTHOR)
+        self.developer.git.push("origin", "HEAD:refs/heads/main")
+        Repo(self.origin_path).git.symbolic_ref("HEAD", "refs/heads/main")
+        return commit.hexsha
+
+    def _study_file_content(self) -> str:
+        return self.study.import_path().joinpath("study.md").read_text(encoding="utf8")
+
+    def test_set_up_repo_clones_mirror_and_checks_out_worktree(self):
+        study_repo_path = set_up_repo(self.study)
+
+        self.assertEqual(self.repo_base_path.joinpath(self.study.name), study_repo_path)
+        self.assertTrue(
+            Repo(self.repo_base_path / ".mirrors" / f"{self.study.name}.git").bare
+        )
+        self.assertEqual("first", self._study_file_content())
+        self.assertEqual(self.first_commit, head_commit(self.study))
+
+    def test_set_up_repo_fetches_into_existing_mirror(self):
+        set_up_repo(self.study)
+        second_commit = self._push("second")
+        self.study.import_path().joinpath("concepts.csv").write_text("name\n")
+
+        with patch("ddionrails.imports.git_repos.Repo.clone_from") as clone:
+            set_up_repo(self.study)
+        clone.assert_not_called()
+        self.assertEqual("second", self._study_file_content())
+        self.assertEqual(second_commit, head_commit(self.study))
+        self.assertFalse(self.study.import_path().joinpath("concepts.csv").exists())
+
+    def test_set_up_repo_with_pin_reference(self):
+        self._push("second")
+        self.study.pin_reference = self.first_commit
+        set_up_repo(self.study)
+        self.assertEqual("first", self._study_file_content())
+
+    def test_set_up_repo_replaces_corrupt_mirror(self):
+        set_up_repo(self.study)
+        mirror_path = self.repo_base_path / ".mirrors" / f"{self.study.name}.git"
+        destroy_tmp_path(mirror_path.joinpath("objects"))
+        self._push("second")
+
+        set_up_repo(self.study)
+        self.assertEqual("second", self._study_file_content())
+
+    def test_set_up_repo_replaces_plain_checkout(self):
+        study_repo_path = self.repo_base_path.joinpath(self.study.name)
+        Repo.clone_from(str(self.origin_path), study_repo_path)
+        study_repo_path.joinpath("stray-file").write_text("stray")
+
+        set_up_repo(self.study)
+        self.assertFalse(study_repo_path.joinpath("stray-file").exists())
+        self.assertTrue(study_repo_path.joinpath(".git").is_file())
+        self.assertEqual("first", self._study_file_content())
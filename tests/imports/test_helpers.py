@@ -3,11 +3,24 @@
 
 """Test cases for helpers in ddionrails.imports app"""
 
+import json
+import uuid
+from collections import OrderedDict
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from ddionrails.imports.helpers import read_csv
+from ddionrails.imports.helpers import (
+    ID_CACHE,
+    UUIDCache,
+    hash_many_with_namespace_uuid,
+    hash_with_namespace_uuid,
+    iter_json_items,
+    read_csv,
+)
+from tests.file_factories import TMPJSON, TMPGeneric
+
+NAMESPACE = uuid.NAMESPACE_DNS
 
 
 class TestHelpers(TestCase):
@@ -28,3 +41,105 @@ class TestHelpers(TestCase):
                 mocked_open.assert_called_once_with(filename, "r", encoding="utf8")
                 mocked_csv_dict_reader.assert_called_once()
                 self.assertIn("study_name", content[0].keys())
+
+
+class TestIterJsonItems(TestCase):
+
+    def test_array_items(self):
+        content = [{"name": f"variable_{index}", "value": index} for index in range(100)]
+        tmp_file = TMPJSON(content)
+        self.assertEqual(content, list(iter_json_items(tmp_file.name, chunk_size=7)))
+
+    def test_object_values(self):
+        content = {"a": {"name": "a"}, "b": [1, 2.5, "3"], "c": 12345}
+        tmp_file = TMPGeneric(json.dumps(content, indent=4))
+        self.assertEqual(
+            list(content.values()), list(iter_json_items(tmp_file.name, chunk_size=3))
+        )
+
+    def test_empty_collections(self):
+        for content in ("[]", " { } "):
+            tmp_file = TMPGeneric(content)
+            self.assertEqual([], list(iter_json_items(tmp_file.name)))
+
+    def test_invalid_content(self):
+        for content in ('"not a collection"', '[{"name": "a"}', '[{"name": "a"} {}]'):
+            tmp_file = TMPGeneric(content)
+            with self.assertRaises(ValueError):
+                list(iter_json_items(tmp_file.name, chunk_size=4))
+
+
+class TestUUIDCache(TestCase):
+
+    def setUp(self) -> None:
+        self.cache = UUIDCache(maxsize=2)
+        return super().setUp()
+
+    def test_resolve_counts_hits_and_misses(self):
+        self.assertEqual(uuid.uuid5(NAMESPACE, "a"), self.cache.resolve(NAMESPACE, "a"))
+        self.cache.resolve(NAMESPACE, "a")
+        self.assertEqual(
+            {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}, self.cache.stats()
+        )
+
+    def test_least_recently_used_id_is_evicted(self):
+        self.cache.resolve(NAMESPACE, "a")
+        self.cache.resolve(NAMESPACE, "b")
+        self.cache.resolve(NAMESPACE, "a")
+        self.cache.resolve(NAMESPACE, "c")
+        self.cache.resolve(NAMESPACE, "a")
+        self.cache.resolve(NAMESPACE, "b")
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(4, self.cache.misses)
+
+    def test_resolve_many(self):
+        names = [(NAMESPACE, name) for name in ("a", "b", "a")]
+        self.assertEqual(
+            [uuid.uuid5(namespace, name) for namespace, name in names],
+            self.cache.resolve_many(names),
+        )
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_resolve_many_stays_within_maxsize(self):
+        sizes = []
+
+        class SizeTrackingDict(OrderedDict):
+            def __setitem__(self, key, value):
+                super().__setitem__(key, value)
+                sizes.append(len(self))
+
+        self.cache._ids = SizeTrackingDict()  # pylint: disable=protected-access
+        names = [(NAMESPACE, str(name)) for name in range(10)]
+        self.assertEqual(
+            [uuid.uuid5(namespace, name) for namespace, name in names],
+            self.cache.resolve_many(names),
+        )
+        self.assertLessEqual(max(sizes), self.cache.maxsize + 1)
+        self.assertEqual(2, self.cache.stats()["size"])
+
+    def test_resolve_many_with_ids_computed_by_the_same_cache(self):
+        ids = self.cache.resolve_many(
+            (self.cache.resolve(NAMESPACE, "a"), name) for name in ("b", "c")
+        )
+        self.assertEqual(uuid.uuid5(uuid.uuid5(NAMESPACE, "a"), "c"), ids[1])
+
+    @override_settings(IMPORT_ID_CACHE_SIZE=10, IMPORT_ID_CACHE_MAX_SIZE=100)
+    def test_fit_stays_within_configured_bounds(self):
+        self.cache.fit(5)
+        self.assertEqual(10, self.cache.maxsize)
+        self.cache.fit(50)
+        self.assertEqual(50, self.cache.maxsize)
+        self.cache.fit(500)
+        self.assertEqual(100, self.cache.maxsize)
+
+    def test_hash_functions_use_the_shared_cache(self):
+        ID_CACHE.clear()
+        hash_with_namespace_uuid(NAMESPACE, "a")
+        hash_with_namespace_uuid(NAMESPACE, "a", cache=False)
+        self.assertEqual(
+            [uuid.uuid5(NAMESPACE, "a")],
+            hash_many_with_namespace_uuid([(NAMESPACE, "a")]),
+        )
+        self.assertEqual(1, ID_CACHE.hits)
+        self.assertEqual(1, ID_CACHE.misses)
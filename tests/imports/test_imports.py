@@ -64,6 +64,13 @@ class TestCSVImport(TestCase):
             self.csv_importer.execute_import()
             mocked_import_element.assert_called_once_with("element")
 
+    def test_execute_import_method_in_bulk_mode(self):
+        with patch.object(self.csv_importer, "import_elements") as mocked_import_elements:
+            with patch.object(self.csv_importer, "bulk", True):
+                self.csv_importer.content = ["element"]
+                self.csv_importer.execute_import()
+            mocked_import_elements.assert_called_once_with(["element"])
+
     def test_process_element_method(self):
         element = "element"
         response = self.csv_importer.process_element(element)
@@ -3,15 +3,34 @@
 
 """Test cases for ddionrails.imports.manager"""
 
+from concurrent.futures import ThreadPoolExecutor
 from json import dump
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from unittest.mock import patch
+from tempfile import NamedTemporaryFile, mkdtemp
+from threading import Lock
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from ddionrails.imports.manager import _import_home_background, _initialize_studies
+from ddionrails.concepts.imports import PeriodImport
+from ddionrails.concepts.models import Period
+from ddionrails.data.imports import DatasetJsonImport, TransformationImport
+from ddionrails.imports.manager import (
+    GENERATED_ENTITIES,
+    IMPORT_DEPENDENCIES,
+    FileImportResult,
+    StudyImportManager,
+    _import_entity,
+    _import_file,
+    _import_home_background,
+    _initialize_studies,
+    record_import_run,
+)
+from ddionrails.imports.models import ImportRun
 from ddionrails.studies.models import Study
+from tests.file_factories import destroy_tmp_path, import_data_factory
+from tests.model_factories import StudyFactory
 
 
 class TestSystemImport(TestCase):
@@ -35,3 +54,335 @@ class TestSystemImport(TestCase):
                 settings_mock.STUDY_INIT_FILE = tmp_file.name
                 _initialize_studies()
                 Study.objects.get(name="test_study")
+
+
+class TestRecordImportRun(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.tmp_path = Path(mkdtemp())
+        self.file = self.tmp_path.joinpath("periods.csv")
+        self.file.write_text(
+            "study,name,label\n"
+            f"{self.study.name},some-period,Some label\n"
+            f"{self.study.name},other-period,Other label\n",
+            encoding="utf8",
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        destroy_tmp_path(self.tmp_path)
+        return super().tearDown()
+
+    def test_record_import_run_counts_rows(self):
+        run = uuid4()
+        Period(study=self.study, name="some-period").save()
+        record_import_run(run, "periods", PeriodImport.run_import, self.file, self.study)
+
+        import_run = ImportRun.objects.get(run=run)
+        self.assertEqual(
+            ("periods", str(self.file)), (import_run.entity, import_run.file)
+        )
+        self.assertEqual(self.study.name, import_run.study_name)
+        self.assertFalse(import_run.failed)
+        self.assertEqual(2, import_run.rows_read)
+        self.assertEqual(1, import_run.rows_created)
+        self.assertEqual(1, import_run.rows_updated)
+        self.assertEqual(0, import_run.rows_deleted)
+        self.assertGreaterEqual(import_run.duration.total_seconds(), 0)
+        self.assertGreater(import_run.process_peak_memory, 0)
+
+    def test_record_import_run_marks_failures(self):
+        run = uuid4()
+        broken_import = MagicMock(side_effect=ValueError("Broken file"))
+        with self.assertRaises(ValueError):
+            record_import_run(run, "periods", broken_import, self.file, self.study)
+        broken_import.assert_called_once_with(self.file, self.study)
+        import_run = ImportRun.objects.get(run=run)
+        self.assertTrue(import_run.failed)
+        self.assertIsNotNone(import_run.finished)
+
+    def test_record_import_run_is_stored_before_the_import(self):
+        run = uuid4()
+
+        def _import(*_args):
+            import_run = ImportRun.objects.get(run=run)
+            self.assertIsNone(import_run.finished)
+
+        record_import_run(run, "periods", _import, self.file, self.study)
+        self.assertEqual(1, ImportRun.objects.filter(run=run).count())
+        self.assertIsNotNone(ImportRun.objects.get(run=run).finished)
+
+    def test_import_single_entity_shares_run(self):
+        manager = StudyImportManager(self.study, redis=False)
+        manager.import_single_entity("periods", filename=str(self.file))
+        import_run = ImportRun.objects.get(run=manager.run)
+        self.assertEqual(("periods", 2), (import_run.entity, import_run.rows_created))
+
+
+class TestResumableImport(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(
+            IMPORT_REPO_PATH=self.repo_base_path, IMPORT_CHUNK_SIZE=2
+        )
+        self.settings_override.enable()
+        self.study = StudyFactory()
+        self.study.import_path().mkdir(parents=True)
+        rows = [",".join(["origin", "target"])]
+        rows += [f"origin-{index},target-{index}" for index in range(5)]
+        self.study.import_path().joinpath("transformations.csv").write_text(
+            "\n".join(rows) + "\n", encoding="utf8"
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def test_large_files_are_imported_in_chunks(self):
+        manager = StudyImportManager(self.study, redis=False)
+        with patch.object(TransformationImport, "run_import") as run_import:
+            manager.import_single_entity("transformations")
+
+        chunks = [call.args[0] for call in run_import.call_args_list]
+        self.assertEqual(
+            ["transformations.00000.csv", "transformations.00001.csv"],
+            [chunk.name for chunk in chunks[:2]],
+        )
+        self.assertEqual(
+            "origin,target\norigin-4,target-4\n", chunks[2].read_text(encoding="utf8")
+        )
+        self.assertEqual(
+            [2, 2, 1],
+            list(
+                ImportRun.objects.filter(run=manager.run)
+                .order_by("file")
+                .values_list("rows_read", flat=True)
+            ),
+        )
+
+    def test_chunks_are_removed_after_the_import(self):
+        manager = StudyImportManager(self.study, redis=False)
+        with patch.object(TransformationImport, "run_import"):
+            manager.import_single_entity("transformations")
+        self.assertTrue(manager.chunk_directory().exists())
+
+        self.assertEqual([], manager.remove_chunks())
+        self.assertFalse(manager.chunk_directory().exists())
+        self.assertTrue(self.study.import_path().joinpath("transformations.csv").exists())
+
+    def test_resumed_run_skips_completed_steps(self):
+        manager = StudyImportManager(self.study, redis=False)
+        with patch.object(TransformationImport, "run_import") as run_import:
+            run_import.side_effect = [None, ValueError("Worker died"), None]
+            with self.assertRaises(ValueError):
+                manager.import_single_entity("transformations")
+
+        resumed_manager = StudyImportManager(self.study, redis=False, run=manager.run)
+        with patch.object(TransformationImport, "run_import") as run_import:
+            resumed_manager.import_single_entity("transformations")
+        self.assertEqual(
+            ["transformations.00001.csv", "transformations.00002.csv"],
+            [call.args[0].name for call in run_import.call_args_list],
+        )
+
+    def test_redis_jobs_of_chunks_depend_on_each_other(self):
+        manager = StudyImportManager(self.study, redis=True)
+        with patch("ddionrails.imports.manager.django_rq.enqueue") as enqueue:
+            enqueue.side_effect = [MagicMock(name=str(index)) for index in range(3)]
+            jobs = manager.import_single_entity("transformations", depends_on=[])
+        self.assertEqual(
+            [None, [jobs[0]], [jobs[1]]],
+            [call.kwargs["depends_on"] for call in enqueue.call_args_list],
+        )
+
+
+class TestImportDependencies(TestCase):
+
+    def setUp(self) -> None:
+        self.repo_base_path = Path(mkdtemp())
+        self.settings_override = override_settings(IMPORT_REPO_PATH=self.repo_base_path)
+        self.settings_override.enable()
+        self.study = StudyFactory()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        destroy_tmp_path(self.repo_base_path)
+        return super().tearDown()
+
+    def test_import_order_respects_dependencies(self):
+        manager = StudyImportManager(self.study, redis=False)
+        self.assertEqual(set(manager.import_order), set(IMPORT_DEPENDENCIES))
+        position = {entity: index for index, entity in enumerate(manager.import_order)}
+        for entity, dependencies in IMPORT_DEPENDENCIES.items():
+            for dependency in dependencies:
+                self.assertLess(position[dependency], position[entity])
+
+    def test_redis_jobs_depend_on_jobs_of_dependencies(self):
+        # The file objects remove their files once they are garbage collected.
+        tmp_path, patch_dict, _files, _, study_name = import_data_factory()
+        study = StudyFactory(name=study_name)
+        queued = {}
+
+        def _enqueue(function, *args, depends_on=None):
+            file = args[3]
+            job = MagicMock(name=Path(file).name)
+            queued[Path(file).name] = (job, depends_on or [])
+            return job
+
+        with patch(**patch_dict):
+            with patch("ddionrails.imports.manager.django_rq.enqueue") as enqueue:
+                enqueue.side_effect = _enqueue
+                StudyImportManager(study, redis=True).import_all_entities()
+        destroy_tmp_path(tmp_path)
+
+        variables_job = queued["variables.csv"][0]
+        self.assertIn(variables_job, queued["transformations.csv"][1])
+        self.assertIn(variables_job, queued["questions_variables.csv"][1])
+        self.assertEqual([], queued["periods.csv"][1])
+
+    def _thread_pool(self):
+        return patch(
+            "ddionrails.imports.manager.ProcessPoolExecutor",
+            lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+        )
+
+    def _entity_files(self, manager, entity, names):
+        directory = manager.entity_directories[entity]
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            directory.joinpath(name).write_text("[]", encoding="utf8")
+        return [directory.joinpath(name) for name in names]
+
+    def test_process_pool_imports_dependencies_first(self):
+        finished = []
+        lock = Lock()
+
+        def _import_entity(_, entity, *_args):
+            with lock:
+                for dependency in IMPORT_DEPENDENCIES[entity]:
+                    self.assertIn(dependency, finished)
+                finished.append(entity)
+
+        def _import_file(_, entity, file, *_args):
+            _import_entity(_, entity)
+            return FileImportResult(entity, file, 0.0)
+
+        with patch("ddionrails.imports.manager._import_entity", _import_entity), patch(
+            "ddionrails.imports.manager._import_file", _import_file
+        ), patch("ddionrails.imports.manager.connections"):
+            with self._thread_pool():
+                manager = StudyImportManager(self.study, redis=False, workers=4)
+                for entity in manager.entity_directories:
+                    self._entity_files(manager, entity, ["some-file.json"])
+                manager.import_all_entities()
+        self.assertEqual(
+            set(IMPORT_DEPENDENCIES).difference(GENERATED_ENTITIES), set(finished)
+        )
+
+    def test_process_pool_imports_all_files_despite_failures(self):
+        imported = []
+
+        def _import_file(_, entity, file, *_args):
+            imported.append(file.name)
+            error = "Broken file" if file.name == "broken.json" else None
+            return FileImportResult(entity, file, 0.5, error)
+
+        manager = StudyImportManager(self.study, redis=False, workers=2)
+        files = self._entity_files(
+            manager, "datasets.json", ["a.json", "broken.json", "c.json"]
+        )
+        with patch("ddionrails.imports.manager._import_file", _import_file), patch(
+            "ddionrails.imports.manager.connections"
+        ):
+            with self._thread_pool(), patch(
+                "ddionrails.imports.manager.LOGGER"
+            ) as logger:
+                manager.import_single_entity("datasets.json")
+
+        self.assertEqual(sorted(file.name for file in files), sorted(imported))
+        self.assertEqual(
+            ["broken.json"],
+            [result.file.name for result in manager.file_results if result.error],
+        )
+        self.assertEqual(2, logger.error.call_count)
+        self.assertEqual((1, 3, "broken.json"), logger.error.call_args.args[2:])
+
+    @patch("ddionrails.imports.manager.head_commit", return_value="a" * 40)
+    def test_failed_files_keep_the_commit_unrecorded(self, _):
+        manager = StudyImportManager(self.study, redis=False)
+        manager.record_commit()
+        self.assertEqual("a" * 40, Study.objects.get(pk=self.study.pk).current_commit)
+
+        Study.objects.filter(pk=self.study.pk).update(current_commit="")
+        manager.file_results.append(
+            FileImportResult("datasets.json", Path("broken.json"), 0.5, "Broken file")
+        )
+        manager.record_commit()
+        self.assertEqual("", Study.objects.get(pk=self.study.pk).current_commit)
+
+    def test__import_entity_resumes_only_resumed_runs(self):
+        resumed = []
+
+        def import_single_entity(manager, _entity):
+            resumed.append(manager.resumed)
+
+        with patch.object(
+            StudyImportManager, "import_single_entity", import_single_entity
+        ):
+            _import_entity(self.study.name, "periods", uuid4())
+            _import_entity(self.study.name, "periods", uuid4(), None, True)
+        self.assertEqual([False, True], resumed)
+
+    def test__import_file_returns_errors(self):
+        manager = StudyImportManager(self.study, redis=False)
+        file = self._entity_files(manager, "datasets.json", ["some-dataset.json"])[0]
+        with patch.object(
+            DatasetJsonImport, "run_import", side_effect=ValueError("Broken file")
+        ):
+            result = _import_file(self.study.name, "datasets.json", file, uuid4())
+        self.assertEqual(file, result.file)
+        self.assertIn("ValueError: Broken file", result.error)
+        self.assertGreaterEqual(result.seconds, 0)
+
+    def test_entities_for_files_includes_dependants(self):
+        manager = StudyImportManager(self.study, redis=False)
+        base_dir = manager.base_dir
+
+        self.assertEqual(
+            ["publications"],
+            manager.entities_for_files([base_dir / "publications.csv"]),
+        )
+        self.assertEqual(
+            [
+                "concepts",
+                "variables",
+                "questions_variables",
+                "concepts_questions",
+                "transformations",
+                "attachments",
+                "variables_images",
+            ],
+            manager.entities_for_files([base_dir / "variables.csv"]),
+        )
+        self.assertIn(
+            "variables",
+            manager.entities_for_files([base_dir / "datasets" / "some-dataset.json"]),
+        )
+        self.assertEqual([], manager.entities_for_files([base_dir / "README.md"]))
+
+    def test_replaced_files(self):
+        manager = StudyImportManager(self.study, redis=False)
+        base_dir = manager.base_dir.resolve()
+
+        replaced_files = manager.replaced_files()
+        self.assertIn(base_dir / "topics.json", replaced_files)
+        self.assertIn(base_dir / "study.md", replaced_files)
+        self.assertIn(base_dir / "attachments.csv", replaced_files)
+        # The questions.csv is imported by "questions" as well, which keeps rows.
+        self.assertNotIn(base_dir / "questions.csv", replaced_files)
+        self.assertNotIn(base_dir / "variables.csv", replaced_files)
@@ -4,18 +4,34 @@ from pathlib import Path
 from shutil import copytree, rmtree
 from unittest.mock import patch
 
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from ddionrails.instruments.imports.concept_question_import import ConceptQuestionImport
+from ddionrails.instruments.imports.instrument_import import InstrumentImport
+from ddionrails.instruments.imports.question_image_import import questions_images_import
 from ddionrails.instruments.imports.question_import import (
     answer_import,
     answer_relation_import,
     question_import,
 )
-from ddionrails.instruments.models import Answer, Instrument, Question
+from ddionrails.instruments.models import Answer, ConceptQuestion, Instrument, Question
 from ddionrails.instruments.models.question_item import QuestionItem
 from ddionrails.studies.models import Study
-from tests.file_factories import destroy_tmp_path, import_data_factory, tmp_import_path
-from tests.model_factories import InstrumentFactory, PeriodFactory, StudyFactory
+from tests.file_factories import (
+    TMPCSV,
+    destroy_tmp_path,
+    import_data_factory,
+    tmp_import_path,
+)
+from tests.model_factories import (
+    ConceptFactory,
+    InstrumentFactory,
+    PeriodFactory,
+    QuestionFactory,
+    StudyFactory,
+)
 
 TEST_FILES = Path("./tests/imports/test_data/").absolute()
 
@@ -95,3 +111,218 @@ class QuestionImport(TestCase):
                 0,
                 msg=f"{answer} was not imported",
             )
+
+    def test_answer_relation_import_loads_question_items_once(self) -> None:
+        question_import(file=self.tmp_path.joinpath("questions.csv"), study=self.study)
+        answer_import(file=self.tmp_path.joinpath("answers.csv"), study=self.study)
+        Answer.question_items.through.objects.all().delete()
+
+        # One query for the question items and one for the relations,
+        # inside of a savepoint.
+        with self.assertNumQueries(4):
+            answer_relation_import(
+                file=self.tmp_path.joinpath("answers.csv"), study=self.study
+            )
+        relations = Answer.question_items.through.objects.count()
+        self.assertGreater(relations, 0)
+
+        Answer.question_items.through.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            answer_relation_import(
+                file=self.tmp_path.joinpath("answers.csv"),
+                study=self.study,
+                batch_size=1,
+            )
+        self.assertGreater(len(queries), 4)
+        self.assertEqual(relations, Answer.question_items.through.objects.count())
+
+    def test_answer_relation_import_writes_nothing_on_errors(self) -> None:
+        question_import(file=self.tmp_path.joinpath("questions.csv"), study=self.study)
+        answer_import(file=self.tmp_path.joinpath("answers.csv"), study=self.study)
+        Answer.question_items.through.objects.all().delete()
+        relations = Answer.question_items.through.objects
+        bulk_create = relations.bulk_create
+        batches = []
+
+        def failing_bulk_create(*args, **kwargs):
+            batches.append(args)
+            if len(batches) > 1:
+                raise DatabaseError("Broken batch")
+            return bulk_create(*args, **kwargs)
+
+        with patch.object(relations, "bulk_create", failing_bulk_create):
+            with self.assertRaises(DatabaseError):
+                answer_relation_import(
+                    file=self.tmp_path.joinpath("answers.csv"),
+                    study=self.study,
+                    batch_size=1,
+                )
+        self.assertEqual(0, relations.count())
+
+    def test_answer_relation_import_with_unknown_question_item(self) -> None:
+        question_import(file=self.tmp_path.joinpath("questions.csv"), study=self.study)
+        QuestionItem.objects.all().delete()
+        with self.assertRaises(QuestionItem.DoesNotExist):
+            answer_relation_import(
+                file=self.tmp_path.joinpath("answers.csv"), study=self.study
+            )
+
+
+class TestInstrumentImport(TestCase):
+    """Test the import of questions from instrument JSON files."""
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.instrument_file = TEST_FILES.joinpath("some-questionnaire.json")
+        return super().setUp()
+
+    def test_instrument_import_creates_questions(self) -> None:
+        InstrumentImport.run_import(self.instrument_file, self.study)
+
+        instrument = Instrument.objects.get(study=self.study, name="some-questionnaire")
+        self.assertEqual("2018", instrument.period.name)
+        self.assertEqual("none", instrument.analysis_unit.name)
+        question = Question.objects.get(instrument=instrument, name="vtest")
+        self.assertEqual(question.generate_id(), question.id)
+        self.assertEqual("Do You test?", question.label)
+        self.assertEqual("14", question.items[0]["item"])
+        self.assertEqual(instrument.period, question.period)
+        self.assertEqual(
+            ["vtest", "vsex"],
+            list(instrument.questions.order_by("sort_id").values_list("name", flat=True)),
+        )
+
+    def test_instrument_import_updates_questions(self) -> None:
+        InstrumentImport.run_import(self.instrument_file, self.study)
+        instrument = Instrument.objects.get(study=self.study, name="some-questionnaire")
+        other_period = PeriodFactory(study=self.study, name="other-period")
+        question = Question.objects.get(instrument=instrument, name="vtest")
+        question.label = "Outdated label"
+        question.period = other_period
+        question.save()
+
+        with self.assertNumQueries(8):
+            InstrumentImport.run_import(self.instrument_file, self.study)
+
+        question = Question.objects.get(instrument=instrument, name="vtest")
+        self.assertEqual("Do You test?", question.label)
+        self.assertEqual(other_period, question.period)
+        self.assertEqual(2, instrument.questions.count())
+
+
+class TestQuestionImageImport(TestCase):
+    """Test the import of question images."""
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        instrument = InstrumentFactory(study=self.study)
+        self.questions = [
+            QuestionFactory(instrument=instrument, name=f"question_{index}")
+            for index in range(3)
+        ]
+        self.content = [
+            {
+                "instrument": instrument.name,
+                "question": question.name,
+                "url": f"https://example.com/{question.name}.png",
+                "label": question.name,
+                "url_de": f"https://example.com/{question.name}_de.png",
+                "label_de": question.name,
+            }
+            for question in self.questions
+        ]
+        self.tmp_file = TMPCSV(content=self.content, file_name="questions_images.csv")
+        return super().setUp()
+
+    def test_questions_images_import(self) -> None:
+        # One query to find the existing questions and one bulk update.
+        with self.assertNumQueries(2):
+            questions_images_import(self.tmp_file.name, self.study)
+        for question, row in zip(self.questions, self.content):
+            question.refresh_from_db()
+            self.assertEqual(
+                {"url": row["url_de"], "label": row["label_de"]}, question.images["de"]
+            )
+            self.assertEqual(
+                {"url": row["url"], "label": row["label"]}, question.images["en"]
+            )
+
+    def test_questions_images_import_lists_all_missing_questions(self) -> None:
+        missing = self.questions[1:]
+        Question.objects.filter(id__in=[question.id for question in missing]).delete()
+        with self.assertRaises(Question.DoesNotExist) as context:
+            questions_images_import(self.tmp_file.name, self.study)
+        for question in missing:
+            self.assertIn(question.name, str(context.exception))
+
+
+class TestConceptQuestionImport(TestCase):
+    """Test the import of links between concepts and questions."""
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.instrument = InstrumentFactory(study=self.study)
+        self.questions = [
+            QuestionFactory(instrument=self.instrument, name=f"question_{index}")
+            for index in range(2)
+        ]
+        self.concepts = [ConceptFactory(name=f"concept_{index}") for index in range(2)]
+        return super().setUp()
+
+    def _import(self, rows) -> ConceptQuestionImport:
+        importer = ConceptQuestionImport("questions.csv", self.study)
+        importer.content = {
+            (self.study.name, self.instrument.name, question, concept)
+            for question, concept in rows
+        }
+        importer.execute_import()
+        return importer
+
+    def _relations(self):
+        return set(ConceptQuestion.objects.values_list("question__name", "concept__name"))
+
+    def test_import_writes_only_the_difference(self) -> None:
+        kept = ConceptQuestion.objects.create(
+            question=self.questions[0], concept=self.concepts[0]
+        )
+        ConceptQuestion.objects.create(
+            question=self.questions[1], concept=self.concepts[0]
+        )
+
+        self._import([("question_0", "concept_0"), ("question_1", "concept_1")])
+
+        self.assertEqual(
+            {("question_0", "concept_0"), ("question_1", "concept_1")},
+            self._relations(),
+        )
+        self.assertTrue(ConceptQuestion.objects.filter(id=kept.id).exists())
+
+    def test_import_removes_the_last_relations_of_the_study(self) -> None:
+        ConceptQuestion.objects.create(
+            question=self.questions[0], concept=self.concepts[0]
+        )
+        other_question = QuestionFactory(name="other_question")
+        ConceptQuestion.objects.create(question=other_question, concept=self.concepts[0])
+
+        self._import([])
+
+        self.assertEqual({("other_question", "concept_0")}, self._relations())
+
+    def test_import_query_count(self) -> None:
+        # Studies, questions, concepts, existing relations and one bulk insert,
+        # wrapped in a savepoint.
+        with self.assertNumQueries(7):
+            self._import([("question_0", "concept_0"), ("question_1", "concept_1")])
+
+    def test_import_lists_all_missing_questions_and_concepts(self) -> None:
+        with self.assertRaises(ConceptQuestion.DoesNotExist) as context:
+            self._import(
+                [
+                    ("question_0", "concept_0"),
+                    ("missing_question", "concept_0"),
+                    ("question_1", "missing_concept"),
+                ]
+            )
+        self.assertIn("missing_question", str(context.exception))
+        self.assertIn("missing_concept", str(context.exception))
+        self.assertEqual(set(), self._relations())
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+"""Test cases for ddionrails.imports.staging"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ddionrails.concepts.models import Concept
+from ddionrails.data.models import Dataset, Transformation, Variable
+from ddionrails.imports.manager import FileImportResult, StudyImportManager
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.staging import (
+    create_staging_schema,
+    staging_schema_name,
+    swap_staged_study,
+    use_schema,
+)
+from ddionrails.publications.models import Attachment
+from ddionrails.workspace.models import BasketVariable
+from tests.model_factories import StudyFactory
+from tests.workspace.factories import BasketFactory
+
+
+class TestStagedImport(TestCase):
+
+    def setUp(self) -> None:
+        self.study = StudyFactory()
+        self.dataset = Dataset.objects.create(study=self.study, name="some-dataset")
+        self.kept = self._variable("kept", "Old label")
+        self.removed = self._variable("removed")
+        self.other = self._variable("other")
+        self.unchanged_transformation = Transformation.objects.create(
+            origin=self.kept, target=self.other
+        )
+        Transformation.objects.create(origin=self.kept, target=self.removed)
+        basket = BasketFactory(study=self.study, name="some-basket")
+        BasketVariable.objects.create(basket=basket, variable=self.kept)
+        BasketVariable.objects.create(basket=basket, variable=self.removed)
+        return super().setUp()
+
+    def _variable(self, name, label=""):
+        return Variable.objects.create(dataset=self.dataset, name=name, label=label)
+
+    def _variable_names(self):
+        return set(
+            Variable.objects.filter(dataset__study=self.study).values_list(
+                "name", flat=True
+            )
+        )
+
+    def _schema_exists(self, schema):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.schemata WHERE schema_name = %s",
+                [schema],
+            )
+            return cursor.fetchone() is not None
+
+    def test_swap_publishes_staged_changes(self):
+        schema = create_staging_schema(self.study)
+        with use_schema(schema):
+            Variable.objects.get(name="removed").delete()
+            Variable.objects.filter(name="kept").update(label="New label")
+            added = self._variable("added")
+            Transformation.objects.create(origin=self.kept, target=added)
+            self.assertEqual({"kept", "other", "added"}, self._variable_names())
+
+        self.assertEqual({"kept", "removed", "other"}, self._variable_names())
+        swap_staged_study(self.study.name, schema)
+
+        self.assertEqual({"kept", "other", "added"}, self._variable_names())
+        self.assertEqual("New label", Variable.objects.get(pk=self.kept.pk).label)
+        self.assertEqual(
+            {("kept", "other"), ("kept", "added")},
+            set(
+                Transformation.objects.filter(
+                    origin__dataset__study=self.study
+                ).values_list("origin__name", "target__name")
+            ),
+        )
+        self.assertTrue(
+            Transformation.objects.filter(pk=self.unchanged_transformation.pk).exists()
+        )
+        self.assertEqual(
+            ["kept"],
+            list(BasketVariable.objects.values_list("variable__name", flat=True)),
+        )
+        self.assertFalse(self._schema_exists(schema))
+
+    def test_staging_schema_holds_only_rows_of_the_study(self):
+        other_dataset = Dataset.objects.create(
+            study=StudyFactory(name="other-study"), name="some-dataset"
+        )
+        Variable.objects.create(dataset=other_dataset, name="not-copied")
+        schema = create_staging_schema(self.study)
+        with use_schema(schema):
+            self.assertEqual(
+                {"kept", "removed", "other"},
+                set(Variable.objects.values_list("name", flat=True)),
+            )
+        swap_staged_study(self.study.name, schema)
+        self.assertTrue(Variable.objects.filter(name="not-copied").exists())
+
+    def test_swap_keeps_shared_rows_not_written_by_the_import(self):
+        written = Concept.objects.create(name="written", label="Old label")
+        changed = Concept.objects.create(name="changed", label="Old label")
+        schema = create_staging_schema(self.study)
+        with use_schema(schema):
+            Concept.objects.filter(pk=written.pk).update(label="Staged label")
+            Concept.objects.create(name="added")
+        # Written by the import of another study, while this study is staged.
+        Concept.objects.filter(pk=changed.pk).update(label="Other label")
+
+        swap_staged_study(self.study.name, schema)
+
+        self.assertEqual(
+            {"written": "Staged label", "changed": "Other label", "added": ""},
+            dict(
+                Concept.objects.filter(
+                    name__in=("written", "changed", "added")
+                ).values_list("name", "label")
+            ),
+        )
+
+    def test_import_all_entities_staged(self):
+        manager = StudyImportManager(self.study, redis=False)
+        public_names = []
+
+        def _import(_file, study):
+            public_names.append(self._variable_names())
+            dataset = Dataset.objects.create(study=study, name="some-dataset")
+            Variable.objects.create(dataset=dataset, name="kept", label="New label")
+
+        def _import_all_entities():
+            manager._execute(_import, "variables.csv", self.study, entity="variables")
+            public_names.append(self._variable_names())
+            return []
+
+        with patch.object(manager, "import_all_entities", _import_all_entities):
+            self.assertEqual([], manager.import_all_entities_staged())
+
+        # The import sees the emptied study, while the published study is unchanged.
+        self.assertEqual([set(), {"kept", "removed", "other"}], public_names)
+        self.assertEqual({"kept"}, self._variable_names())
+        self.assertEqual("New label", Variable.objects.get(pk=self.kept.pk).label)
+        self.assertEqual(
+            1, BasketVariable.objects.filter(basket__study=self.study).count()
+        )
+        self.assertTrue(ImportRun.objects.filter(run=manager.run).exists())
+        self.assertIsNone(manager.schema)
+
+    def test_import_all_entities_staged_with_failed_files(self):
+        manager = StudyImportManager(self.study, redis=False)
+
+        def _import(_file, study):
+            dataset = Dataset.objects.create(study=study, name="some-dataset")
+            Variable.objects.create(dataset=dataset, name="kept", label="New label")
+
+        def _import_all_entities():
+            manager._execute(_import, "variables.csv", self.study, entity="variables")
+            manager.file_results.append(
+                FileImportResult("datasets.json", Path("broken.json"), 0.5, "Broken")
+            )
+            return []
+
+        with patch.object(manager, "import_all_entities", _import_all_entities):
+            self.assertEqual([], manager.import_all_entities_staged())
+
+        self.assertEqual({"kept", "removed", "other"}, self._variable_names())
+        self.assertEqual("Old label", Variable.objects.get(pk=self.kept.pk).label)
+        self.assertEqual(
+            2, BasketVariable.objects.filter(basket__study=self.study).count()
+        )
+        self.assertFalse(self._schema_exists(staging_schema_name(self.study)))
+        self.assertIsNone(manager.schema)
+
+    def test_attachments_are_replaced_only_by_the_swap(self):
+        Attachment.objects.create(
+            context_study=self.study, study=self.study, url="https://old.example"
+        )
+        public_urls = []
+
+        with TemporaryDirectory() as repo_path, override_settings(
+            IMPORT_REPO_PATH=Path(repo_path)
+        ):
+            self.study.import_path().mkdir(parents=True)
+            self.study.import_path().joinpath("attachments.csv").write_text(
+                "type,url,url_text\nstudy,https://new.example,New\n", encoding="utf8"
+            )
+            manager = StudyImportManager(self.study, redis=False)
+
+            def _import_all_entities():
+                manager.import_single_entity("attachments")
+                public_urls.append(self._attachment_urls())
+                return []
+
+            with patch.object(manager, "import_all_entities", _import_all_entities):
+                manager.import_all_entities_staged()
+
+        self.assertEqual([{"https://old.example"}], public_urls)
+        self.assertEqual({"https://new.example"}, self._attachment_urls())
+
+    def _attachment_urls(self):
+        return set(
+            Attachment.objects.filter(context_study=self.study).values_list(
+                "url", flat=True
+            )
+        )
@@ -3,16 +3,20 @@
 
 """Test cases for models in ddionrails.workspace app"""
 
+import json
 import unittest
 from os import remove
 from pathlib import Path
+from shutil import copyfile
 from tempfile import TemporaryDirectory
 from unittest.mock import patch
 
 import pytest
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
+from django.db import connection
 from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from ddionrails.concepts.models import Concept
 from ddionrails.data.models import Dataset, Variable
@@ -234,6 +238,40 @@ class TestBasketModel(LiveServerTestCase):
 
         mock_backup_dir(self)
 
+    def test_preserve_and_relink(self):
+        """Do baskets keep their scripts and imported variables after a clean import?"""
+        removed_variable = VariableFactory(dataset=self.variable.dataset)
+        self.basket.variables.add(self.variable, removed_variable)
+        script = ScriptFactory(basket=self.basket)
+        variable_id = self.variable.id
+
+        with override_settings(BACKUP_DIR=Path(self.tmp_dir.name)):
+            with Basket.preserve(self.study) as preserved:
+                self.study.delete()
+                self.study.save()
+        self.assertEqual(2, len(json.loads(preserved.read_text(encoding="utf8"))))
+        preserved_copy = Path(self.tmp_dir.name, "copy.json")
+        copyfile(preserved, preserved_copy)
+        self.assertTrue(Basket.objects.filter(id=self.basket.id).exists())
+        self.assertTrue(Script.objects.filter(id=script.id).exists())
+        self.assertFalse(BasketVariable.objects.exists())
+
+        dataset = Dataset.objects.create(
+            study=self.study, name=self.variable.dataset.name
+        )
+        Variable.objects.create(dataset=dataset, name=self.variable.name)
+        self.assertEqual((1, 1), BasketVariable.relink(preserved))
+        self.assertFalse(preserved.exists())
+        self.assertEqual(
+            [variable_id],
+            list(
+                BasketVariable.objects.filter(basket=self.basket).values_list(
+                    "variable_id", flat=True
+                )
+            ),
+        )
+        self.assertEqual((0, 2), BasketVariable.relink(preserved_copy))
+
 
 class TestBasketVariableModel(LiveServerTestCase):
 
@@ -286,6 +324,31 @@ class TestBasketVariableModel(LiveServerTestCase):
         with self.assertRaises(BasketVariable.DoesNotExist):
             BasketVariable.objects.get(variable__id=variable_id)
 
+    def test_remove_dangling_basket_variables_in_one_statement(self):
+        BasketVariable.objects.create(basket=self.basket, variable=self.variable)
+        dangling_variables = VariableFactory.create_batch(
+            3, dataset=self.variable.dataset
+        )
+        for variable in dangling_variables:
+            BasketVariable.objects.create(basket=self.basket, variable=variable)
+        # Remove the variables without their basket variables.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM data_variable WHERE id = ANY(%s)",
+                [[variable.id for variable in dangling_variables]],
+            )
+        with CaptureQueriesContext(connection) as queries:
+            removed = BasketVariable.clean_basket_variables()
+        self.assertEqual(3, removed)
+        self.assertEqual(
+            1,
+            sum(query["sql"].startswith("DELETE") for query in queries.captured_queries),
+        )
+        self.assertEqual(
+            [self.variable.id],
+            list(BasketVariable.objects.values_list("variable_id", flat=True)),
+        )
+
     def test_remove_dangling_basket_variables_study_specific(self):
         """Can we clean up BasketVariables belonging to a specific study?"""
         other_study = StudyFactory(name="a_different_study")